@@ -0,0 +1,736 @@
+#!/usr/bin/env python3
+"""
+Benchmark runner for the parse / dedup / Elo / balance pipeline
+
+Generates a synthetic scrimmage history (see cs2_elo_tracker/synthetic.py)
+and times each stage. Results are written as JSON so runs from different
+commits can be compared:
+
+    python bench.py --matches 10000 --output before.json
+    python bench.py --matches 10000 --output after.json --compare before.json
+
+--memory also reports the peak resident memory of loading the history
+from JSONL and from the binary archive, each in a fresh process.
+
+--writes reports the write amplification of ingesting pastes (bytes
+written to disk per byte of new match records, by file, and fsyncs per
+ingest). --crash-check kills an ingest at every fsync / rename / unlink
+in turn, recovers the data directory and checks that it holds either the
+state before the ingest or the state after it, byte for byte.
+--season-check closes seasons over a small hand-made history and checks
+the carried-over ratings and the all-time pair / scoreboard records.
+--workspace-check runs the `watch` (with --ci) and `season` commands of a
+copy of the app under a non-default workspace and checks that the default
+data directory is left untouched and the workspace's ratings carry the
+confidence intervals. --gui-check runs the GUI's refresh methods
+(without a window) on corrupt alias and initial ELO files and checks that
+they are reported rather than raised. --balance-check balances rosters
+A, B and A again and checks that balanced_teams.json holds the split
+returned last, also when it came from the result cache. --dedup-check
+re-pastes stored matches unchanged and edited and checks that identical
+copies are skipped and edited ones replace the stored match, records and
+ratings.
+
+The checks are assertions: if any of them fails (or a crash recovery is
+inconsistent) the failed names are printed and the exit status is 1.
+"""
+
+import argparse
+import copy
+import json
+import platform
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+from pathlib import Path
+
+from cs2_elo_tracker.synthetic import generate_history, iter_match_blocks
+from cs2_elo_tracker.utils import invalidate_data_cache, save_json, load_jsonl, save_jsonl
+from cs2_elo_tracker.parser import parse_matches_from_text, parse_and_save
+from cs2_elo_tracker.ingest import ingest_text, ingest_matches
+from cs2_elo_tracker.elo import calculate_elos, load_match_history, create_engine
+from cs2_elo_tracker.batch_elo import EncodedHistory, replay_batch, replay_python
+from cs2_elo_tracker.archive import jsonl_to_archive, open_archive, read_archive, player_totals
+from cs2_elo_tracker.balancer import balance_teams, load_elos, get_balanced_teams
+from cs2_elo_tracker.seasons import enable_seasons, closed_seasons, season_standings, soft_reset
+from cs2_elo_tracker.draft import DraftSession, MAX_POOL
+from cs2_elo_tracker.engines import rating_file
+from cs2_elo_tracker.synergy import pair_stats_file, load_pair_stats, update_pair_stats
+from cs2_elo_tracker.player_stats import player_stats_file, load_player_stats, update_player_stats
+from cs2_elo_tracker import storage
+
+# Upper bound for --repeats (benchmarks that consume fresh input per run)
+MAX_REPEATS = 100
+
+class BenchContext:
+    """Files shared by all benchmarks of one run"""
+    def __init__(self, workdir: Path, num_matches: int, num_players: int, seed: int):
+        self.workdir = workdir
+        self.num_matches = num_matches
+        self.num_players = num_players
+        self.seed = seed
+        self.history_file = generate_history(workdir / "history.txt", num_matches, num_players, seed)
+        self.alias_file = workdir / "aliases.json"
+        self.initial_elo_file = workdir / "initial_elos.json"
+        self.matches_file = workdir / "cs_matches.jsonl"
+        self.elo_file = workdir / "player_elos.json"
+        self.archive_file = workdir / "cs_matches.cs2a"
+        save_json(self.alias_file, {})
+        save_json(self.initial_elo_file, {})
+
+    def ensure_matches(self):
+        if not self.matches_file.exists():
+            parse_and_save(str(self.history_file), self.matches_file, self.alias_file)
+
+    def ensure_archive(self):
+        self.ensure_matches()
+        if not self.archive_file.exists():
+            jsonl_to_archive(self.matches_file, self.archive_file)
+
+    def ensure_elos(self):
+        self.ensure_matches()
+        if not self.elo_file.exists():
+            calculate_elos(self.matches_file, self.elo_file,
+                           initial_elo_file=self.initial_elo_file, alias_file=self.alias_file)
+
+def bench_parse(ctx: BenchContext):
+    content = ctx.history_file.read_text(encoding='utf-8')
+    def run():
+        parse_matches_from_text(content)
+    return run, ctx.num_matches
+
+def bench_dedup_save(ctx: BenchContext):
+    output = ctx.workdir / "dedup_matches.jsonl"
+    def run():
+        if output.exists():
+            output.unlink()
+        parse_and_save(str(ctx.history_file), output, ctx.alias_file)
+    return run, ctx.num_matches
+
+def bench_dedup_existing(ctx: BenchContext):
+    ctx.ensure_matches()
+    def run():
+        parse_and_save(str(ctx.history_file), ctx.matches_file, ctx.alias_file)
+    return run, ctx.num_matches
+
+def bench_ingest_one(ctx: BenchContext):
+    """Paste one new match into the full database, ratings updated from the replay state"""
+    ctx.ensure_elos()
+    # Newer than the generated history, oldest first, so ratings update incrementally
+    blocks = list(iter_match_blocks(MAX_REPEATS, ctx.num_players, ctx.seed + 1, datetime(2026, 6, 30)))
+    pastes = iter(['\n'.join(lines) for lines in reversed(blocks)])
+    def run():
+        ingest_text(next(pastes), ctx.matches_file, ctx.alias_file)
+    return run, 1
+
+def bench_load_jsonl(ctx: BenchContext):
+    ctx.ensure_matches()
+    def run():
+        load_jsonl(ctx.matches_file)
+    return run, ctx.num_matches
+
+def bench_load_archive(ctx: BenchContext):
+    """Archive decoded into the same match dicts as load_jsonl"""
+    ctx.ensure_archive()
+    def run():
+        read_archive(ctx.archive_file)
+    return run, ctx.num_matches
+
+def bench_archive_columns(ctx: BenchContext):
+    """Replay encoding and per-player totals straight from the mapped columns"""
+    ctx.ensure_archive()
+    def run():
+        with open_archive(ctx.archive_file) as archive:
+            EncodedHistory.from_archive(archive)
+            player_totals(archive)
+    return run, ctx.num_matches
+
+def bench_elo_replay(ctx: BenchContext):
+    ctx.ensure_matches()
+    def run():
+        calculate_elos(ctx.matches_file, ctx.workdir / "bench_elos.json",
+                       initial_elo_file=ctx.initial_elo_file, alias_file=ctx.alias_file)
+    return run, ctx.num_matches
+
+# Parameter sets for the batch replay comparison
+BATCH_K_FACTORS = [8, 16, 24, 32, 40, 48, 56, 64] * 2
+BATCH_INITIAL_ELOS = [1000] * 8 + [1200] * 8
+
+def bench_elo_loop(ctx: BenchContext):
+    ctx.ensure_matches()
+    matches, custom = load_match_history(ctx.matches_file, ctx.initial_elo_file, ctx.alias_file)
+    def run():
+        replay_python(matches, BATCH_K_FACTORS, BATCH_INITIAL_ELOS, custom)
+    return run, ctx.num_matches * len(BATCH_K_FACTORS)
+
+def bench_elo_batch(ctx: BenchContext):
+    ctx.ensure_matches()
+    matches, custom = load_match_history(ctx.matches_file, ctx.initial_elo_file, ctx.alias_file)
+    # Check the vectorized standings against the Python engine once
+    result = replay_batch(EncodedHistory(matches), BATCH_K_FACTORS, BATCH_INITIAL_ELOS, custom)
+    reference = replay_python(matches, BATCH_K_FACTORS, BATCH_INITIAL_ELOS, custom)
+    if [result.standings(i) for i in range(len(BATCH_K_FACTORS))] != reference:
+        raise AssertionError("Batch replay standings differ from EloSystem")
+    def run():
+        replay_batch(EncodedHistory(matches), BATCH_K_FACTORS, BATCH_INITIAL_ELOS, custom)
+    return run, ctx.num_matches * len(BATCH_K_FACTORS)
+
+def _bench_engine(engine: str):
+    def setup(ctx: BenchContext):
+        ctx.ensure_matches()
+        matches, custom = load_match_history(ctx.matches_file, ctx.initial_elo_file, ctx.alias_file)
+        def run():
+            create_engine(engine, custom_initial_elos=custom).process_matches(matches)
+        return run, ctx.num_matches
+    return setup
+
+def bench_balance(ctx: BenchContext):
+    ctx.ensure_elos()
+    elos = load_elos(ctx.elo_file)
+    names = list(elos)
+    rng = random.Random(ctx.seed)
+    rosters = [rng.sample(names, 10) for _ in range(50)]
+    def run():
+        for roster in rosters:
+            balance_teams(roster, elos)
+    return run, len(rosters)
+
+def bench_draft(ctx: BenchContext):
+    """Full captain drafts of 16-player pools, suggestions after every pick (one item per suggestion)"""
+    ctx.ensure_elos()
+    elos = load_elos(ctx.elo_file)
+    rng = random.Random(ctx.seed)
+    pools = [rng.sample(list(elos), MAX_POOL) for _ in range(5)]
+    def run():
+        for pool in pools:
+            session = DraftSession(pool, elos, (pool[0], pool[1]), order='snake')
+            while not session.is_complete:
+                session.pick(session.suggest())
+    return run, len(pools) * 8
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'dedup_save': bench_dedup_save,
+    'dedup_existing': bench_dedup_existing,
+    'ingest_one': bench_ingest_one,
+    'load_jsonl': bench_load_jsonl,
+    'load_archive': bench_load_archive,
+    'archive_columns': bench_archive_columns,
+    'elo_replay': bench_elo_replay,
+    'elo_loop': bench_elo_loop,
+    'elo_batch': bench_elo_batch,
+    'engine_elo': _bench_engine('elo'),
+    'engine_performance': _bench_engine('performance'),
+    'engine_glicko2': _bench_engine('glicko2'),
+    'engine_trueskill': _bench_engine('trueskill'),
+    'balance': bench_balance,
+    'draft': bench_draft,
+}
+
+def time_benchmark(setup, ctx: BenchContext, repeats: int) -> dict:
+    run, items = setup(ctx)
+    timings = []
+    for _ in range(repeats):
+        # Measure the cold path: nothing served from the data file cache
+        invalidate_data_cache()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        'best_s': round(best, 6),
+        'mean_s': round(sum(timings) / len(timings), 6),
+        'repeats': repeats,
+        'items': items,
+        'items_per_s': round(items / best, 2) if best > 0 else None
+    }
+
+# Child process scripts for --memory; each prints its peak RSS in KiB
+MEMORY_LOADERS = {
+    'jsonl': "from cs2_elo_tracker.utils import load_jsonl; data = load_jsonl(path)",
+    'archive': "from cs2_elo_tracker.archive import read_archive; data = read_archive(path)",
+    'archive_columns': (
+        "from cs2_elo_tracker.archive import open_archive, player_totals\n"
+        "from cs2_elo_tracker.batch_elo import EncodedHistory\n"
+        "archive = open_archive(path); data = (EncodedHistory.from_archive(archive), player_totals(archive))"
+    ),
+}
+
+# ru_maxrss keeps the parent's peak across fork/exec, so Linux's VmHWM is preferred
+_MEMORY_SCRIPT = """
+import resource, sys
+from pathlib import Path
+import cs2_elo_tracker.elo
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM:'))
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+path = Path(sys.argv[1])
+before = peak_rss()
+{loader}
+print(before, peak_rss())
+"""
+
+def measure_memory(ctx: BenchContext) -> dict:
+    """Peak RSS added by loading the history in each format, and the file sizes"""
+    ctx.ensure_archive()
+    results = {}
+    for name, loader in MEMORY_LOADERS.items():
+        path = ctx.matches_file if name == 'jsonl' else ctx.archive_file
+        output = subprocess.run(
+            [sys.executable, '-c', _MEMORY_SCRIPT.format(loader=loader), str(path)],
+            capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.split()
+        before, peak = (int(v) for v in output)
+        results[name] = {
+            'file_bytes': path.stat().st_size,
+            'peak_rss_kib': peak,
+            'load_rss_kib': peak - before
+        }
+    return results
+
+def _pastes(ctx: BenchContext, count: int, per_paste: int = 1) -> list:
+    """Pastes newer than the generated history, oldest first"""
+    blocks = list(reversed(list(iter_match_blocks(
+        count * per_paste, ctx.num_players, ctx.seed + 1, datetime(2026, 6, 30)
+    ))))
+    return ['\n'.join('\n'.join(lines) for lines in blocks[i:i + per_paste])
+            for i in range(0, len(blocks), per_paste)]
+
+def measure_writes(ctx: BenchContext, pastes: int = 20) -> dict:
+    """Bytes written per byte of new match records when ingesting single-match pastes"""
+    ctx.ensure_elos()
+    workdir = ctx.workdir / "writes"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir()
+    matches_file = workdir / ctx.matches_file.name
+    shutil.copy(ctx.matches_file, matches_file)
+    calculate_elos(matches_file, workdir / "player_elos.json", alias_file=ctx.alias_file)
+
+    payload = matches_file.stat().st_size
+    storage.reset_write_stats()
+    start = time.perf_counter()
+    for paste in _pastes(ctx, pastes):
+        ingest_text(paste, matches_file, ctx.alias_file)
+    elapsed = time.perf_counter() - start
+    payload = matches_file.stat().st_size - payload
+    stats = storage.write_stats()
+
+    # Frozen seasons are stored as archives, optionally gzip-compressed
+    compressed = ctx.workdir / "cs_matches.cs2a.gz"
+    ctx.ensure_archive()
+    jsonl_to_archive(ctx.matches_file, compressed)
+    return {
+        'ingests': pastes,
+        'payload_bytes': payload,
+        'written_bytes': stats['bytes'],
+        'amplification': round(stats['bytes'] / payload, 2) if payload else None,
+        'fsyncs_per_ingest': round(stats['fsyncs'] / pastes, 2),
+        'commits': stats['commits'],
+        'ms_per_ingest': round(elapsed / pastes * 1000, 2),
+        'by_file': stats['by_file'],
+        'archive_bytes': ctx.archive_file.stat().st_size,
+        'archive_gz_bytes': compressed.stat().st_size
+    }
+
+# Child process for --crash-check: exits (as if killed) right before durable step N
+_CRASH_SCRIPT = """
+import os, sys
+from pathlib import Path
+crash_at = int(sys.argv[2])
+steps = 0
+def step(fn):
+    def wrapper(*args, **kwargs):
+        global steps
+        steps += 1
+        if steps == crash_at:
+            os._exit(3)
+        return fn(*args, **kwargs)
+    return wrapper
+os.fsync, os.replace, os.unlink = step(os.fsync), step(os.replace), step(os.unlink)
+from cs2_elo_tracker.ingest import ingest_text
+ingest_text(Path(sys.argv[3]).read_text(encoding='utf-8'), Path(sys.argv[1]) / "cs_matches.jsonl")
+print(steps)
+"""
+
+def _snapshot(directory: Path) -> dict:
+    """Contents of every data file, without leftover temporary files"""
+    return {
+        str(path.relative_to(directory)): path.read_bytes()
+        for path in sorted(directory.rglob('*'))
+        if path.is_file() and not path.name.endswith(storage.TEMP_SUFFIX)
+    }
+
+def crash_check(ctx: BenchContext) -> dict:
+    """Crash an ingest at every durable step and verify recovery is all-or-nothing"""
+    scenarios = {}
+    for name, seasons in (('ingest', False), ('season_close', True)):
+        base = ctx.workdir / f"crash_{name}"
+        shutil.rmtree(base, ignore_errors=True)
+        base.mkdir()
+        history = generate_history(ctx.workdir / "crash_history.txt", 200, ctx.num_players, ctx.seed)
+        parse_and_save(str(history), base / "cs_matches.jsonl")
+        calculate_elos(base / "cs_matches.jsonl", base / "player_elos.json")
+        if seasons:
+            enable_seasons(base / "cs_matches.jsonl")
+        paste = ctx.workdir / "crash_paste.txt"
+        paste.write_text(_pastes(ctx, 1, per_paste=5)[0], encoding='utf-8')
+        before = _snapshot(base)
+
+        run_dir = ctx.workdir / "crash_run"
+        outcomes = {'rolled_back': 0, 'rolled_forward': 0, 'inconsistent': 0}
+        after = None
+        crash_at = 1
+        while True:
+            shutil.rmtree(run_dir, ignore_errors=True)
+            shutil.copytree(base, run_dir)
+            child = subprocess.run(
+                [sys.executable, '-c', _CRASH_SCRIPT, str(run_dir), str(crash_at), str(paste)],
+                capture_output=True, text=True, cwd=Path(__file__).parent
+            )
+            if child.returncode == 0:
+                after = _snapshot(run_dir)
+                steps = crash_at - 1
+                break
+            if child.returncode != 3:
+                raise RuntimeError(f"Crash check child failed:\n{child.stderr}")
+            storage.recover(run_dir)
+            outcomes[f"crash_{crash_at}"] = _snapshot(run_dir)
+            crash_at += 1
+
+        for key in [k for k in outcomes if k.startswith('crash_')]:
+            state = outcomes.pop(key)
+            if state == before:
+                outcomes['rolled_back'] += 1
+            elif state == after:
+                outcomes['rolled_forward'] += 1
+            else:
+                outcomes['inconsistent'] += 1
+        scenarios[name] = {'steps': steps, 'files_changed': len(set(after.items()) - set(before.items())),
+                           **outcomes}
+    return scenarios
+
+def _scrim(date: str, team1: list, team2: list) -> dict:
+    """Minimal decided match between two lists of player names"""
+    def players(names, kills):
+        return [{'name': name, 'kills': kills, 'deaths': 20 - kills} for name in names]
+    return {
+        'date': date, 'map': 'Mirage', 'team1_score': 13, 'team2_score': 7, 'winning_team': 1,
+        'team1_players': players(team1, 15), 'team2_players': players(team2, 5)
+    }
+
+def season_check(ctx: BenchContext) -> dict:
+    """Close seasons over a history where one player sits out a quarter"""
+    workdir = ctx.workdir / "season_check"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir()
+    matches_file = workdir / "cs_matches.jsonl"
+    save_jsonl(matches_file, [
+        _scrim('2024-01-10 20:00:00', ['Gap', 'A'], ['B', 'C']),
+        _scrim('2024-02-10 20:00:00', ['Gap', 'B'], ['A', 'C']),
+        _scrim('2024-04-10 20:00:00', ['A', 'B'], ['C', 'D']),
+        _scrim('2024-07-10 20:00:00', ['Gap', 'D'], ['A', 'C']),
+    ])
+    initial_elo_file = workdir / "initial_elos.json"
+    alias_file = workdir / "player_aliases.json"
+    enable_seasons(matches_file, initial_elo_file=initial_elo_file, alias_file=alias_file)
+
+    # Gap skipped Q2, so Q3 starts from a soft reset of their Q1 rating
+    last = {row['name']: row['elo'] for row in season_standings('2024-Q2', matches_file)}
+    last['Gap'] = next(row['elo'] for row in season_standings('2024-Q1', matches_file) if row['name'] == 'Gap')
+    expected = soft_reset(last, 0.5)['Gap']
+    stats = calculate_elos(matches_file, workdir / "player_elos.json", initial_elo_file=initial_elo_file,
+                           alias_file=alias_file)
+    start = next(row['initial_elo'] for row in stats if row['name'] == 'Gap')
+    checks = {'returning_after_gap': abs(start - expected) < 0.01}
+
+    # Records count all three of Gap's games, also after a rebuild from scratch
+    def games():
+        pairs = load_pair_stats(pair_stats_file(matches_file))
+        return (pairs.players.get(pairs.player_ids.get('Gap'), [0])[0],
+                load_player_stats(player_stats_file(matches_file)).summary('Gap')['games'])
+    checks['all_time_records'] = games() == (3, 3)
+    pair_stats_file(matches_file).unlink()
+    player_stats_file(matches_file).unlink()
+    invalidate_data_cache()
+    current = len(load_jsonl(matches_file))
+    update_pair_stats(pair_stats_file(matches_file), [], current, matches_file)
+    update_player_stats(player_stats_file(matches_file), [], current, matches_file)
+    checks['all_time_after_rebuild'] = games() == (3, 3)
+    return checks
+
+def workspace_check(ctx: BenchContext) -> dict:
+    """Ingest and close seasons through the CLI in a workspace; the default data must not change"""
+    root = Path(__file__).parent
+    app = ctx.workdir / "workspace_check"
+    shutil.rmtree(app, ignore_errors=True)
+    shutil.copytree(root / "cs2_elo_tracker", app / "cs2_elo_tracker",
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    shutil.copy(root / "run.py", app)
+    default_dir = app / "data"
+    default_dir.mkdir()
+    history = generate_history(app / "history.txt", 300, ctx.num_players, ctx.seed)
+    # A seed of the default community that must not reach the workspace's seasons
+    seeded = parse_matches_from_text(history.read_text(encoding='utf-8'))[0]['team1_players'][0]['name']
+    save_json(default_dir / "initial_elos.json", {seeded: 3000})
+    save_json(default_dir / "player_aliases.json", {})
+    before = _snapshot(default_dir)
+
+    command = [sys.executable, 'run.py', '--workspace', 'friday']
+    def run(*argv):
+        subprocess.run(command + list(argv), cwd=app, capture_output=True, text=True, check=True)
+    run('season', 'enable')
+    watcher = subprocess.Popen(command + ['watch', str(history), '--interval', '0.1', '--ci'],
+                               cwd=app, stdout=subprocess.PIPE, text=True)
+    for line in watcher.stdout:
+        if line.startswith('Parsed'):
+            break
+    watcher.send_signal(signal.SIGINT)
+    watcher.wait(timeout=60)
+    ratings_file = default_dir / "workspaces" / "friday" / "player_elos.json"
+    ratings = json.loads(ratings_file.read_text(encoding='utf-8')) if ratings_file.exists() else []
+    intervals = bool(ratings) and all('elo_ci_low' in row for row in ratings)
+    run('season', 'close')
+    run('season', 'list')
+
+    matches_file = default_dir / "workspaces" / "friday" / "cs_matches.jsonl"
+    seasons = closed_seasons(matches_file)
+    first = {row['name']: row for row in season_standings(seasons[0]['season'], matches_file)} if seasons else {}
+    after = {k: v for k, v in _snapshot(default_dir).items() if not k.startswith('workspaces')}
+    return {
+        'default_untouched': after == before,
+        'ingested': matches_file.exists() and bool(seasons),
+        'own_seeds': seeded in first and first[seeded]['initial_elo'] != 3000,
+        'watch_intervals': intervals
+    }
+
+class _TextStub:
+    """Stands in for a Tk text widget"""
+    def __init__(self):
+        self.text = ''
+    def delete(self, *args):
+        self.text = ''
+    def insert(self, index, text):
+        self.text += text
+
+def gui_check(ctx: BenchContext) -> dict:
+    """Refresh the alias and initial ELO editors from hand-edited files with syntax errors"""
+    # Imported here: needs tkinter, which the other benchmarks do not
+    from cs2_elo_tracker import main as gui
+    from cs2_elo_tracker.workspace import Workspace
+    workdir = ctx.workdir / "gui_check"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir()
+    workspace = Workspace('gui_check', workdir)
+    workspace.alias_file.write_text('{"smurf": "main",', encoding='utf-8')
+    workspace.initial_elo_file.write_text('{"main": 1200,,}', encoding='utf-8')
+
+    app = types.SimpleNamespace(workspace=workspace, alias_text=_TextStub(), initial_elo_text=_TextStub())
+    app._load_or_report = types.MethodType(gui.CS2EloTracker._load_or_report, app)
+    reported = []
+    showerror = gui.messagebox.showerror
+    gui.messagebox.showerror = lambda title, message: reported.append(message)
+    checks = {}
+    try:
+        for name, refresh, filepath in (
+            ('corrupt_aliases', gui.CS2EloTracker.refresh_aliases, workspace.alias_file),
+            ('corrupt_initial_elos', gui.CS2EloTracker.refresh_initial_elos, workspace.initial_elo_file),
+        ):
+            reported.clear()
+            try:
+                refresh(app)
+            except ValueError:
+                checks[name] = False
+                continue
+            checks[name] = len(reported) == 1 and str(filepath) in reported[0]
+    finally:
+        gui.messagebox.showerror = showerror
+    # The broken initial ELOs stay in the editor to be fixed
+    checks['corrupt_text_kept'] = app.initial_elo_text.text == '{"main": 1200,,}'
+    return checks
+
+def balance_check(ctx: BenchContext) -> dict:
+    """balanced_teams.json follows the last balanced roster across cache hits"""
+    ctx.ensure_elos()
+    workdir = ctx.workdir / "balance_check"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir()
+    elo_file = workdir / "player_elos.json"
+    shutil.copy(ctx.elo_file, elo_file)
+    names = sorted(load_elos(elo_file))
+    result_file = workdir / "balanced_teams.json"
+    checks = {}
+    for step, roster in (('a', names[:10]), ('b', names[10:20]), ('a_again', names[:10])):
+        best = get_balanced_teams(roster, elo_file, ctx.alias_file, pair_file=workdir / "pair_stats.json")[0]
+        saved = json.loads(result_file.read_text(encoding='utf-8'))
+        checks[f'saved_{step}'] = (saved['team1'], saved['team2']) == (best['team1'], best['team2'])
+    return checks
+
+def dedup_check(ctx: BenchContext) -> dict:
+    """Re-pasting a stored match is a no-op, an edited copy replaces it"""
+    workdir = ctx.workdir / "dedup_check"
+    shutil.rmtree(workdir, ignore_errors=True)
+    workdir.mkdir()
+    matches_file = workdir / "cs_matches.jsonl"
+    elo_file = rating_file('performance', workdir)
+    matches = [
+        _scrim('2024-01-10 20:00:00', ['A', 'B'], ['C', 'D']),
+        _scrim('2024-01-11 20:00:00', ['A', 'C'], ['B', 'D']),
+        _scrim('2024-01-12 20:00:00', ['A', 'D'], ['B', 'C']),
+    ]
+    ingest_matches(matches, matches_file, engine='performance')
+    stored = matches_file.read_bytes()
+    result = ingest_matches(copy.deepcopy(matches), matches_file, engine='performance')
+    checks = {'identical_ignored': (result['new'], result['replaced']) == (0, 0)
+              and matches_file.read_bytes() == stored}
+
+    # Same id (date, map, score, names), corrected scoreboard; the last copy wins
+    edited = copy.deepcopy(matches[1])
+    edited['team1_players'][0]['kills'] = 30
+    result = ingest_matches([edited, matches[1], edited], matches_file, engine='performance')
+    current = load_jsonl(matches_file)
+    checks['edited_replaced'] = (result['new'], result['replaced'], result['total']) == (0, 1, 3) \
+        and current[1] == edited and len(current) == 3
+    kills = load_player_stats(player_stats_file(matches_file)).field('A', 'kills')['total']
+    checks['records_rebuilt'] = kills == 15 + 30 + 15
+    calculate_elos(matches_file, workdir / "expected.json", engine='performance')
+    ratings = json.loads(elo_file.read_text(encoding='utf-8'))
+    expected = json.loads((workdir / "expected.json").read_text(encoding='utf-8'))
+    checks['ratings_recalculated'] = ratings == expected
+    return checks
+
+def check_failures(results: dict) -> list:
+    """Names of the failed checks: inconsistent crash recoveries and false results"""
+    failed = [f'crash_{name}' for name, outcome in results.get('crash_check', {}).items()
+              if outcome['inconsistent']]
+    for group in ('season', 'workspace', 'gui', 'balance', 'dedup'):
+        failed += [f'{group}_{name}' for name, passed in results.get(f'{group}_check', {}).items()
+                   if not passed]
+    return failed
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except OSError:
+        return ''
+
+def print_comparison(results: dict, baseline: dict):
+    print(f"{'benchmark':<20} {'baseline':>12} {'current':>12} {'ratio':>8}")
+    for name, current in results['results'].items():
+        old = baseline.get('results', {}).get(name)
+        if not old:
+            print(f"{name:<20} {'-':>12} {current['best_s']:>12.4f} {'-':>8}")
+            continue
+        ratio = current['best_s'] / old['best_s'] if old['best_s'] else float('inf')
+        print(f"{name:<20} {old['best_s']:>12.4f} {current['best_s']:>12.4f} {ratio:>7.2f}x")
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the CS2 ELO pipeline")
+    arg_parser.add_argument('--matches', type=int, default=1000, help="Synthetic matches (1k-1M)")
+    arg_parser.add_argument('--players', type=int, default=50, help="Player pool size")
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--repeats', type=int, default=3, choices=range(1, MAX_REPEATS + 1), metavar='N')
+    arg_parser.add_argument('--only', help="Comma-separated benchmark names")
+    arg_parser.add_argument('--output', help="Write JSON results to this file")
+    arg_parser.add_argument('--compare', help="Baseline JSON results to compare against")
+    arg_parser.add_argument('--memory', action='store_true', help="Also measure peak RSS of loading each format")
+    arg_parser.add_argument('--writes', action='store_true', help="Also measure write amplification of ingests")
+    arg_parser.add_argument('--crash-check', action='store_true',
+                            help="Crash an ingest at every durable step and check recovery")
+    arg_parser.add_argument('--season-check', action='store_true',
+                            help="Check season closes on a small hand-made history")
+    arg_parser.add_argument('--workspace-check', action='store_true',
+                            help="Check that CLI commands under --workspace leave the default data alone")
+    arg_parser.add_argument('--gui-check', action='store_true',
+                            help="Check that the GUI reports corrupt alias / initial ELO files")
+    arg_parser.add_argument('--balance-check', action='store_true',
+                            help="Check that balanced_teams.json follows cached balance results")
+    arg_parser.add_argument('--dedup-check', action='store_true',
+                            help="Check that re-pasted matches are skipped or replace the stored copy")
+    args = arg_parser.parse_args()
+
+    names = args.only.split(',') if args.only else list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        arg_parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ctx = BenchContext(Path(tmp), args.matches, args.players, args.seed)
+        results = {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'params': {
+                'matches': args.matches,
+                'players': args.players,
+                'seed': args.seed,
+                'repeats': args.repeats
+            },
+            'results': {}
+        }
+        for name in names:
+            results['results'][name] = time_benchmark(BENCHMARKS[name], ctx, args.repeats)
+            print(f"{name:<20} {results['results'][name]['best_s']:.4f}s", file=sys.stderr)
+        if args.memory:
+            results['memory'] = measure_memory(ctx)
+            for name, memory in results['memory'].items():
+                print(f"{name:<20} {memory['load_rss_kib'] / 1024:.1f} MiB loaded, "
+                      f"{memory['file_bytes'] / 1024 ** 2:.1f} MiB file", file=sys.stderr)
+        if args.writes:
+            writes = results['writes'] = measure_writes(ctx)
+            print(f"{'writes':<20} {writes['amplification']}x amplification, "
+                  f"{writes['fsyncs_per_ingest']} fsyncs and {writes['ms_per_ingest']} ms per ingest", file=sys.stderr)
+        if args.crash_check:
+            results['crash_check'] = crash_check(ctx)
+            for name, outcome in results['crash_check'].items():
+                print(f"{'crash_' + name:<20} {outcome['steps']} steps: {outcome['rolled_back']} rolled back, "
+                      f"{outcome['rolled_forward']} rolled forward, {outcome['inconsistent']} inconsistent",
+                      file=sys.stderr)
+        if args.season_check:
+            results['season_check'] = season_check(ctx)
+            for name, passed in results['season_check'].items():
+                print(f"{'season_' + name:<20} {'ok' if passed else 'FAILED'}", file=sys.stderr)
+        if args.workspace_check:
+            results['workspace_check'] = workspace_check(ctx)
+            for name, passed in results['workspace_check'].items():
+                print(f"{'workspace_' + name:<20} {'ok' if passed else 'FAILED'}", file=sys.stderr)
+        if args.gui_check:
+            results['gui_check'] = gui_check(ctx)
+            for name, passed in results['gui_check'].items():
+                print(f"{'gui_' + name:<20} {'ok' if passed else 'FAILED'}", file=sys.stderr)
+        if args.balance_check:
+            results['balance_check'] = balance_check(ctx)
+            for name, passed in results['balance_check'].items():
+                print(f"{'balance_' + name:<20} {'ok' if passed else 'FAILED'}", file=sys.stderr)
+        if args.dedup_check:
+            results['dedup_check'] = dedup_check(ctx)
+            for name, passed in results['dedup_check'].items():
+                print(f"{'dedup_' + name:<20} {'ok' if passed else 'FAILED'}", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            print_comparison(results, json.load(f))
+    failed = check_failures(results)
+    if failed:
+        print(f"FAILED: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
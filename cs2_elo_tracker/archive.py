@@ -0,0 +1,284 @@
+"""Compact binary match archive, read through mmap.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header    magic b'CS2A', version, counts and section offsets (HEADER)
+    strings   (num_strings + 1) uint32 offsets into the UTF-8 blob, then the blob
+    matches   one MATCH_RECORD per match, oldest first
+    players   one PLAYER_RECORD per scoreboard row, in match order
+
+Player names, maps, dates and durations are stored once in the string
+table and referenced by index. Matches are sorted by date when the archive
+is written, so readers do not sort. Missing optional fields are stored as
+NO_STRING / -1 and left out again when a match is decoded; fields the
+parser does not produce are not kept.
+
+`MatchArchive` decodes matches into the usual dicts on demand, and with
+NumPy `match_table()` / `player_table()` are structured arrays over the
+mapped file (no copy). Vectorized replays (`batch_elo.encode_history`:
+tuning and bootstrap intervals) and `player_totals` work on those
+columns; the sequential rating engines decode every match.
+A `.cs2a.gz` archive is gzip-compressed and read into memory instead.
+"""
+import mmap
+import struct
+from itertools import islice
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .utils import invalidate_data_cache, load_jsonl, save_jsonl, after_commit
+from .parser import parse_date
+from . import profiling, storage
+
+MAGIC = b'CS2A'
+VERSION = 1
+ARCHIVE_SUFFIX = '.cs2a'
+
+# magic, version, flags, matches, player rows, strings, strings / matches / players offsets
+HEADER = struct.Struct('<4sHHIII4xQQQ')
+# date, map, wait time, duration, first player row, team sizes, scores, winning team
+MATCH_RECORD = struct.Struct('<IIIIIBBhhbx')
+# name, ping, kills, assists, deaths, MVP stars, headshot %, score
+PLAYER_RECORD = struct.Struct('<Ihhhhhhi')
+_OFFSET = struct.Struct('<I')
+
+NO_STRING = 0xFFFFFFFF
+PLAYER_FIELDS = ('ping', 'kills', 'assists', 'deaths', 'mvp_stars', 'headshot_percentage', 'score')
+_PLAYER_KEYS = ('name',) + PLAYER_FIELDS
+_MATCH_STRINGS = ('date', 'map', 'wait_time', 'match_duration')
+
+if np is not None:
+    MATCH_DTYPE = np.dtype([
+        ('date', '<u4'), ('map', '<u4'), ('wait_time', '<u4'), ('match_duration', '<u4'),
+        ('first_player', '<u4'), ('team1_size', 'u1'), ('team2_size', 'u1'),
+        ('team1_score', '<i2'), ('team2_score', '<i2'), ('winning_team', 'i1'), ('pad', 'V1')
+    ])
+    PLAYER_DTYPE = np.dtype(
+        [('name', '<u4')] + [(field, '<i2') for field in PLAYER_FIELDS[:-1]] + [('score', '<i4')]
+    )
+
+def is_archive(filepath: Path) -> bool:
+    """Whether a path names an archive (.cs2a, or .cs2a.gz compressed)"""
+    suffixes = Path(filepath).suffixes
+    return suffixes[-1:] == [ARCHIVE_SUFFIX] or suffixes[-2:] == [ARCHIVE_SUFFIX, '.gz']
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+class _StringTable:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.strings: List[str] = []
+
+    def intern(self, value: str) -> int:
+        if value is None:
+            return NO_STRING
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def encode(self) -> bytes:
+        blobs = [s.encode('utf-8') for s in self.strings]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+        return struct.pack(f'<{len(offsets)}I', *offsets) + b''.join(blobs)
+
+def _optional(value) -> int:
+    return -1 if value is None else value
+
+@profiling.profiled('archive.write')
+def write_archive(matches: Iterable[Dict[str, Any]], filepath: Path) -> int:
+    """Write matches (any order) to an archive; returns the number written"""
+    matches = sorted(matches, key=lambda m: parse_date(m.get('date', '')))
+    strings = _StringTable()
+    match_rows = bytearray()
+    player_rows = bytearray()
+    num_players = 0
+    try:
+        for match in matches:
+            team1 = match.get('team1_players', [])
+            team2 = match.get('team2_players', [])
+            match_rows += MATCH_RECORD.pack(
+                *(strings.intern(match.get(field)) for field in _MATCH_STRINGS),
+                num_players, len(team1), len(team2),
+                _optional(match.get('team1_score')), _optional(match.get('team2_score')),
+                _optional(match.get('winning_team'))
+            )
+            for player in team1 + team2:
+                player_rows += PLAYER_RECORD.pack(
+                    strings.intern(player['name']),
+                    *(_optional(player.get(field, 0)) for field in PLAYER_FIELDS)
+                )
+            num_players += len(team1) + len(team2)
+    except struct.error as e:
+        raise ValueError(f"Match does not fit the archive format: {e}") from e
+
+    string_table = strings.encode()
+    strings_offset = _align(HEADER.size)
+    matches_offset = _align(strings_offset + len(string_table))
+    players_offset = _align(matches_offset + len(match_rows))
+    header = HEADER.pack(
+        MAGIC, VERSION, 0, len(matches), num_players, len(strings.strings),
+        strings_offset, matches_offset, players_offset
+    )
+
+    data = bytearray()
+    for offset, section in ((0, header), (strings_offset, string_table),
+                            (matches_offset, match_rows), (players_offset, player_rows)):
+        data += b'\0' * (offset - len(data))
+        data += section
+    storage.write_file(filepath, bytes(data))
+    after_commit(lambda: invalidate_data_cache(filepath))
+    return len(matches)
+
+class MatchArchive:
+    """Read-only view of an archive file; use as a context manager"""
+    def __init__(self, filepath: Path):
+        self.filepath = Path(filepath)
+        pending = storage.staged(self.filepath)
+        if pending is not None and pending.contents is not None:
+            # Written in this thread's open transaction
+            self._mm = bytes(pending.contents)
+        elif storage.is_compressed(self.filepath):
+            self._mm = storage.read_bytes(self.filepath)
+        else:
+            with open(self.filepath, 'rb') as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        try:
+            (magic, version, _, self.num_matches, self.num_players, num_strings,
+             strings_offset, self._matches_offset, self._players_offset) = HEADER.unpack_from(self._view)
+        except struct.error:
+            magic = version = None
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.filepath} is not a version {VERSION} match archive")
+
+        self._strings_offset = strings_offset
+        self._blob_offset = strings_offset + 4 * (num_strings + 1)
+        self._strings: List[str] = [None] * num_strings
+
+    def string(self, string_id: int) -> str:
+        """Entry of the string table (decoded once)"""
+        if string_id == NO_STRING:
+            return None
+        value = self._strings[string_id]
+        if value is None:
+            start = _OFFSET.unpack_from(self._view, self._strings_offset + 4 * string_id)[0]
+            end = _OFFSET.unpack_from(self._view, self._strings_offset + 4 * string_id + 4)[0]
+            value = self._strings[string_id] = str(
+                self._view[self._blob_offset + start:self._blob_offset + end], 'utf-8'
+            )
+        return value
+
+    def _players(self, rows: Iterable[tuple]) -> List[Dict[str, Any]]:
+        players = []
+        for row in rows:
+            player = dict(zip(_PLAYER_KEYS, row))
+            player['name'] = self.string(row[0])
+            if row[6] < 0:
+                player['headshot_percentage'] = None
+            players.append(player)
+        return players
+
+    def _match(self, record: tuple, rows: Iterator[tuple]) -> Dict[str, Any]:
+        """Match dict from a match record and an iterator positioned at its first player row"""
+        *string_ids, _, size1, size2, score1, score2, winner = record
+        match = {}
+        for field, string_id in zip(_MATCH_STRINGS, string_ids):
+            if string_id != NO_STRING:
+                match[field] = self.string(string_id)
+        match['team1_players'] = self._players(islice(rows, size1))
+        if score1 >= 0 and score2 >= 0:
+            match['team1_score'] = score1
+            match['team2_score'] = score2
+        match['team2_players'] = self._players(islice(rows, size2))
+        if winner >= 0:
+            match['winning_team'] = winner
+        return match
+
+    def match(self, index: int) -> Dict[str, Any]:
+        """Decode one match into the dict produced by the parser"""
+        if not 0 <= index < self.num_matches:
+            raise IndexError(index)
+        record = MATCH_RECORD.unpack_from(self._view, self._matches_offset + index * MATCH_RECORD.size)
+        start = self._players_offset + record[4] * PLAYER_RECORD.size
+        end = start + (record[5] + record[6]) * PLAYER_RECORD.size
+        return self._match(record, PLAYER_RECORD.iter_unpack(self._view[start:end]))
+
+    def __len__(self) -> int:
+        return self.num_matches
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        matches_end = self._matches_offset + self.num_matches * MATCH_RECORD.size
+        players_end = self._players_offset + self.num_players * PLAYER_RECORD.size
+        # Player rows are stored in match order, so one pass over each section
+        rows = PLAYER_RECORD.iter_unpack(self._view[self._players_offset:players_end])
+        for record in MATCH_RECORD.iter_unpack(self._view[self._matches_offset:matches_end]):
+            yield self._match(record, rows)
+
+    def match_table(self) -> "np.ndarray":
+        """Structured array of the match records, backed by the mapped file"""
+        return np.frombuffer(self._mm, MATCH_DTYPE, self.num_matches, self._matches_offset)
+
+    def player_table(self) -> "np.ndarray":
+        """Structured array of the player records, backed by the mapped file"""
+        return np.frombuffer(self._mm, PLAYER_DTYPE, self.num_players, self._players_offset)
+
+    def close(self):
+        self._view.release()
+        if not isinstance(self._mm, mmap.mmap):
+            return
+        try:
+            self._mm.close()
+        except BufferError:
+            # Arrays from match_table() / player_table() are still alive;
+            # the mapping is released when they are
+            pass
+
+    def __enter__(self) -> "MatchArchive":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_archive(filepath: Path) -> MatchArchive:
+    return MatchArchive(filepath)
+
+@profiling.profiled('archive.read')
+def read_archive(filepath: Path) -> List[Dict[str, Any]]:
+    """All matches of an archive as dicts, oldest first"""
+    with open_archive(filepath) as archive:
+        return list(archive)
+
+def jsonl_to_archive(jsonl_file: Path, archive_file: Path) -> int:
+    """Convert a JSONL match database to an archive"""
+    return write_archive(load_jsonl(Path(jsonl_file)), Path(archive_file))
+
+def archive_to_jsonl(archive_file: Path, jsonl_file: Path) -> int:
+    """Convert an archive back to a JSONL match database (oldest first)"""
+    matches = read_archive(Path(archive_file))
+    save_jsonl(Path(jsonl_file), matches)
+    return len(matches)
+
+def player_totals(archive: MatchArchive) -> Dict[str, Dict[str, int]]:
+    """Scoreboard rows and field totals per player, summed over the mapped columns"""
+    if np is None:
+        raise ImportError("NumPy is required for column aggregations (pip install numpy)")
+    players = archive.player_table()
+    names, inverse = np.unique(players['name'], return_inverse=True)
+    totals = {'games': np.bincount(inverse, minlength=len(names))}
+    for field in ('kills', 'assists', 'deaths', 'mvp_stars', 'score'):
+        totals[field] = np.bincount(inverse, weights=players[field], minlength=len(names))
+    return {
+        archive.string(int(name_id)): {field: int(values[i]) for field, values in totals.items()}
+        for i, name_id in enumerate(names)
+    }
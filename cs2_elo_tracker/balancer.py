@@ -1,16 +1,115 @@
+import copy
+import math
+import os
+import threading
 from typing import List, Dict, Tuple
+from collections import OrderedDict
 from itertools import combinations
 from pathlib import Path
 
-from .utils import DATA_DIR, load_json, save_json, load_aliases, normalize_name
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
 
-def load_elos(filepath: Path = None) -> Dict[str, float]:
-    """Load ELO ratings from file"""
+from .utils import (
+    DATA_DIR, load_json, save_json, file_signature
+)
+from .engines import rating_file
+from .names import load_name_index
+from .synergy import pair_stats_file, load_pair_stats
+from . import profiling
+
+# Balance result cache (LRU), keyed by roster, team size, rating source and rating version
+BALANCE_CACHE_SIZE = 64
+_balance_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+_balance_cache_lock = threading.Lock()
+_balance_cache_stats = {'hits': 0, 'misses': 0}
+# Rating version of each data directory, bumped when its ratings are recalculated
+_ratings_generations: Dict[str, int] = {}
+_last_saved_results: Dict[str, Dict] = {}
+
+def invalidate_balance_cache(filepath: Path = None):
+    """Drop memoized balance results for the rating files next to `filepath`
+    (called when ratings are recalculated), or all results if no path is given"""
+    with _balance_cache_lock:
+        if filepath is None:
+            for directory in _ratings_generations:
+                _ratings_generations[directory] += 1
+            _balance_cache.clear()
+            return
+        directory = str(Path(filepath).parent.resolve())
+        _ratings_generations[directory] = _ratings_generations.get(directory, 0) + 1
+        for key in [k for k in _balance_cache if os.path.dirname(k[2]) == directory]:
+            del _balance_cache[key]
+
+def purge_balance_cache(directory: Path):
+    """Drop memoized results for rating files under a directory"""
+    prefix = os.path.join(str(Path(directory).resolve()), '')
+    with _balance_cache_lock:
+        for key in [k for k in _balance_cache if k[2].startswith(prefix)]:
+            del _balance_cache[key]
+        for path in [p for p in _last_saved_results if str(Path(p).resolve()).startswith(prefix)]:
+            del _last_saved_results[path]
+
+def balance_cache_info() -> Dict[str, int]:
+    """Return hit/miss counters and current size of the balance result cache"""
+    with _balance_cache_lock:
+        return {
+            'hits': _balance_cache_stats['hits'],
+            'misses': _balance_cache_stats['misses'],
+            'size': len(_balance_cache),
+            'maxsize': BALANCE_CACHE_SIZE
+        }
+
+# Games a player needs on a map before their per-map Elo replaces the global one
+MIN_MAP_GAMES = 3
+
+def load_elos(filepath: Path = None, map_name: str = None) -> Dict[str, float]:
+    """Load ELO ratings from file, optionally using per-map ratings where established"""
     if filepath is None:
         filepath = DATA_DIR / "player_elos.json"
     
     data = load_json(filepath, [])
-    return {player['name']: player['elo'] for player in data}
+    if not map_name:
+        return {player['name']: player['elo'] for player in data}
+    
+    elos = {}
+    for player in data:
+        map_elo = player.get('map_elos', {}).get(map_name)
+        if map_elo and map_elo['games'] >= MIN_MAP_GAMES:
+            elos[player['name']] = map_elo['elo']
+        else:
+            elos[player['name']] = player['elo']
+    return elos
+
+def load_elo_uncertainty(filepath: Path = None) -> Dict[str, float]:
+    """Standard error of each player's ELO, from the bootstrap intervals if present"""
+    if filepath is None:
+        filepath = DATA_DIR / "player_elos.json"
+    
+    return {
+        player['name']: (player['elo_ci_high'] - player['elo_ci_low']) / (2 * 1.96)
+        for player in load_json(filepath, [])
+        if 'elo_ci_low' in player
+    }
+
+def team_uncertainty(team: List[str], std_errors: Dict[str, float]) -> float:
+    """Standard error of a team's average ELO (players treated as independent)"""
+    return math.sqrt(sum(std_errors.get(p, 0) ** 2 for p in team)) / len(team)
+
+def known_maps(filepath: Path = None) -> List[str]:
+    """Maps that have per-map ratings in the rating file"""
+    if filepath is None:
+        filepath = DATA_DIR / "player_elos.json"
+    maps = set()
+    for player in load_json(filepath, []):
+        maps.update(player.get('map_elos', {}))
+    return sorted(maps)
+
+def team_average(team: List[str], elos: Dict[str, float]) -> float:
+    """Average ELO of a team (unknown players count as 1000)"""
+    return sum(elos.get(p, 1000) for p in team) / len(team)
 
 def calculate_team_balance(
     team1: List[str], 
@@ -18,22 +117,23 @@ def calculate_team_balance(
     elos: Dict[str, float]
 ) -> Tuple[float, float, float]:
     """Calculate team balance metrics"""
-    team1_elo = sum(elos.get(p, 1000) for p in team1) / len(team1)
-    team2_elo = sum(elos.get(p, 1000) for p in team2) / len(team2)
+    team1_elo = team_average(team1, elos)
+    team2_elo = team_average(team2, elos)
     difference = abs(team1_elo - team2_elo)
     return team1_elo, team2_elo, difference
 
-def balance_teams(
-    players: List[str], 
-    elos: Dict[str, float], 
-    team_size: int = 5
+def team_synergy(team: List[str], synergy: Dict[Tuple[str, str], float]) -> float:
+    """Sum of the pair synergies within a team"""
+    return sum(
+        synergy.get((a, b), 0) for i, a in enumerate(team) for b in team[i + 1:]
+    )
+
+def _balance_teams_python(
+    players: List[str],
+    player_elos: Dict[str, float],
+    team_size: int,
+    synergy: Dict[Tuple[str, str], float]
 ) -> List[Tuple[List[str], List[str], float, float, float]]:
-    """Find balanced team configurations"""
-    if len(players) != team_size * 2:
-        raise ValueError(f"Need exactly {team_size * 2} players, got {len(players)}")
-    
-    player_elos = {p: elos.get(p, 1000) for p in players}
-    
     all_combinations = []
     seen_matchups = set()
     
@@ -48,29 +148,161 @@ def balance_teams(
         seen_matchups.add(matchup_key)
         
         team1_elo, team2_elo, diff = calculate_team_balance(team1, team2, player_elos)
-        all_combinations.append((team1, team2, diff, team1_elo, team2_elo))
+        penalty = diff
+        if synergy:
+            penalty = abs(team1_elo + team_synergy(team1, synergy) - team2_elo - team_synergy(team2, synergy))
+        all_combinations.append((team1, team2, diff, team1_elo, team2_elo, penalty))
     
-    all_combinations.sort(key=lambda x: x[2])
+    all_combinations.sort(key=lambda x: x[5])
     
-    return all_combinations
+    return [c[:5] for c in all_combinations]
 
+_split_masks: Dict[Tuple[int, int], "np.ndarray"] = {}
+
+def _team1_indices(num_players: int, team_size: int) -> "np.ndarray":
+    """Team 1 member indices of every distinct split (team 1 always holds player 0)"""
+    key = (num_players, team_size)
+    if key not in _split_masks:
+        _split_masks[key] = np.array(
+            [(0,) + rest for rest in combinations(range(1, num_players), team_size - 1)],
+            dtype=np.intp
+        ).reshape(-1, team_size)
+    return _split_masks[key]
+
+def _balance_teams_numpy(
+    players: List[str],
+    player_elos: Dict[str, float],
+    team_size: int,
+    synergy: Dict[Tuple[str, str], float]
+) -> List[Tuple[List[str], List[str], float, float, float]]:
+    team1_idx = _team1_indices(len(players), team_size)
+    in_team1 = np.zeros((len(team1_idx), len(players)), dtype=bool)
+    np.put_along_axis(in_team1, team1_idx, True, axis=1)
+    team2_idx = np.nonzero(~in_team1)[1].reshape(len(team1_idx), team_size)
+    
+    elo = np.array([player_elos[p] for p in players], dtype=np.float64)
+    # Add players in roster order, like calculate_team_balance, so ties sort the same way
+    team1_sum = elo[team1_idx[:, 0]]
+    team2_sum = elo[team2_idx[:, 0]]
+    for c in range(1, team_size):
+        team1_sum = team1_sum + elo[team1_idx[:, c]]
+        team2_sum = team2_sum + elo[team2_idx[:, c]]
+    team1_elo = team1_sum / team_size
+    team2_elo = team2_sum / team_size
+    diff = np.abs(team1_elo - team2_elo)
+    
+    penalty = diff
+    if synergy:
+        s = np.array([[synergy.get((a, b), 0) for b in players] for a in players])
+        m1 = in_team1.astype(np.float64)
+        m2 = 1.0 - m1
+        team1_synergy = np.einsum('ci,ij,cj->c', m1, s, m1) / 2
+        team2_synergy = np.einsum('ci,ij,cj->c', m2, s, m2) / 2
+        penalty = np.abs(team1_elo + team1_synergy - team2_elo - team2_synergy)
+    
+    order = np.argsort(penalty, kind='stable')
+    return [
+        (
+            [players[i] for i in team1_idx[c]], [players[i] for i in team2_idx[c]],
+            float(diff[c]), float(team1_elo[c]), float(team2_elo[c])
+        )
+        for c in order.tolist()
+    ]
+
+def balance_teams(
+    players: List[str], 
+    elos: Dict[str, float], 
+    team_size: int = 5,
+    synergy: Dict[Tuple[str, str], float] = None
+) -> List[Tuple[List[str], List[str], float, float, float]]:
+    """Find balanced team configurations.
+    
+    With `synergy` ((a, b) -> Elo points, both orders present) splits are
+    ranked by the difference of average ELO plus in-team synergy, so strong
+    duos are not stacked; the reported difference stays the plain ELO one.
+    """
+    if len(players) != team_size * 2:
+        raise ValueError(f"Need exactly {team_size * 2} players, got {len(players)}")
+    
+    player_elos = {p: elos.get(p, 1000) for p in players}
+    
+    if np is None or len(set(players)) != len(players):
+        return _balance_teams_python(players, player_elos, team_size, synergy)
+    return _balance_teams_numpy(players, player_elos, team_size, synergy)
+
+@profiling.profiled('get_balanced_teams')
 def get_balanced_teams(
     player_names: List[str],
     elo_file: str = None,
     alias_file: str = None,
-    num_results: int = 5
+    num_results: int = 5,
+    engine: str = 'elo',
+    map_name: str = None,
+    synergy_weight: float = 0,
+    pair_file: str = None,
+    allow_unknown: bool = False
 ) -> List[Dict]:
-    """Get balanced team configurations for given players"""
+    """Get balanced team configurations for given players (on a given map, if known).
+    
+    Typed names are resolved with the fuzzy name index (names.py); unknown
+    or ambiguous names raise NameResolutionError unless allow_unknown lets
+    unknown ones in as new players. Each result lists the non-exact
+    matches under 'corrections'.
+    
+    A positive synergy_weight scales the teammate synergy from the pair
+    records that is counted against splits stacking strong duos.
+    """
     
     # Load data
-    aliases = load_aliases(Path(alias_file) if alias_file else None)
-    elos = load_elos(Path(elo_file) if elo_file else None)
+    elo_path = Path(elo_file) if elo_file else rating_file(engine)
+    
+    # Resolve typed names to canonical ones
+    with profiling.span('balance.resolve_names'):
+        normalized, corrections = load_name_index(elo_path, alias_file).resolve_all(
+            player_names, keep_unknown=allow_unknown
+        )
+    typed_as: Dict[str, set] = {}
+    for typed, name in zip(player_names, normalized):
+        typed_as.setdefault(name, set()).add(typed.strip())
+    collisions = sorted(name for name, typed in typed_as.items() if len(typed) > 1)
+    if collisions:
+        raise ValueError(f"Several typed names match {', '.join(collisions)}")
+    
+    # Check the result cache
+    team_size = 5
+    pair_path = Path(pair_file) if pair_file else pair_stats_file()
+    generation = _ratings_generations.get(str(elo_path.parent.resolve()), 0)
+    cache_key = (
+        tuple(sorted(normalized)), team_size, str(elo_path.resolve()),
+        file_signature(elo_path), generation, num_results, map_name or '',
+        synergy_weight, file_signature(pair_path) if synergy_weight else None
+    )
+    with _balance_cache_lock:
+        cached = _balance_cache.get(cache_key)
+        if cached is not None:
+            _balance_cache.move_to_end(cache_key)
+            _balance_cache_stats['hits'] += 1
+        else:
+            _balance_cache_stats['misses'] += 1
+    if cached is not None:
+        profiling.count('balance.cache_hits')
+        _save_best(elo_path, cached)
+        return _with_corrections(copy.deepcopy(cached), corrections)
+    profiling.count('balance.cache_misses')
     
-    # Normalize names
-    normalized = [normalize_name(name, aliases) for name in player_names]
+    elos = load_elos(elo_path, map_name)
+    std_errors = load_elo_uncertainty(elo_path)
+    
+    synergy = {}
+    if synergy_weight:
+        pair_stats = load_pair_stats(pair_path)
+        for i, a in enumerate(normalized):
+            for b in normalized[i + 1:]:
+                synergy[(a, b)] = synergy[(b, a)] = pair_stats.synergy(a, b) * synergy_weight
     
     # Get configurations
-    configs = balance_teams(normalized, elos)
+    with profiling.span('balance.search'):
+        configs = balance_teams(normalized, elos, team_size, synergy)
     
     results = []
     for i, (team1, team2, diff, t1_elo, t2_elo) in enumerate(configs[:num_results]):
@@ -88,9 +320,35 @@ def get_balanced_teams(
             'team1_elos': {p: round(elos.get(p, 1000), 2) for p in team1_sorted},
             'team2_elos': {p: round(elos.get(p, 1000), 2) for p in team2_sorted}
         })
+        if std_errors:
+            u1 = team_uncertainty(team1, std_errors)
+            u2 = team_uncertainty(team2, std_errors)
+            results[-1]['team1_elo_uncertainty'] = round(u1, 2)
+            results[-1]['team2_elo_uncertainty'] = round(u2, 2)
+            results[-1]['difference_uncertainty'] = round(math.hypot(u1, u2), 2)
+        if synergy:
+            results[-1]['team1_synergy'] = round(team_synergy(team1, synergy), 2)
+            results[-1]['team2_synergy'] = round(team_synergy(team2, synergy), 2)
     
-    # Save best config
-    if results:
-        save_json(DATA_DIR / "balanced_teams.json", results[0])
+    with _balance_cache_lock:
+        _balance_cache[cache_key] = copy.deepcopy(results)
+        while len(_balance_cache) > BALANCE_CACHE_SIZE:
+            _balance_cache.popitem(last=False)
     
+    _save_best(elo_path, results)
+    return _with_corrections(results, corrections)
+
+def _save_best(elo_path: Path, results: List[Dict]):
+    """Save the best config next to the ratings, only when it changed"""
+    if not results:
+        return
+    result_file = elo_path.parent / "balanced_teams.json"
+    if _last_saved_results.get(str(result_file)) != results[0] or not result_file.exists():
+        save_json(result_file, results[0])
+        _last_saved_results[str(result_file)] = copy.deepcopy(results[0])
+
+def _with_corrections(results: List[Dict], corrections: Dict[str, str]) -> List[Dict]:
+    if corrections:
+        for result in results:
+            result['corrections'] = dict(corrections)
     return results
\ No newline at end of file
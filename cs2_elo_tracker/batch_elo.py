@@ -0,0 +1,283 @@
+"""Vectorized Elo replay of one history under many parameter sets at once.
+
+Ratings for all configurations live in a (configs x players) NumPy array
+indexed by interned player id, so each match is a handful of array
+operations regardless of how many configurations are replayed. Final
+standings match `EloSystem` for every configuration.
+"""
+import math
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .elo import EloSystem, load_match_history
+from .archive import is_archive, open_archive
+
+def require_numpy():
+    if np is None:
+        raise ImportError("NumPy is required for vectorized replays (pip install numpy)")
+
+class EncodedHistory:
+    """Time-ordered decided matches with players interned to integer ids"""
+    def __init__(self, matches: Iterable[Dict[str, Any]]):
+        require_numpy()
+        self.player_ids: Dict[str, int] = {}
+        self.team1: List["np.ndarray"] = []
+        self.team2: List["np.ndarray"] = []
+        outcomes = []
+        for match in matches:
+            team1_players = match.get('team1_players', [])
+            team2_players = match.get('team2_players', [])
+            winning_team = match.get('winning_team', 0)
+            # Same skip rule as EloSystem.process_match
+            if not team1_players or not team2_players or winning_team == 0:
+                continue
+            self.team1.append(np.array([self._intern(p['name']) for p in team1_players], dtype=np.intp))
+            self.team2.append(np.array([self._intern(p['name']) for p in team2_players], dtype=np.intp))
+            outcomes.append(1.0 if winning_team == 1 else 0.0)
+        self.outcomes = np.array(outcomes, dtype=np.float64)
+        self.player_names = list(self.player_ids)
+
+    @classmethod
+    def from_archive(cls, archive) -> "EncodedHistory":
+        """Encode a MatchArchive from its mapped columns, without decoding matches.
+
+        Player ids are numbered in order of first appearance, as in __init__,
+        and every team is a view into one id array.
+        """
+        require_numpy()
+        matches = archive.match_table()
+        sizes = matches['team1_size'].astype(np.intp) + matches['team2_size']
+        decided = (matches['winning_team'] > 0) & (matches['team1_size'] > 0) & (matches['team2_size'] > 0)
+        names = archive.player_table()['name'][np.repeat(decided, sizes)]
+
+        string_ids, first_seen, inverse = np.unique(names, return_index=True, return_inverse=True)
+        order = np.argsort(first_seen, kind='stable')
+        dense = np.empty(len(order), dtype=np.intp)
+        dense[order] = np.arange(len(order))
+        ids = dense[inverse]
+
+        history = cls.__new__(cls)
+        history.player_ids = {archive.string(int(string_ids[i])): player_id for player_id, i in enumerate(order)}
+        history.player_names = list(history.player_ids)
+        history.team1 = []
+        history.team2 = []
+        start = 0
+        for size1, size2 in zip(matches['team1_size'][decided].tolist(), matches['team2_size'][decided].tolist()):
+            history.team1.append(ids[start:start + size1])
+            history.team2.append(ids[start + size1:start + size1 + size2])
+            start += size1 + size2
+        history.outcomes = (matches['winning_team'][decided] == 1).astype(np.float64)
+        return history
+
+    def _intern(self, name: str) -> int:
+        player_id = self.player_ids.get(name)
+        if player_id is None:
+            player_id = self.player_ids[name] = len(self.player_ids)
+        return player_id
+
+    @property
+    def num_matches(self) -> int:
+        return len(self.outcomes)
+
+    @property
+    def num_players(self) -> int:
+        return len(self.player_names)
+
+def encode_history(matches_file, matches: Iterable[Dict[str, Any]] = None) -> EncodedHistory:
+    """EncodedHistory of a match database.
+    
+    An archive is encoded from its mapped columns without decoding any
+    match; otherwise `matches` (oldest first, loaded if not given) are used.
+    """
+    if matches_file is not None and is_archive(matches_file):
+        require_numpy()
+        with open_archive(Path(matches_file)) as archive:
+            return EncodedHistory.from_archive(archive)
+    if matches is None:
+        matches, _ = load_match_history(matches_file)
+    return EncodedHistory(matches)
+
+def _pow10(x: "np.ndarray", exact: bool) -> "np.ndarray":
+    if exact:
+        # math.pow, as used by EloSystem; np.power may differ in the last bit
+        return np.array([math.pow(10, v) for v in x.tolist()])
+    return np.power(10.0, x)
+
+class BatchResult:
+    """Final ratings of every configuration plus shared game counts"""
+    def __init__(self, history: EncodedHistory, k_factors, initial_elos, start, ratings,
+                 games, wins, log_loss, brier, scored):
+        self.history = history
+        self.k_factors = k_factors
+        self.initial_elos = initial_elos
+        self.start = start
+        self.ratings = ratings
+        self.games = games
+        self.wins = wins
+        self.log_loss = log_loss
+        self.brier = brier
+        self.scored = scored
+
+    def standings(self, config: int) -> List[Dict[str, Any]]:
+        """Player stats for one configuration, in EloSystem.get_player_stats format"""
+        stats = []
+        for player_id, name in enumerate(self.history.player_names):
+            initial = float(self.start[config, player_id])
+            current = float(self.ratings[config, player_id])
+            games = int(self.games[player_id])
+            wins = int(self.wins[player_id])
+            stats.append({
+                'name': name,
+                'elo': round(current, 2),
+                'initial_elo': round(initial, 2),
+                'elo_change': round(current - initial, 2),
+                'games': games,
+                'wins': wins,
+                'losses': games - wins,
+                'win_rate': round(wins / games * 100, 2) if games > 0 else 0
+            })
+        stats.sort(key=lambda x: x['elo'], reverse=True)
+        return stats
+
+def replay_batch(
+    history: EncodedHistory,
+    k_factors: Sequence[float],
+    initial_elos: Sequence[float],
+    custom_initial_elos: Dict[str, float] = None,
+    burn_in: int = 0,
+    epsilon: float = 1e-6,
+    exact: bool = False,
+    weights: "np.ndarray" = None
+) -> BatchResult:
+    """Replay the history once for every (k_factors[i], initial_elos[i]) pair.
+    
+    Standings agree with EloSystem to the reported precision; with exact=True
+    the ratings are bit-identical at some cost for large batches.
+    
+    weights, an integer (matches x configs) array, replays match i weights[i, c]
+    times in a row for configuration c (0 drops it), which is how bootstrap
+    resamples are run. Weighted replays are not scored, and game counts
+    refer to the unweighted history.
+    """
+    require_numpy()
+    k = np.asarray(k_factors, dtype=np.float64)
+    base = np.asarray(initial_elos, dtype=np.float64)
+    if k.shape != base.shape or k.ndim != 1:
+        raise ValueError("k_factors and initial_elos must be 1-D and of equal length")
+    custom_initial_elos = custom_initial_elos or {}
+
+    num_configs = len(k)
+    start = np.repeat(base[:, None], history.num_players, axis=1)
+    for name, player_id in history.player_ids.items():
+        if name in custom_initial_elos:
+            start[:, player_id] = custom_initial_elos[name]
+    ratings = start.copy()
+
+    games = np.zeros(history.num_players, dtype=np.int64)
+    wins = np.zeros(history.num_players, dtype=np.int64)
+    log_loss = np.zeros(num_configs)
+    brier = np.zeros(num_configs)
+
+    if weights is not None:
+        _replay_weighted(history, k, ratings, np.asarray(weights), exact)
+    else:
+        _replay_scored(history, k, ratings, log_loss, brier, burn_in, epsilon, exact)
+
+    for i in range(history.num_matches):
+        games[history.team1[i]] += 1
+        games[history.team2[i]] += 1
+        if history.outcomes[i] == 1.0:
+            wins[history.team1[i]] += 1
+        else:
+            wins[history.team2[i]] += 1
+
+    scored = max(history.num_matches - burn_in, 0)
+    if scored:
+        log_loss /= scored
+        brier /= scored
+    return BatchResult(history, k, base, start, ratings, games, wins, log_loss, brier, scored)
+
+def _replay_scored(history: EncodedHistory, k, ratings, log_loss, brier, burn_in, epsilon, exact):
+    for i in range(history.num_matches):
+        team1 = history.team1[i]
+        team2 = history.team2[i]
+        actual = history.outcomes[i]
+
+        team1_avg = ratings[:, team1].sum(axis=1) / len(team1)
+        team2_avg = ratings[:, team2].sum(axis=1) / len(team2)
+        team1_expected = 1 / (1 + _pow10((team2_avg - team1_avg) / 400, exact))
+        team2_expected = 1 / (1 + _pow10((team1_avg - team2_avg) / 400, exact))
+
+        ratings[:, team1] += (k * (actual - team1_expected))[:, None]
+        ratings[:, team2] += (k * ((1.0 - actual) - team2_expected))[:, None]
+
+        if i >= burn_in:
+            p = np.clip(team1_expected, epsilon, 1 - epsilon)
+            log_loss -= actual * np.log(p) + (1 - actual) * np.log(1 - p)
+            brier += (team1_expected - actual) ** 2
+
+def _replay_weighted(history: EncodedHistory, k, ratings, weights, exact: bool):
+    for i in range(history.num_matches):
+        team1 = history.team1[i]
+        team2 = history.team2[i]
+        actual = history.outcomes[i]
+        repeats = weights[i]
+        for r in range(int(repeats.max())):
+            active = repeats > r
+            team1_avg = ratings[:, team1].sum(axis=1) / len(team1)
+            team2_avg = ratings[:, team2].sum(axis=1) / len(team2)
+            team1_expected = 1 / (1 + _pow10((team2_avg - team1_avg) / 400, exact))
+            team2_expected = 1 / (1 + _pow10((team1_avg - team2_avg) / 400, exact))
+            ratings[:, team1] += (active * k * (actual - team1_expected))[:, None]
+            ratings[:, team2] += (active * k * ((1.0 - actual) - team2_expected))[:, None]
+
+def bootstrap_intervals(
+    history: EncodedHistory,
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    custom_initial_elos: Dict[str, float] = None,
+    replicates: int = 200,
+    confidence: float = 0.95,
+    seed: int = 0
+) -> Dict[str, tuple]:
+    """Bootstrap confidence interval of every player's final Elo.
+    
+    Each replicate reweights the matches with Poisson(1) counts (the
+    streaming form of resampling with replacement, keeping time order), and
+    all replicates are replayed together as one batch.
+    """
+    require_numpy()
+    rng = np.random.default_rng(seed)
+    weights = rng.poisson(1.0, size=(history.num_matches, replicates))
+    result = replay_batch(
+        history, [k_factor] * replicates, [initial_elo] * replicates,
+        custom_initial_elos, weights=weights
+    )
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.percentile(result.ratings, [tail, 100 - tail], axis=0)
+    return {
+        name: (float(low[i]), float(high[i]))
+        for name, i in history.player_ids.items()
+    }
+
+def replay_python(
+    matches: List[Dict[str, Any]],
+    k_factors: Sequence[float],
+    initial_elos: Sequence[float],
+    custom_initial_elos: Dict[str, float] = None
+) -> List[List[Dict[str, Any]]]:
+    """Reference: run EloSystem once per configuration"""
+    results = []
+    for k_factor, initial_elo in zip(k_factors, initial_elos):
+        elo_system = EloSystem(
+            k_factor=k_factor, initial_elo=initial_elo, custom_initial_elos=custom_initial_elos
+        )
+        for match in matches:
+            elo_system.process_match(match)
+        results.append(elo_system.get_player_stats())
+    return results
@@ -0,0 +1,326 @@
+"""Command line interface. Without a command the GUI is started."""
+import argparse
+import sys
+from pathlib import Path
+
+from .utils import DATA_DIR, normalize_name
+from .archive import is_archive, jsonl_to_archive, archive_to_jsonl
+from .seasons import DEFAULT_CARRY
+from .watch import DEFAULT_INTERVAL
+from .simulator import DEFAULT_SIMULATIONS, simulate_bracket
+from .engines import ENGINE_NAMES
+from .workspace import DEFAULT_WORKSPACE, get_workspace
+from .draft import PICK_ORDERS
+from .names import NameIndex, NameResolutionError
+from . import profiling
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    arg_parser = argparse.ArgumentParser(prog='cs2_elo_tracker', description="CS2 ELO Tracker")
+    arg_parser.add_argument(
+        '--profile', nargs='?', const=str(DATA_DIR / "profile_trace.json"), metavar='TRACE',
+        help="Record timing spans, print a summary and write a JSON trace file"
+    )
+    arg_parser.add_argument(
+        '--workspace', default=DEFAULT_WORKSPACE,
+        help="Community whose data the commands (and the GUI) work on"
+    )
+    commands = arg_parser.add_subparsers(dest='command')
+
+    cmd = commands.add_parser('parse', help="Parse a match history file into the database")
+    cmd.add_argument('input', help="Match history text file")
+    cmd.add_argument('--k-factor', type=float, default=32)
+    cmd.add_argument('--default-elo', type=float, default=1000)
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+
+    cmd = commands.add_parser('watch', help="Follow a growing history file and ingest appended matches")
+    cmd.add_argument('input', help="Match history text file")
+    cmd.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Seconds between checks")
+    cmd.add_argument('--k-factor', type=float, default=32)
+    cmd.add_argument('--default-elo', type=float, default=1000)
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+    cmd.add_argument('--ci', action='store_true', help="Add bootstrap 95%% confidence intervals")
+
+    cmd = commands.add_parser('archive', help="Convert the match database between JSONL and the binary archive")
+    cmd.add_argument('input', help="cs_matches.jsonl or a .cs2a archive")
+    cmd.add_argument('output', help="Target file; the direction follows from the input's suffix")
+
+    cmd = commands.add_parser('season', help="Enable seasons, list closed seasons or show a player's career")
+    cmd.add_argument('action', choices=['enable', 'close', 'list', 'career'])
+    cmd.add_argument('player', nargs='?', help="Player for `career`")
+    cmd.add_argument('--carry', type=float, default=DEFAULT_CARRY,
+                     help="Share of the distance to the mean kept at a season boundary (enable)")
+    cmd.add_argument('--k-factor', type=float, default=32)
+    cmd.add_argument('--default-elo', type=float, default=1000)
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+    cmd.add_argument('--compress', action='store_true', help="Store frozen seasons gzip-compressed (enable)")
+
+    cmd = commands.add_parser('elo', help="Recalculate ELOs and print the rankings")
+    cmd.add_argument('--k-factor', type=float, default=32)
+    cmd.add_argument('--default-elo', type=float, default=1000)
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+    cmd.add_argument('--ci', action='store_true', help="Add bootstrap 95%% confidence intervals")
+
+    cmd = commands.add_parser('tune', help="Find the K-factor and default ELO that best predict results")
+    cmd.add_argument('--search', choices=['grid', 'coordinate'], default='grid')
+    cmd.add_argument('--k-factors', type=float, nargs='+', help="Grid of K-factors to try")
+    cmd.add_argument('--default-elos', type=float, nargs='+', help="Grid of default ELOs to try")
+    cmd.add_argument('--processes', type=int, help="Worker processes (default: all cores)")
+    cmd.add_argument('--burn-in', type=int, default=0, help="Matches to replay before scoring")
+    cmd.add_argument('--no-vectorize', action='store_true', help="Use EloSystem per candidate instead of NumPy")
+    cmd.add_argument('--top', type=int, default=5)
+
+    cmd = commands.add_parser('compare', help="Compare how well rating engines predict match results")
+    cmd.add_argument('--engines', nargs='+', choices=ENGINE_NAMES, default=['elo', 'performance'])
+    cmd.add_argument('--k-factor', type=float, default=32)
+    cmd.add_argument('--default-elo', type=float, default=1000)
+    cmd.add_argument('--burn-in', type=int, default=0, help="Matches to replay before scoring")
+
+    cmd = commands.add_parser('balance', help="Balance 10 players into two teams")
+    cmd.add_argument('players', nargs='+', help="Player names (or one comma-separated argument)")
+    cmd.add_argument('--results', type=int, default=3)
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+    cmd.add_argument('--map', help="Balance with per-map ratings for this map (e.g. Mirage)")
+    cmd.add_argument('--synergy', type=float, default=0, metavar='WEIGHT',
+                     help="Penalize splits that stack duos with a strong record together (1 = full weight)")
+    cmd.add_argument('--allow-new', action='store_true',
+                     help="Balance unknown names as new players at the default ELO")
+
+    cmd = commands.add_parser('draft', help="Captain draft of 10-16 players with a suggested pick after every pick")
+    cmd.add_argument('players', nargs='+', help="Player names (or one comma-separated argument)")
+    cmd.add_argument('--captains', help="Two comma-separated captains (default: the first two players)")
+    cmd.add_argument('--order', choices=list(PICK_ORDERS), default='alternate')
+    cmd.add_argument('--second', action='store_true', help="The second captain picks first")
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+    cmd.add_argument('--map', help="Draft with per-map ratings for this map")
+    cmd.add_argument('--allow-new', action='store_true',
+                     help="Draft unknown names as new players at the default ELO")
+
+    cmd = commands.add_parser('pairs', help="Best and worst duos, or one player's teammates and nemesis")
+    cmd.add_argument('--player', help="Show this player's teammates and opponents")
+    cmd.add_argument('--min-games', type=int, default=5)
+    cmd.add_argument('--top', type=int, default=10)
+
+    cmd = commands.add_parser('simulate', help="Simulate a series or a bracket and print each team's chances")
+    cmd.add_argument('bracket', nargs='?', help="Bracket definition JSON (see cs2_elo_tracker/simulator.py)")
+    cmd.add_argument('--team', action='append', metavar='PLAYERS',
+                     help="Comma-separated players of one team (repeat; instead of a bracket file)")
+    cmd.add_argument('--best-of', type=int, default=3)
+    cmd.add_argument('--simulations', type=int, default=DEFAULT_SIMULATIONS)
+    cmd.add_argument('--seed', type=int)
+    cmd.add_argument('--engine', choices=ENGINE_NAMES, default='elo')
+    cmd.add_argument('--allow-new', action='store_true',
+                     help="Rate unknown names as new players at the default ELO")
+
+    return arg_parser
+
+def cmd_parse(args):
+    workspace = get_workspace(args.workspace)
+    total, new, all_matches = workspace.parse_and_save(args.input)
+    print(f"Parsed {total} matches, {new} new. Total in database: {all_matches}")
+    workspace.calculate_elos(k_factor=args.k_factor, initial_elo=args.default_elo, engine=args.engine)
+
+def cmd_watch(args):
+    def report(result):
+        rewritten = " (file was rewritten, re-read)" if result['rewritten'] else ""
+        print(f"Parsed {result['parsed']} matches, {result['new']} new{rewritten}. "
+              f"Total in database: {result['total']}", flush=True)
+    
+    workspace = get_workspace(args.workspace)
+    print(f"Watching {args.input} (Ctrl+C to stop)", flush=True)
+    try:
+        workspace.watch(
+            args.input, report, args.interval,
+            k_factor=args.k_factor, initial_elo=args.default_elo, engine=args.engine,
+            confidence_intervals=args.ci
+        )
+    except KeyboardInterrupt:
+        pass
+
+def cmd_archive(args):
+    if is_archive(args.input):
+        count = archive_to_jsonl(args.input, args.output)
+    else:
+        count = jsonl_to_archive(args.input, args.output)
+    print(f"Wrote {count} matches to {args.output}")
+
+def cmd_season(args):
+    workspace = get_workspace(args.workspace)
+    if args.action in ('enable', 'close'):
+        if args.action == 'enable':
+            closed = workspace.enable_seasons(
+                engine=args.engine, k_factor=args.k_factor, initial_elo=args.default_elo, carry=args.carry,
+                compress=args.compress
+            )
+        else:
+            closed = workspace.close_seasons()
+        print(f"Closed {len(closed)} seasons{': ' + ', '.join(closed) if closed else ''}")
+        if closed:
+            workspace.calculate_elos(k_factor=args.k_factor, initial_elo=args.default_elo, engine=args.engine)
+    elif args.action == 'list':
+        for season in workspace.closed_seasons():
+            print(f"{season['season']:<10} {season['matches']:>6} matches  "
+                  f"{season['start_date']} - {season['end_date']}")
+    else:
+        if not args.player:
+            raise SystemExit("season career needs a player name")
+        record = workspace.career(args.player, engine=args.engine)
+        for row in record['seasons']:
+            print(f"{row['season']:<10} #{row['rank']:<4} {row['elo']:>8.0f} {row['games']:>5} games "
+                  f"{row['win_rate']:>6.1f}%")
+        print(f"Career: {record['games']} games, {record['win_rate']:.1f}% won, peak {record['peak_elo']}")
+
+def cmd_elo(args):
+    stats = get_workspace(args.workspace).calculate_elos(
+        k_factor=args.k_factor, initial_elo=args.default_elo, engine=args.engine,
+        confidence_intervals=args.ci
+    )
+    for i, player in enumerate(stats, 1):
+        ci = f" [{player['elo_ci_low']:.0f}, {player['elo_ci_high']:.0f}]" if 'elo_ci_low' in player else ""
+        print(f"{i:>3} {player['name']:<24} {player['elo']:>8.0f}{ci} {player['games']:>5} games")
+
+def cmd_balance(args):
+    players = [name.strip() for arg in args.players for name in arg.split(',') if name.strip()]
+    try:
+        results = get_workspace(args.workspace).get_balanced_teams(
+            players, num_results=args.results, engine=args.engine, map_name=args.map,
+            synergy_weight=args.synergy, allow_unknown=args.allow_new
+        )
+    except NameResolutionError as e:
+        raise SystemExit(f"{e} (--allow-new balances unknown names as new players)")
+    for typed, name in (results[0].get('corrections', {}) if results else {}).items():
+        print(f"Read '{typed}' as {name}")
+    for config in results:
+        synergy = ""
+        if 'team1_synergy' in config:
+            synergy = f" (synergy {config['team1_synergy']:+.0f} / {config['team2_synergy']:+.0f})"
+        print(f"#{config['rank']} diff {config['elo_difference']:.2f}{synergy}")
+        print(f"  Team 1 ({config['team1_avg_elo']:.0f}): {', '.join(config['team1'])}")
+        print(f"  Team 2 ({config['team2_avg_elo']:.0f}): {', '.join(config['team2'])}")
+
+def cmd_draft(args):
+    players = [name.strip() for arg in args.players for name in arg.split(',') if name.strip()]
+    captains = [name.strip() for name in args.captains.split(',')] if args.captains else players[:2]
+    try:
+        session = get_workspace(args.workspace).start_draft(
+            players, tuple(captains), engine=args.engine, map_name=args.map, order=args.order,
+            first_pick=1 if args.second else 0, allow_unknown=args.allow_new
+        )
+    except NameResolutionError as e:
+        raise SystemExit(f"{e} (--allow-new drafts unknown names as new players)")
+    while not session.is_complete:
+        result = session.result()
+        print(f"Team 1 ({result['team1_avg_elo']:.0f}): {', '.join(result['team1'])}")
+        print(f"Team 2 ({result['team2_avg_elo']:.0f}): {', '.join(result['team2'])}")
+        suggestions = session.suggestions(5)
+        print("Best picks: " + ", ".join(f"{s['player']} ({s['final_difference']:.1f})" for s in suggestions))
+        try:
+            typed = input(f"Team {session.turn + 1} picks (Enter = {suggestions[0]['player']}, undo, quit): ").strip()
+        except EOFError:
+            return
+        if typed == 'quit':
+            return
+        if typed == 'undo':
+            session.undo()
+            continue
+        player, candidates = NameIndex(session.remaining).resolve(typed) if typed else (suggestions[0]['player'], [])
+        if player is None:
+            print(f"'{typed}' could be {' or '.join(candidates)}" if candidates else f"{typed} is not available")
+            continue
+        session.pick(player)
+    result = session.result()
+    print(f"Final difference {result['elo_difference']:.2f}")
+    print(f"  Team 1 ({result['team1_avg_elo']:.0f}): {', '.join(result['team1'])}")
+    print(f"  Team 2 ({result['team2_avg_elo']:.0f}): {', '.join(result['team2'])}")
+    if result['bench']:
+        print(f"  Sitting out: {', '.join(result['bench'])}")
+
+def cmd_tune(args):
+    result = get_workspace(args.workspace).tune_parameters(
+        search=args.search, k_factors=args.k_factors, initial_elos=args.default_elos,
+        processes=args.processes, burn_in=args.burn_in,
+        vectorized=False if args.no_vectorize else None
+    )
+    print(f"Scored {result['matches']} matches")
+    print(f"{'K':>6} {'default':>8} {'log-loss':>9} {'brier':>7}")
+    for row in result['candidates'][:args.top]:
+        print(f"{row['k_factor']:>6g} {row['initial_elo']:>8g} {row['log_loss']:>9.4f} {row['brier']:>7.4f}")
+
+def cmd_simulate(args):
+    if not args.bracket and not (args.team and len(args.team) >= 2):
+        raise SystemExit("simulate needs a bracket file or at least two --team options")
+    workspace = get_workspace(args.workspace)
+    try:
+        if args.bracket:
+            result = workspace.simulate_from_file(
+                args.bracket, args.simulations, args.seed, engine=args.engine, allow_unknown=args.allow_new
+            )
+        else:
+            teams = {
+                f"Team {i}": [name.strip() for name in team.split(',') if name.strip()]
+                for i, team in enumerate(args.team, 1)
+            }
+            result = simulate_bracket(
+                workspace.team_ratings(teams, engine=args.engine, allow_unknown=args.allow_new),
+                list(teams) if len(teams) == 2 else None,
+                args.best_of, args.simulations, args.seed
+            )
+    except NameResolutionError as e:
+        raise SystemExit(f"{e} (--allow-new rates unknown names as new players)")
+    
+    print(f"{result['simulations']} simulations, best of {'/'.join(map(str, result['best_of']))}")
+    for team in result['teams']:
+        rounds = ' '.join(f"{p * 100:6.2f}%" for p in team['advance'])
+        print(f"{team['team']:<24} {team['rating']:>8.0f} {rounds}")
+
+def _print_records(title, records, name_key):
+    print(title)
+    for r in records:
+        name = ' + '.join(r[name_key]) if isinstance(r[name_key], list) else r[name_key]
+        print(f"  {name:<40} {r['wins']:>4}-{r['losses']:<4} {r['win_rate']:>6.1f}%")
+
+def cmd_pairs(args):
+    workspace = get_workspace(args.workspace)
+    stats = workspace.pair_stats()
+    if args.player:
+        player = normalize_name(args.player, workspace.aliases())
+        _print_records(f"Teammates of {player}", stats.teammates(player, args.min_games)[:args.top], 'player')
+        _print_records(f"Opponents of {player} (hardest first)", stats.opponents(player, args.min_games)[:args.top], 'player')
+        return
+    _print_records("Best duos", stats.best_duos(args.min_games, args.top), 'players')
+    _print_records("Worst duos", stats.best_duos(args.min_games, args.top, reverse=False), 'players')
+
+def cmd_compare(args):
+    report = get_workspace(args.workspace).compare_engines(
+        engines=args.engines, k_factor=args.k_factor, initial_elo=args.default_elo,
+        burn_in=args.burn_in
+    )
+    print(f"Scored {report[0]['matches']} matches")
+    print(f"{'engine':<12} {'log-loss':>9} {'brier':>7} {'accuracy':>9} {'time':>8}")
+    for row in sorted(report, key=lambda r: r['log_loss']):
+        print(f"{row['engine']:<12} {row['log_loss']:>9.4f} {row['brier']:>7.4f} "
+              f"{row['accuracy'] * 100:>8.1f}% {row['seconds']:>7.2f}s")
+
+COMMANDS = {
+    'parse': cmd_parse,
+    'watch': cmd_watch,
+    'archive': cmd_archive,
+    'season': cmd_season,
+    'elo': cmd_elo,
+    'balance': cmd_balance,
+    'draft': cmd_draft,
+    'tune': cmd_tune,
+    'compare': cmd_compare,
+    'simulate': cmd_simulate,
+    'pairs': cmd_pairs,
+}
+
+def run_command(args):
+    COMMANDS[args.command](args)
+
+def finish_profile(args):
+    """Print the profile summary and write the trace file"""
+    if not args.profile:
+        return
+    print(profiling.format_summary(), file=sys.stderr)
+    profiling.write_trace(Path(args.profile))
+    print(f"Trace written to {args.profile}", file=sys.stderr)
@@ -1,34 +1,50 @@
 import math
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict
-from datetime import datetime
 from pathlib import Path
 
 from .utils import (
     DATA_DIR, load_json, save_json, load_jsonl, 
-    load_aliases, normalize_name
+    load_aliases, normalize_name, transaction
 )
 from .parser import parse_date
+from .archive import is_archive, read_archive
+from .seasons import season_start_elos
+from .balancer import invalidate_balance_cache
+from .engines import RatingEngine, Glicko2System, GaussianTeamSystem, rating_file
+from .performance import DEFAULT_PERFORMANCE_WEIGHT, performance_multipliers
+from . import profiling
 
-class EloSystem:
-    def __init__(self, k_factor=32, initial_elo=1000, custom_initial_elos=None):
+class EloSystem(RatingEngine):
+    """Classic team-average Elo.
+    
+    With variants=True the same pass also maintains a per-map Elo (stored
+    sparsely per (player, map), seeded from the player's global Elo on their
+    first game on that map) and a margin-of-victory weighted Elo.
+    """
+    name = 'elo'
+    
+    def __init__(self, k_factor=32, initial_elo=1000, custom_initial_elos=None, variants=False):
+        super().__init__(initial_elo, custom_initial_elos)
         self.k_factor = k_factor
-        self.initial_elo = initial_elo
-        self.custom_initial_elos = custom_initial_elos or {}
+        self.variants = variants
         self.player_elos = defaultdict(lambda: {
             'elo': initial_elo, 'games': 0, 'wins': 0, 'losses': 0
         })
-    
-    def get_initial_elo(self, player_name: str) -> float:
-        return self.custom_initial_elos.get(player_name, self.initial_elo)
+        self.map_elos: Dict[Tuple[str, str], List[float]] = {}
     
     def expected_score(self, rating_a: float, rating_b: float) -> float:
         return 1 / (1 + math.pow(10, (rating_b - rating_a) / 400))
     
-    def update_elo(self, player_elo: float, expected: float, actual: float) -> float:
-        return player_elo + self.k_factor * (actual - expected)
+    def update_elo(self, player_elo: float, expected: float, actual: float, weight: float = 1.0) -> float:
+        return player_elo + weight * self.k_factor * (actual - expected)
+    
+    def delta_weights(self, match: Dict[str, Any]) -> Tuple[List[float], List[float]]:
+        """Share of the team's rating change given to each player of team 1 and team 2"""
+        return [1.0] * len(match['team1_players']), [1.0] * len(match['team2_players'])
     
-    def process_match(self, match: Dict[str, Any]):
+    def process_match(self, match: Dict[str, Any]) -> Optional[float]:
+        """Apply one match; returns team 1's pre-match expected score, or None if skipped"""
         team1_players = match.get('team1_players', [])
         team2_players = match.get('team2_players', [])
         winning_team = match.get('winning_team', 0)
@@ -48,6 +64,8 @@ class EloSystem:
                     'losses': 0,
                     'initial_elo': initial
                 }
+                if self.variants:
+                    self.player_elos[name]['margin_elo'] = initial
         
         # Calculate team averages
         team1_avg = sum(self.player_elos[p['name']]['elo'] for p in team1_players) / len(team1_players)
@@ -61,11 +79,16 @@ class EloSystem:
         team1_actual = 1.0 if winning_team == 1 else 0.0
         team2_actual = 1.0 if winning_team == 2 else 0.0
         
+        if self.variants:
+            self._update_variants(match, team1_players, team2_players, team1_actual)
+        
+        team1_weights, team2_weights = self.delta_weights(match)
+        
         # Update team 1
-        for player in team1_players:
+        for player, weight in zip(team1_players, team1_weights):
             name = player['name']
             old_elo = self.player_elos[name]['elo']
-            self.player_elos[name]['elo'] = self.update_elo(old_elo, team1_expected, team1_actual)
+            self.player_elos[name]['elo'] = self.update_elo(old_elo, team1_expected, team1_actual, weight)
             self.player_elos[name]['games'] += 1
             if team1_actual == 1.0:
                 self.player_elos[name]['wins'] += 1
@@ -73,17 +96,76 @@ class EloSystem:
                 self.player_elos[name]['losses'] += 1
         
         # Update team 2
-        for player in team2_players:
+        for player, weight in zip(team2_players, team2_weights):
             name = player['name']
             old_elo = self.player_elos[name]['elo']
-            self.player_elos[name]['elo'] = self.update_elo(old_elo, team2_expected, team2_actual)
+            self.player_elos[name]['elo'] = self.update_elo(old_elo, team2_expected, team2_actual, weight)
             self.player_elos[name]['games'] += 1
             if team2_actual == 1.0:
                 self.player_elos[name]['wins'] += 1
             else:
                 self.player_elos[name]['losses'] += 1
+        
+        return team1_expected
+    
+    def margin_multiplier(self, margin: int, winner_elo_diff: float) -> float:
+        """Margin-of-victory multiplier, damped when the favourite wins"""
+        return math.log(margin + 1) * 2.2 / (winner_elo_diff * 0.001 + 2.2)
+    
+    def _update_variants(self, match, team1_players, team2_players, team1_actual):
+        """Per-map and margin-weighted updates, sharing the global pass"""
+        map_name = match.get('map', '')
+        names1 = [p['name'] for p in team1_players]
+        names2 = [p['name'] for p in team2_players]
+        
+        # Per-map Elo
+        map_entries = []
+        for name in names1 + names2:
+            entry = self.map_elos.get((name, map_name))
+            if entry is None:
+                entry = self.map_elos[(name, map_name)] = [self.player_elos[name]['elo'], 0]
+            map_entries.append(entry)
+        entries1, entries2 = map_entries[:len(names1)], map_entries[len(names1):]
+        map1 = sum(e[0] for e in entries1) / len(entries1)
+        map2 = sum(e[0] for e in entries2) / len(entries2)
+        map_expected = self.expected_score(map1, map2)
+        delta = self.k_factor * (team1_actual - map_expected)
+        for entry in entries1:
+            entry[0] += delta
+            entry[1] += 1
+        for entry in entries2:
+            entry[0] -= delta
+            entry[1] += 1
+        
+        # Margin-of-victory Elo
+        margin1 = sum(self.player_elos[n]['margin_elo'] for n in names1) / len(names1)
+        margin2 = sum(self.player_elos[n]['margin_elo'] for n in names2) / len(names2)
+        margin_expected = self.expected_score(margin1, margin2)
+        rounds = abs(match.get('team1_score', 0) - match.get('team2_score', 0))
+        winner_diff = margin1 - margin2 if team1_actual == 1.0 else margin2 - margin1
+        delta = self.k_factor * self.margin_multiplier(rounds, winner_diff) * (team1_actual - margin_expected)
+        for name in names1:
+            self.player_elos[name]['margin_elo'] += delta
+        for name in names2:
+            self.player_elos[name]['margin_elo'] -= delta
+    
+    def get_state(self) -> Dict[str, Any]:
+        """Unrounded ratings, to continue the replay later with load_state"""
+        return {
+            'players': {name: dict(data) for name, data in self.player_elos.items()},
+            'map_elos': [[name, map_name, elo, games] for (name, map_name), (elo, games) in self.map_elos.items()]
+        }
+    
+    def load_state(self, state: Dict[str, Any]):
+        for name, data in state.get('players', {}).items():
+            self.player_elos[name] = dict(data)
+        self.map_elos = {(name, map_name): [elo, games] for name, map_name, elo, games in state.get('map_elos', [])}
     
     def get_player_stats(self) -> List[Dict[str, Any]]:
+        maps_by_player: Dict[str, Dict[str, Dict[str, float]]] = defaultdict(dict)
+        for (name, map_name), (elo, games) in self.map_elos.items():
+            maps_by_player[name][map_name] = {'elo': round(elo, 2), 'games': games}
+        
         stats = []
         for name, data in self.player_elos.items():
             initial = data.get('initial_elo', self.initial_elo)
@@ -98,9 +180,65 @@ class EloSystem:
                 'losses': data['losses'],
                 'win_rate': round(data['wins'] / data['games'] * 100, 2) if data['games'] > 0 else 0
             })
+            if self.variants:
+                stats[-1]['margin_elo'] = round(data['margin_elo'], 2)
+                stats[-1]['map_elos'] = maps_by_player.get(name, {})
         stats.sort(key=lambda x: x['elo'], reverse=True)
         return stats
 
+class PerformanceEloSystem(EloSystem):
+    """Elo where each team's change is split by scoreboard performance.
+    
+    Multipliers (see performance.py) are computed for a whole batch of
+    matches in `prepare`; a match that was not prepared is computed alone.
+    """
+    name = 'performance'
+    
+    def __init__(self, k_factor=32, initial_elo=1000, custom_initial_elos=None, variants=False,
+                 performance_weight=DEFAULT_PERFORMANCE_WEIGHT):
+        super().__init__(k_factor, initial_elo, custom_initial_elos, variants)
+        self.performance_weight = performance_weight
+        self._prepared: Dict[int, Tuple[List[float], List[float]]] = {}
+        self._prepared_matches: List[Dict[str, Any]] = []
+    
+    def prepare(self, matches: List[Dict[str, Any]]):
+        # Keyed by id(); the matches are kept alive alongside so ids stay unique
+        self._prepared_matches = matches
+        self._prepared = {
+            id(match): weights
+            for match, weights in zip(matches, performance_multipliers(matches, self.performance_weight))
+        }
+    
+    def delta_weights(self, match: Dict[str, Any]) -> Tuple[List[float], List[float]]:
+        weights = self._prepared.get(id(match))
+        if weights is None:
+            weights = performance_multipliers([match], self.performance_weight)[0]
+        return weights
+
+RATING_ENGINES = {
+    'elo': EloSystem,
+    'performance': PerformanceEloSystem,
+    'glicko2': Glicko2System,
+    'trueskill': GaussianTeamSystem,
+}
+
+def create_engine(
+    engine: str = 'elo',
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    custom_initial_elos: Dict[str, float] = None,
+    variants: bool = False
+) -> RatingEngine:
+    """Build a rating engine by name; k_factor and variants only apply to the Elo engines"""
+    if engine not in RATING_ENGINES:
+        raise ValueError(f"Unknown rating engine: {engine}")
+    if engine in ('elo', 'performance'):
+        return RATING_ENGINES[engine](
+            k_factor=k_factor, initial_elo=initial_elo,
+            custom_initial_elos=custom_initial_elos, variants=variants
+        )
+    return RATING_ENGINES[engine](initial_elo=initial_elo, custom_initial_elos=custom_initial_elos)
+
 def load_initial_elos(filepath: Path, aliases: Dict[str, str]) -> Dict[str, float]:
     """Load initial ELOs with alias normalization"""
     data = load_json(filepath, {})
@@ -118,45 +256,189 @@ def load_initial_elos(filepath: Path, aliases: Dict[str, str]) -> Dict[str, floa
     
     return normalized
 
+def load_custom_initial_elos(initial_elo_file: str = None, alias_file: str = None) -> Dict[str, float]:
+    """Custom initial ELOs (data/initial_elos.json by default), alias-normalized"""
+    aliases = load_aliases(Path(alias_file) if alias_file else None)
+    if initial_elo_file:
+        return load_initial_elos(Path(initial_elo_file), aliases)
+    default_initial = DATA_DIR / "initial_elos.json"
+    if default_initial.exists():
+        return load_initial_elos(default_initial, aliases)
+    return {}
+
+def history_initial_elos(
+    matches_file: str = None,
+    initial_elo_file: str = None,
+    alias_file: str = None
+) -> Dict[str, float]:
+    """Custom initial ELOs for replaying a match database (season starts applied)"""
+    if matches_file is None:
+        matches_file = DATA_DIR / "cs_matches.jsonl"
+    return season_start_elos(matches_file, load_custom_initial_elos(initial_elo_file, alias_file))
+
+def load_match_history(
+    matches_file: str = None,
+    initial_elo_file: str = None,
+    alias_file: str = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+    """Load matches (oldest first) and custom initial ELOs"""
+    if matches_file is None:
+        matches_file = DATA_DIR / "cs_matches.jsonl"
+    
+    with profiling.span('elo.load'):
+        custom_initial_elos = history_initial_elos(matches_file, initial_elo_file, alias_file)
+        
+        # Load matches (an archive is stored oldest first)
+        if is_archive(matches_file):
+            matches = read_archive(Path(matches_file))
+        else:
+            matches = load_jsonl(Path(matches_file))
+    
+    # Sort by date (oldest first); the loaded list is shared and must not be mutated
+    if not is_archive(matches_file):
+        with profiling.span('elo.sort'):
+            matches = sorted(matches, key=lambda m: parse_date(m.get('date', '')))
+    profiling.count('elo.matches', len(matches))
+    
+    return matches, custom_initial_elos
+
+# Engines whose replay can be resumed from a saved state
+INCREMENTAL_ENGINES = ('elo', 'performance')
+
+def elo_state_file(output_file: Path) -> Path:
+    """Replay state saved next to a rating file (player_elos.json -> player_elos.state.json)"""
+    output_file = Path(output_file)
+    return output_file.with_name(f"{output_file.stem}.state.json")
+
+def _state_record(elo_system, engine, k_factor, initial_elo, custom_initial_elos, matches, last_date):
+    return {
+        'engine': engine,
+        'k_factor': k_factor,
+        'initial_elo': initial_elo,
+        'custom_initial_elos': custom_initial_elos,
+        'matches': matches,
+        'last_date': last_date,
+        **elo_system.get_state()
+    }
+
+@profiling.profiled('calculate_elos')
 def calculate_elos(
     matches_file: str = None,
     output_file: str = None,
     k_factor: int = 32,
     initial_elo_file: str = None,
-    alias_file: str = None
+    alias_file: str = None,
+    initial_elo: float = 1000,
+    engine: str = 'elo',
+    confidence_intervals: bool = False,
+    bootstrap_replicates: int = 200
 ) -> List[Dict[str, Any]]:
-    """Calculate ELOs from match history"""
+    """Calculate ratings from match history with the chosen engine.
+    
+    With confidence_intervals (classic Elo only, needs NumPy) each player
+    also gets a bootstrap 95% interval as elo_ci_low / elo_ci_high.
+    """
     
-    if matches_file is None:
-        matches_file = DATA_DIR / "cs_matches.jsonl"
     if output_file is None:
-        output_file = DATA_DIR / "player_elos.json"
+        output_file = rating_file(engine)
     
-    # Load aliases
-    aliases = load_aliases(Path(alias_file) if alias_file else None)
+    matches, custom_initial_elos = load_match_history(matches_file, initial_elo_file, alias_file)
     
-    # Load initial ELOs
-    custom_initial_elos = {}
-    if initial_elo_file:
-        custom_initial_elos = load_initial_elos(Path(initial_elo_file), aliases)
-    else:
-        default_initial = DATA_DIR / "initial_elos.json"
-        if default_initial.exists():
-            custom_initial_elos = load_initial_elos(default_initial, aliases)
+    # Process matches
+    with profiling.span('elo.replay'):
+        elo_system = create_engine(engine, k_factor, initial_elo, custom_initial_elos, variants=True)
+        elo_system.process_matches(matches)
+    
+    player_stats = elo_system.get_player_stats()
     
-    # Load matches
-    matches = load_jsonl(Path(matches_file))
+    if confidence_intervals and engine == 'elo':
+        # Imported here: batch_elo depends on this module
+        from .batch_elo import encode_history, bootstrap_intervals
+        with profiling.span('elo.bootstrap'):
+            intervals = bootstrap_intervals(
+                encode_history(matches_file, matches), k_factor, initial_elo, custom_initial_elos,
+                replicates=bootstrap_replicates
+            )
+        for player in player_stats:
+            low, high = intervals[player['name']]
+            player['elo_ci_low'] = round(low, 2)
+            player['elo_ci_high'] = round(high, 2)
     
-    # Sort by date (oldest first)
-    matches.sort(key=lambda m: parse_date(m.get('date', '')))
+    # Save the ratings and the replay checkpoint in one commit
+    with profiling.span('elo.save'), transaction(Path(output_file).parent):
+        save_json(Path(output_file), player_stats)
+        if engine in INCREMENTAL_ENGINES:
+            save_json(elo_state_file(output_file), _state_record(
+                elo_system, engine, k_factor, initial_elo, custom_initial_elos, len(matches),
+                matches[-1].get('date', '') if matches else ''
+            ), indent=None)
+    invalidate_balance_cache(output_file)
     
-    # Process matches
-    elo_system = EloSystem(k_factor=k_factor, custom_initial_elos=custom_initial_elos)
-    for match in matches:
-        elo_system.process_match(match)
+    return player_stats
+
+@profiling.profiled('update_elos')
+def update_elos(
+    new_matches: List[Dict[str, Any]],
+    previous_total: Optional[int],
+    matches_file: str = None,
+    output_file: str = None,
+    k_factor: float = 32,
+    initial_elo_file: str = None,
+    alias_file: str = None,
+    initial_elo: float = 1000,
+    engine: str = 'elo',
+    confidence_intervals: bool = False
+) -> List[Dict[str, Any]]:
+    """Apply newly inserted matches on top of the saved replay state.
+    
+    previous_total is the size of the match database before the insert
+    (None when stored matches changed, which forces the full rebuild).
+    Falls back to a full calculate_elos when there is no usable state:
+    other settings, a state that does not cover exactly the previous
+    matches, or new matches that are not newer than everything replayed.
+    The bootstrap needs the whole history, so with confidence_intervals
+    (classic Elo) it is always a full calculate_elos.
+    """
+    if output_file is None:
+        output_file = rating_file(engine)
+    
+    custom_initial_elos = season_start_elos(
+        matches_file, load_custom_initial_elos(initial_elo_file, alias_file)
+    )
+    new_matches = sorted(new_matches, key=lambda m: parse_date(m.get('date', '')))
+    
+    state = load_json(elo_state_file(output_file)) if engine in INCREMENTAL_ENGINES else None
+    usable = (
+        state is not None
+        and not (confidence_intervals and engine == 'elo')
+        and state.get('engine') == engine
+        and state.get('k_factor') == k_factor
+        and state.get('initial_elo') == initial_elo
+        and state.get('custom_initial_elos') == custom_initial_elos
+        and state.get('matches') == previous_total
+        and not (new_matches and state.get('last_date') and
+                 parse_date(new_matches[0].get('date', '')) <= parse_date(state['last_date']))
+    )
+    if not usable:
+        return calculate_elos(
+            matches_file, output_file, k_factor, initial_elo_file, alias_file, initial_elo, engine,
+            confidence_intervals
+        )
+    
+    with profiling.span('elo.replay'):
+        elo_system = create_engine(engine, k_factor, initial_elo, custom_initial_elos, variants=True)
+        elo_system.load_state(state)
+        elo_system.process_matches(new_matches)
+    profiling.count('elo.matches', len(new_matches))
     
-    # Get and save stats
     player_stats = elo_system.get_player_stats()
-    save_json(Path(output_file), player_stats)
+    last_date = new_matches[-1].get('date', '') if new_matches else state.get('last_date', '')
+    with profiling.span('elo.save'), transaction(Path(output_file).parent):
+        save_json(Path(output_file), player_stats)
+        save_json(elo_state_file(output_file), _state_record(
+            elo_system, engine, k_factor, initial_elo, custom_initial_elos,
+            previous_total + len(new_matches), last_date
+        ), indent=None)
+    invalidate_balance_cache(output_file)
     
-    return player_stats
\ No newline at end of file
+    return player_stats
@@ -0,0 +1,341 @@
+"""Rating engine interface plus Glicko-2 and Gaussian team-skill engines.
+
+The classic Elo engine is `elo.EloSystem`; `elo.create_engine` builds any
+engine by name. Every engine reports players in the same format as
+`EloSystem.get_player_stats`, with its rating in the 'elo' field, so the
+rankings tab and balancer work with any of them.
+"""
+import math
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Iterable
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .utils import DATA_DIR
+from .parser import parse_date
+
+ENGINE_NAMES = ('elo', 'performance', 'glicko2', 'trueskill')
+
+def rating_file(engine: str = 'elo', data_dir: Path = None) -> Path:
+    """Output file of an engine; classic Elo keeps the historical file name"""
+    if engine not in ENGINE_NAMES:
+        raise ValueError(f"Unknown rating engine: {engine}")
+    data_dir = data_dir or DATA_DIR
+    if engine == 'elo':
+        return data_dir / "player_elos.json"
+    return data_dir / f"player_ratings_{engine}.json"
+
+def _decided_teams(match: Dict[str, Any]):
+    team1_players = match.get('team1_players', [])
+    team2_players = match.get('team2_players', [])
+    winning_team = match.get('winning_team', 0)
+    if not team1_players or not team2_players or winning_team == 0:
+        return None
+    return [p['name'] for p in team1_players], [p['name'] for p in team2_players], winning_team
+
+def _stats_row(name: str, rating: float, initial: float, games: int, wins: int, losses: int) -> Dict[str, Any]:
+    return {
+        'name': name,
+        'elo': round(rating, 2),
+        'initial_elo': round(initial, 2),
+        'elo_change': round(rating - initial, 2),
+        'games': games,
+        'wins': wins,
+        'losses': losses,
+        'win_rate': round(wins / games * 100, 2) if games > 0 else 0
+    }
+
+class RatingEngine:
+    """Interface shared by all rating engines"""
+    name = None
+
+    def __init__(self, initial_elo: float = 1000, custom_initial_elos: Dict[str, float] = None):
+        self.initial_elo = initial_elo
+        self.custom_initial_elos = custom_initial_elos or {}
+
+    def get_initial_elo(self, player_name: str) -> float:
+        return self.custom_initial_elos.get(player_name, self.initial_elo)
+
+    def process_match(self, match: Dict[str, Any]) -> Optional[float]:
+        """Apply one match; returns team 1's pre-match win probability, or None if skipped"""
+        raise NotImplementedError
+
+    def prepare(self, matches: List[Dict[str, Any]]):
+        """Precompute whatever a batch of matches needs before process_match runs on them"""
+
+    def process_matches(self, matches: Iterable[Dict[str, Any]]):
+        """Apply time-ordered matches"""
+        matches = list(matches)
+        self.prepare(matches)
+        for match in matches:
+            self.process_match(match)
+
+    def get_player_stats(self) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+class Glicko2System(RatingEngine):
+    """Glicko-2 with team composites; matches are rated in periods (scrim nights).
+
+    A new rating period starts when the gap between consecutive matches
+    exceeds `period_gap_hours`, or after `max_period_matches` matches.
+    Within a period every player is rated against the pre-period average
+    rating/deviation of each opposing team, and all players of the period
+    are updated together with NumPy.
+    """
+    name = 'glicko2'
+    SCALE = 173.7178
+
+    def __init__(self, initial_elo=1000, custom_initial_elos=None, initial_rd=350,
+                 initial_volatility=0.06, tau=0.5, period_gap_hours=6, max_period_matches=20):
+        super().__init__(initial_elo, custom_initial_elos)
+        if np is None:
+            raise ImportError("NumPy is required for the Glicko-2 engine (pip install numpy)")
+        self.initial_rd = initial_rd
+        self.initial_volatility = initial_volatility
+        self.tau = tau
+        self.period_gap_hours = period_gap_hours
+        self.max_period_matches = max_period_matches
+        self.player_ids: Dict[str, int] = {}
+        self.mu = np.zeros(0)
+        self.phi = np.zeros(0)
+        self.sigma = np.zeros(0)
+        self.initial = np.zeros(0)
+        self.games = np.zeros(0, dtype=np.int64)
+        self.wins = np.zeros(0, dtype=np.int64)
+
+    def _ensure_players(self, names: Iterable[str]):
+        new = [n for n in dict.fromkeys(names) if n not in self.player_ids]
+        if not new:
+            return
+        for name in new:
+            self.player_ids[name] = len(self.player_ids)
+        initial = np.array([self.get_initial_elo(n) for n in new], dtype=np.float64)
+        count = len(new)
+        self.initial = np.concatenate([self.initial, initial])
+        self.mu = np.concatenate([self.mu, (initial - self.initial_elo) / self.SCALE])
+        self.phi = np.concatenate([self.phi, np.full(count, self.initial_rd / self.SCALE)])
+        self.sigma = np.concatenate([self.sigma, np.full(count, self.initial_volatility)])
+        self.games = np.concatenate([self.games, np.zeros(count, dtype=np.int64)])
+        self.wins = np.concatenate([self.wins, np.zeros(count, dtype=np.int64)])
+
+    @staticmethod
+    def _g(phi):
+        return 1 / np.sqrt(1 + 3 * phi ** 2 / math.pi ** 2)
+
+    def _team_composite(self, ids):
+        return self.mu[ids].mean(), math.sqrt(float((self.phi[ids] ** 2).mean()))
+
+    def expected_score(self, team1: List[str], team2: List[str]) -> float:
+        ids1 = [self.player_ids[n] for n in team1]
+        ids2 = [self.player_ids[n] for n in team2]
+        mu1, phi1 = self._team_composite(ids1)
+        mu2, phi2 = self._team_composite(ids2)
+        g = float(self._g(math.sqrt(phi1 ** 2 + phi2 ** 2)))
+        return 1 / (1 + math.exp(-g * (mu1 - mu2)))
+
+    def _new_volatility(self, phi, sigma, v, delta):
+        """Vectorized Illinois iteration from step 5 of the Glicko-2 paper"""
+        a = np.log(sigma ** 2)
+        tau2 = self.tau ** 2
+
+        def f(x):
+            ex = np.exp(x)
+            return ex * (delta ** 2 - phi ** 2 - v - ex) / (2 * (phi ** 2 + v + ex) ** 2) - (x - a) / tau2
+
+        big_a = a.copy()
+        big_b = np.where(delta ** 2 > phi ** 2 + v, np.log(np.maximum(delta ** 2 - phi ** 2 - v, 1e-300)), 0.0)
+        need_k = delta ** 2 <= phi ** 2 + v
+        if need_k.any():
+            k = np.ones_like(a)
+            while True:
+                candidate = a - k * self.tau
+                pending = need_k & (f(candidate) < 0)
+                if not pending.any():
+                    break
+                k = np.where(pending, k + 1, k)
+            big_b = np.where(need_k, a - k * self.tau, big_b)
+
+        f_a = f(big_a)
+        f_b = f(big_b)
+        for _ in range(100):
+            active = np.abs(big_b - big_a) > 1e-6
+            if not active.any():
+                break
+            big_c = big_a + (big_a - big_b) * f_a / (f_b - f_a)
+            f_c = f(big_c)
+            swap = f_c * f_b <= 0
+            big_a = np.where(active & swap, big_b, big_a)
+            f_a = np.where(active & swap, f_b, np.where(active, f_a / 2, f_a))
+            big_b = np.where(active, big_c, big_b)
+            f_b = np.where(active, f_c, f_b)
+        return np.exp(big_a / 2)
+
+    def _rate_period(self, period: List[tuple]) -> List[float]:
+        """Update all players from one rating period; returns team 1 win probabilities"""
+        self._ensure_players(n for team1, team2, _ in period for n in team1 + team2)
+        # Flatten to one row per (player, match); team 2*j is match j's team 1
+        players, teams, scores = [], [], []
+        for j, (team1, team2, winning_team) in enumerate(period):
+            score1 = 1.0 if winning_team == 1 else 0.0
+            for side, names, score in ((0, team1, score1), (1, team2, 1.0 - score1)):
+                players.extend(self.player_ids[n] for n in names)
+                teams.extend([2 * j + side] * len(names))
+                scores.extend([score] * len(names))
+        players = np.array(players, dtype=np.intp)
+        teams = np.array(teams, dtype=np.intp)
+        scores = np.array(scores)
+
+        np.add.at(self.games, players, 1)
+        np.add.at(self.wins, players[scores == 1.0], 1)
+
+        # Team composites from pre-period ratings
+        team_size = np.bincount(teams)
+        team_mu = np.bincount(teams, self.mu[players]) / team_size
+        team_phi = np.sqrt(np.bincount(teams, self.phi[players] ** 2) / team_size)
+        combined_g = self._g(np.sqrt(team_phi[0::2] ** 2 + team_phi[1::2] ** 2))
+        predictions = (1 / (1 + np.exp(-combined_g * (team_mu[0::2] - team_mu[1::2])))).tolist()
+
+        opponents = teams ^ 1
+        opp_mu = team_mu[opponents]
+        opp_phi = team_phi[opponents]
+        count = len(self.mu)
+
+        g = self._g(opp_phi)
+        expected = 1 / (1 + np.exp(-g * (self.mu[players] - opp_mu)))
+        v_inv = np.bincount(players, g ** 2 * expected * (1 - expected), minlength=count)
+        delta_sum = np.bincount(players, g * (scores - expected), minlength=count)
+
+        played = v_inv > 0
+        idx = np.nonzero(played)[0]
+        v = 1 / v_inv[idx]
+        delta = v * delta_sum[idx]
+        new_sigma = self._new_volatility(self.phi[idx], self.sigma[idx], v, delta)
+
+        # Players who sat out only gain deviation
+        self.phi[~played] = np.sqrt(self.phi[~played] ** 2 + self.sigma[~played] ** 2)
+
+        phi_star = np.sqrt(self.phi[idx] ** 2 + new_sigma ** 2)
+        new_phi = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+        self.mu[idx] = self.mu[idx] + new_phi ** 2 * delta_sum[idx]
+        self.phi[idx] = new_phi
+        self.sigma[idx] = new_sigma
+        return predictions
+
+    def process_match(self, match: Dict[str, Any]) -> Optional[float]:
+        """Rate a single match as its own period"""
+        teams = _decided_teams(match)
+        if teams is None:
+            return None
+        return self._rate_period([teams])[0]
+
+    def process_matches(self, matches: Iterable[Dict[str, Any]]):
+        period = []
+        last_date = None
+        for match in matches:
+            teams = _decided_teams(match)
+            if teams is None:
+                continue
+            date = parse_date(match.get('date', ''))
+            if period and (len(period) >= self.max_period_matches or
+                           (date - last_date).total_seconds() > self.period_gap_hours * 3600):
+                self._rate_period(period)
+                period = []
+            period.append(teams)
+            last_date = date
+        if period:
+            self._rate_period(period)
+
+    def get_player_stats(self) -> List[Dict[str, Any]]:
+        stats = []
+        for name, i in self.player_ids.items():
+            games = int(self.games[i])
+            wins = int(self.wins[i])
+            row = _stats_row(
+                name, self.initial_elo + float(self.mu[i]) * self.SCALE,
+                float(self.initial[i]), games, wins, games - wins
+            )
+            row['rd'] = round(float(self.phi[i]) * self.SCALE, 2)
+            row['volatility'] = round(float(self.sigma[i]), 5)
+            stats.append(row)
+        stats.sort(key=lambda x: x['elo'], reverse=True)
+        return stats
+
+class GaussianTeamSystem(RatingEngine):
+    """TrueSkill-style two-team Gaussian skill model (no draws).
+
+    Each player has a skill mean and deviation; a team's performance is the
+    sum of its players' skills plus per-player noise `beta`. Defaults are
+    TrueSkill's (25, 25/3, 25/6, 25/300) scaled by 40 onto the Elo range.
+    """
+    name = 'trueskill'
+
+    def __init__(self, initial_elo=1000, custom_initial_elos=None, sigma=1000 / 3,
+                 beta=1000 / 6, tau=1000 / 300):
+        super().__init__(initial_elo, custom_initial_elos)
+        self.initial_sigma = sigma
+        self.beta = beta
+        self.tau = tau
+        self.players: Dict[str, Dict[str, float]] = {}
+
+    def _player(self, name: str) -> Dict[str, float]:
+        player = self.players.get(name)
+        if player is None:
+            initial = self.get_initial_elo(name)
+            player = self.players[name] = {
+                'mu': initial, 'sigma': self.initial_sigma, 'initial': initial,
+                'games': 0, 'wins': 0, 'losses': 0
+            }
+        return player
+
+    @staticmethod
+    def _pdf(x):
+        return math.exp(-x * x / 2) / math.sqrt(2 * math.pi)
+
+    @staticmethod
+    def _cdf(x):
+        return 0.5 * (1 + math.erf(x / math.sqrt(2)))
+
+    def process_match(self, match: Dict[str, Any]) -> Optional[float]:
+        teams = _decided_teams(match)
+        if teams is None:
+            return None
+        team1 = [self._player(n) for n in teams[0]]
+        team2 = [self._player(n) for n in teams[1]]
+        for player in team1 + team2:
+            player['sigma'] = math.sqrt(player['sigma'] ** 2 + self.tau ** 2)
+
+        mu1 = sum(p['mu'] for p in team1)
+        mu2 = sum(p['mu'] for p in team2)
+        c2 = sum(p['sigma'] ** 2 for p in team1 + team2) + (len(team1) + len(team2)) * self.beta ** 2
+        c = math.sqrt(c2)
+        team1_expected = self._cdf((mu1 - mu2) / c)
+
+        winners, losers = (team1, team2) if teams[2] == 1 else (team2, team1)
+        t = (sum(p['mu'] for p in winners) - sum(p['mu'] for p in losers)) / c
+        denominator = max(self._cdf(t), 1e-12)
+        v = self._pdf(t) / denominator
+        w = v * (v + t)
+        for sign, team in ((1, winners), (-1, losers)):
+            for player in team:
+                s2 = player['sigma'] ** 2
+                player['mu'] += sign * s2 / c * v
+                player['sigma'] = math.sqrt(s2 * max(1 - s2 / c2 * w, 1e-6))
+                player['games'] += 1
+                if sign == 1:
+                    player['wins'] += 1
+                else:
+                    player['losses'] += 1
+        return team1_expected
+
+    def get_player_stats(self) -> List[Dict[str, Any]]:
+        stats = []
+        for name, p in self.players.items():
+            row = _stats_row(name, p['mu'], p['initial'], p['games'], p['wins'], p['losses'])
+            row['sigma'] = round(p['sigma'], 2)
+            row['conservative'] = round(p['mu'] - 3 * p['sigma'], 2)
+            stats.append(row)
+        stats.sort(key=lambda x: x['elo'], reverse=True)
+        return stats
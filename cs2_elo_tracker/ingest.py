@@ -0,0 +1,72 @@
+"""Store new matches and apply only those to the ratings.
+
+Used for pasted text and by watch mode; `parse_and_save` + `calculate_elos`
+remain the full rebuild.
+
+Only the match database is appended to. The ratings, their replay state
+and the pair / scoreboard records are small JSON files rewritten whole on
+every ingest, so an ingest costs O(players + pairs) bytes of writes, not
+O(new matches). See `bench.py --writes` for the figures.
+"""
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Union
+
+from .utils import DATA_DIR, load_aliases, transaction
+from .parser import as_text, parse_matches_from_text, merge_matches
+from .elo import update_elos
+from .engines import rating_file
+from . import profiling
+
+def ingest_matches(
+    matches: List[Dict[str, Any]],
+    output_file: str = None,
+    alias_file: str = None,
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    engine: str = 'elo',
+    confidence_intervals: bool = False
+) -> Dict[str, Any]:
+    """Merge parsed matches into the database and update ratings with the inserted ones.
+    
+    Ratings and initial ELOs are the files next to the match database.
+    When a stored match was replaced by an edited copy the ratings are
+    recalculated in full (see merge_matches).
+    The matches, records and ratings are committed together, so a crash
+    leaves either all of them updated or none.
+    
+    Returns parsed / new / replaced / total counts and the inserted matches.
+    """
+    output_file = Path(output_file) if output_file else DATA_DIR / "cs_matches.jsonl"
+    with transaction(output_file.parent):
+        added, previous_total, total, replaced = merge_matches(matches, output_file)
+        if added or replaced:
+            update_elos(
+                added, None if replaced else previous_total, matches_file=output_file,
+                output_file=rating_file(engine, output_file.parent), k_factor=k_factor,
+                initial_elo_file=output_file.parent / "initial_elos.json",
+                alias_file=alias_file, initial_elo=initial_elo, engine=engine,
+                confidence_intervals=confidence_intervals
+            )
+    return {
+        'parsed': len(matches), 'new': len(added), 'replaced': len(replaced), 'total': total,
+        'matches': added
+    }
+
+@profiling.profiled('ingest_text')
+def ingest_text(
+    content: Union[str, Iterable[str]],
+    output_file: str = None,
+    alias_file: str = None,
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    engine: str = 'elo',
+    confidence_intervals: bool = False
+) -> Dict[str, Any]:
+    """Parse match history text (a string or lines) in memory and ingest it"""
+    aliases = load_aliases(Path(alias_file) if alias_file else None)
+    with profiling.span('parse.regex'):
+        matches = parse_matches_from_text(as_text(content), aliases)
+    profiling.count('parse.matches', len(matches))
+    return ingest_matches(
+        matches, output_file, alias_file, k_factor, initial_elo, engine, confidence_intervals
+    )
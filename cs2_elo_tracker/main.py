@@ -4,21 +4,46 @@ import json
 from pathlib import Path
 from typing import List, Dict
 
-from .utils import (
-    DATA_DIR, ensure_data_dir, load_json, save_json, 
-    load_jsonl, load_aliases, get_display_width, pad_string
-)
-from .parser import parse_and_save
-from .elo import calculate_elos
-from .balancer import get_balanced_teams, load_elos
+from .utils import ensure_data_dir
+from .tuning import tune_parameters
+from .engines import ENGINE_NAMES
+from .balancer import balance_cache_info, known_maps
+from .player_stats import StatAggregates
+from .watch import DEFAULT_INTERVAL as WATCH_INTERVAL, file_changed
+from .workspace import DEFAULT_WORKSPACE, get_workspace, list_workspaces
+from .names import NameResolutionError
+from .draft import PICK_ORDERS
+from . import profiling
 
 class CS2EloTracker:
-    def __init__(self, root):
+    def __init__(self, root, workspace: str = DEFAULT_WORKSPACE):
         self.root = root
         self.root.title("CS2 ELO Tracker")
         self.root.geometry("900x700")
         
-        ensure_data_dir()
+        # Community whose data every tab works on
+        self.workspace = get_workspace(workspace)
+        ensure_data_dir(self.workspace.data_dir)
+        
+        # Rating engine shared by the rankings and balance tabs
+        self.engine_var = tk.StringVar(value='elo')
+        
+        # Workspace selector (type a new name to create one)
+        ws_frame = ttk.Frame(root)
+        ws_frame.pack(fill='x', padx=10, pady=(10, 0))
+        ttk.Label(ws_frame, text="Workspace:").pack(side='left')
+        self.workspace_var = tk.StringVar(value=self.workspace.name)
+        self.workspace_combo = ttk.Combobox(ws_frame, textvariable=self.workspace_var,
+                                            values=list_workspaces(), width=20)
+        self.workspace_combo.pack(side='left', padx=5)
+        self.workspace_combo.bind('<<ComboboxSelected>>', lambda e: self.switch_workspace())
+        self.workspace_combo.bind('<Return>', lambda e: self.switch_workspace())
+        
+        # Profiling status bar
+        self.profile_status = None
+        if profiling.is_enabled():
+            self.profile_status = ttk.Label(root, text="Profiling enabled", anchor='w', relief='sunken')
+            self.profile_status.pack(fill='x', side='bottom')
         
         # Create notebook (tabs)
         self.notebook = ttk.Notebook(root)
@@ -49,6 +74,12 @@ class CS2EloTracker:
         ttk.Button(file_frame, text="Browse", command=self.browse_parse_file).pack(side='left', padx=5)
         ttk.Button(file_frame, text="Parse", command=self.parse_file).pack(side='left', padx=5)
         
+        # Follow the file: ingest only what gets appended to it
+        self.watch_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(file_frame, text="Watch", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side='left', padx=5)
+        self._watch_stat = None
+        
         # Or paste text
         paste_frame = ttk.LabelFrame(frame, text="Or Paste Match History Text")
         paste_frame.pack(fill='both', expand=True, padx=10, pady=10)
@@ -74,33 +105,47 @@ class CS2EloTracker:
         ttk.Button(btn_frame, text="Recalculate ELOs", command=self.recalculate_elos).pack(side='left', padx=5)
         ttk.Button(btn_frame, text="Refresh", command=self.refresh_elos).pack(side='left', padx=5)
         
+        ttk.Label(btn_frame, text="Engine:").pack(side='left', padx=(20, 5))
+        engine_combo = ttk.Combobox(btn_frame, textvariable=self.engine_var, values=ENGINE_NAMES,
+                                    state='readonly', width=10)
+        engine_combo.pack(side='left')
+        engine_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_elos())
+        
         # Filter
         ttk.Label(btn_frame, text="Min Games:").pack(side='left', padx=(20, 5))
         self.min_games_var = tk.StringVar(value="1")
         ttk.Entry(btn_frame, textvariable=self.min_games_var, width=5).pack(side='left')
         ttk.Button(btn_frame, text="Apply", command=self.refresh_elos).pack(side='left', padx=5)
         
+        self.ci_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(btn_frame, text="Confidence intervals", variable=self.ci_var).pack(side='left', padx=(20, 0))
+        
         # Treeview for rankings
-        columns = ('rank', 'name', 'elo', 'change', 'games', 'wins', 'losses', 'winrate')
+        columns = ('rank', 'name', 'elo', 'ci', 'change', 'games', 'wins', 'losses', 'winrate',
+                   'kd', 'kills', 'hs', 'mvp', 'score')
         self.elo_tree = ttk.Treeview(frame, columns=columns, show='headings', height=25)
         
-        self.elo_tree.heading('rank', text='#')
-        self.elo_tree.heading('name', text='Player')
-        self.elo_tree.heading('elo', text='ELO')
-        self.elo_tree.heading('change', text='Change')
-        self.elo_tree.heading('games', text='Games')
-        self.elo_tree.heading('wins', text='Wins')
-        self.elo_tree.heading('losses', text='Losses')
-        self.elo_tree.heading('winrate', text='Win %')
+        headings = {
+            'rank': '#', 'name': 'Player', 'elo': 'ELO', 'ci': '95% CI', 'change': 'Change',
+            'games': 'Games', 'wins': 'Wins', 'losses': 'Losses', 'winrate': 'Win %',
+            'kd': 'K/D', 'kills': 'Kills/G', 'hs': 'HS %', 'mvp': 'MVPs', 'score': 'Score/G'
+        }
+        for column, text in headings.items():
+            # Click a heading to sort by it (again to reverse)
+            self.elo_tree.heading(column, text=text, command=lambda c=column: self.sort_elo_tree(c))
+        self._elo_sort = (None, False)
         
         self.elo_tree.column('rank', width=40)
         self.elo_tree.column('name', width=200)
         self.elo_tree.column('elo', width=80)
+        self.elo_tree.column('ci', width=100)
         self.elo_tree.column('change', width=80)
         self.elo_tree.column('games', width=60)
         self.elo_tree.column('wins', width=60)
         self.elo_tree.column('losses', width=60)
         self.elo_tree.column('winrate', width=60)
+        for column in ('kd', 'kills', 'hs', 'mvp', 'score'):
+            self.elo_tree.column(column, width=60)
         
         scrollbar = ttk.Scrollbar(frame, orient='vertical', command=self.elo_tree.yview)
         self.elo_tree.configure(yscrollcommand=scrollbar.set)
@@ -128,19 +173,60 @@ class CS2EloTracker:
         self.quick_player_var = tk.StringVar()
         self.quick_player_combo = ttk.Combobox(quick_frame, textvariable=self.quick_player_var, width=30)
         self.quick_player_combo.pack(side='left', padx=5)
+        self.quick_player_combo.bind('<KeyRelease>', self.complete_player)
+        self.quick_player_combo.bind('<Return>', lambda e: self.add_player())
+        self._quick_players = []
         ttk.Button(quick_frame, text="Add", command=self.add_player).pack(side='left')
         ttk.Button(quick_frame, text="Clear", command=self.clear_players).pack(side='left', padx=5)
         
         ttk.Button(select_frame, text="Balance Teams", command=self.balance_teams).pack(pady=5)
         
+        # Captain draft: the first two listed players are the captains
+        draft_frame = ttk.Frame(select_frame)
+        draft_frame.pack()
+        ttk.Button(draft_frame, text="Captain Draft", command=self.start_draft).pack(side='left')
+        ttk.Label(draft_frame, text="(first two players captain)  Pick order:").pack(side='left', padx=5)
+        self.draft_order_var = tk.StringVar(value='alternate')
+        ttk.Combobox(draft_frame, textvariable=self.draft_order_var, values=list(PICK_ORDERS),
+                     state='readonly', width=10).pack(side='left')
+        self.draft = None
+        self._draft_choices = []
+        
         # Hide ELO checkbox
         self.hide_elo_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(select_frame, text="Hide individual ELOs", variable=self.hide_elo_var).pack()
+        self.synergy_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(select_frame, text="Avoid stacking strong duos", variable=self.synergy_var).pack()
+        
+        engine_frame = ttk.Frame(select_frame)
+        engine_frame.pack()
+        ttk.Label(engine_frame, text="Rating engine:").pack(side='left')
+        ttk.Combobox(engine_frame, textvariable=self.engine_var, values=ENGINE_NAMES,
+                     state='readonly', width=10).pack(side='left', padx=5)
+        ttk.Label(engine_frame, text="Map:").pack(side='left', padx=(10, 0))
+        self.map_var = tk.StringVar(value='')
+        self.map_combo = ttk.Combobox(engine_frame, textvariable=self.map_var, width=14)
+        self.map_combo.pack(side='left', padx=5)
+        
+        self.balance_cache_label = ttk.Label(select_frame, text="")
+        self.balance_cache_label.pack()
         
         # Results
         result_frame = ttk.LabelFrame(frame, text="Balanced Teams")
         result_frame.pack(fill='both', expand=True, padx=10, pady=10)
         
+        # Available players during a captain draft, best pick first (hidden otherwise)
+        self.draft_panel = ttk.Frame(result_frame)
+        ttk.Label(self.draft_panel, text="Available (final diff)").pack()
+        self.draft_list = tk.Listbox(self.draft_panel, width=32, font=('Courier', 10))
+        self.draft_list.pack(fill='y', expand=True)
+        self.draft_list.bind('<Double-Button-1>', lambda e: self.draft_pick())
+        draft_buttons = ttk.Frame(self.draft_panel)
+        draft_buttons.pack(pady=5)
+        ttk.Button(draft_buttons, text="Pick", command=self.draft_pick).pack(side='left')
+        ttk.Button(draft_buttons, text="Undo", command=self.draft_undo).pack(side='left', padx=5)
+        ttk.Button(draft_buttons, text="End", command=self.end_draft).pack(side='left')
+        
         self.balance_result = scrolledtext.ScrolledText(result_frame, height=20, font=('Courier', 10))
         self.balance_result.pack(fill='both', expand=True, padx=5, pady=5)
     
@@ -185,11 +271,20 @@ class CS2EloTracker:
         self.default_elo_var = tk.StringVar(value="1000")
         ttk.Entry(def_frame, textvariable=self.default_elo_var, width=10).pack(side='left', padx=5)
         
+        # Tuning
+        tune_frame = ttk.Frame(frame)
+        tune_frame.pack(fill='x', padx=10, pady=5)
+        
+        ttk.Button(tune_frame, text="Tune from History", command=self.tune_settings).pack(side='left')
+        self.tune_status = ttk.Label(tune_frame, text="(picks the K-Factor and Default ELO with the best prediction log-loss)")
+        self.tune_status.pack(side='left', padx=5)
+        
         # Data directory info
         dir_frame = ttk.LabelFrame(frame, text="Data Directory")
         dir_frame.pack(fill='x', padx=10, pady=10)
         
-        ttk.Label(dir_frame, text=str(DATA_DIR)).pack(padx=5, pady=5)
+        self.data_dir_label = ttk.Label(dir_frame, text=str(self.workspace.data_dir))
+        self.data_dir_label.pack(padx=5, pady=5)
         ttk.Button(dir_frame, text="Open Folder", command=self.open_data_folder).pack(pady=5)
         
         # Initial ELOs editor
@@ -199,14 +294,20 @@ class CS2EloTracker:
         self.initial_elo_text = scrolledtext.ScrolledText(init_frame, height=15, font=('Courier', 10))
         self.initial_elo_text.pack(fill='both', expand=True, padx=5, pady=5)
         
-        # Load initial ELOs
-        init_elos = load_json(DATA_DIR / "initial_elos.json", {})
-        self.initial_elo_text.insert('1.0', json.dumps(init_elos, indent=2, ensure_ascii=False))
+        self.refresh_initial_elos()
         
         ttk.Button(init_frame, text="Save Initial ELOs", command=self.save_initial_elos).pack(pady=5)
     
     # === Action methods ===
     
+    def _load_or_report(self, load, default):
+        """Result of load(), or default after reporting a corrupt (e.g. hand-edited) data file"""
+        try:
+            return load()
+        except ValueError as e:
+            messagebox.showerror("Error", f"{e}\n\nFix or remove the file and reload.")
+            return default
+    
     def browse_parse_file(self):
         filename = filedialog.askopenfilename(
             title="Select Match History File",
@@ -215,6 +316,7 @@ class CS2EloTracker:
         if filename:
             self.parse_file_var.set(filename)
     
+    @profiling.profiled('gui.parse_file')
     def parse_file(self):
         filepath = self.parse_file_var.get()
         if not filepath:
@@ -222,7 +324,7 @@ class CS2EloTracker:
             return
         
         try:
-            total, new, all_matches = parse_and_save(filepath)
+            total, new, all_matches = self.workspace.parse_and_save(filepath)
             self.parse_status.config(
                 text=f"Parsed {total} matches, {new} new. Total in database: {all_matches}"
             )
@@ -231,6 +333,48 @@ class CS2EloTracker:
         except Exception as e:
             messagebox.showerror("Error", str(e))
     
+    def toggle_watch(self):
+        if not self.watch_var.get():
+            self.parse_status.config(text="Stopped watching")
+            return
+        if not self.parse_file_var.get():
+            self.watch_var.set(False)
+            messagebox.showerror("Error", "Please select a file first")
+            return
+        self._watch_stat = None
+        self.parse_status.config(text=f"Watching {Path(self.parse_file_var.get()).name}")
+        self.poll_watch()
+    
+    def poll_watch(self):
+        """Ingest anything appended to the watched file, then schedule the next poll"""
+        if not self.watch_var.get():
+            return
+        filepath = Path(self.parse_file_var.get())
+        try:
+            changed = file_changed(filepath, self._watch_stat)
+            if changed:
+                self._watch_stat = changed
+                result = self.workspace.poll_watch(
+                    filepath, k_factor=float(self.k_factor_var.get()),
+                    initial_elo=float(self.default_elo_var.get()), engine=self.engine_var.get(),
+                    confidence_intervals=self.ci_var.get()
+                )
+                if result['parsed'] or result['rewritten']:
+                    rewritten = " (file was rewritten, re-read)" if result['rewritten'] else ""
+                    self.parse_status.config(
+                        text=f"Watch: {result['new']} new matches{rewritten}. Total in database: {result['total']}"
+                    )
+                    if result['new'] or result['replaced']:
+                        self.refresh_elos()
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.watch_var.set(False)
+            messagebox.showerror("Error", f"Stopped watching: {e}")
+            return
+        self.root.after(int(WATCH_INTERVAL * 1000), self.poll_watch)
+    
+    @profiling.profiled('gui.parse_pasted')
     def parse_pasted(self):
         content = self.paste_text.get('1.0', 'end')
         if not content.strip():
@@ -238,39 +382,68 @@ class CS2EloTracker:
             return
         
         try:
-            # Save to temp file and parse
-            temp_file = DATA_DIR / "temp_paste.txt"
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                f.write(content)
-            
-            total, new, all_matches = parse_and_save(str(temp_file))
-            temp_file.unlink()  # Delete temp file
+            result = self.workspace.ingest_text(
+                content, k_factor=float(self.k_factor_var.get()),
+                initial_elo=float(self.default_elo_var.get()), engine=self.engine_var.get(),
+                confidence_intervals=self.ci_var.get()
+            )
             
             self.parse_status.config(
-                text=f"Parsed {total} matches, {new} new. Total in database: {all_matches}"
+                text=f"Parsed {result['parsed']} matches, {result['new']} new, {result['replaced']} updated. "
+                     f"Total in database: {result['total']}"
             )
-            self.recalculate_elos()
+            if result['new'] or result['replaced']:
+                self.refresh_elos()
             self.paste_text.delete('1.0', 'end')
-            messagebox.showinfo("Success", f"Added {new} new matches!")
+            messagebox.showinfo("Success", f"Added {result['new']} new matches!")
         except Exception as e:
             messagebox.showerror("Error", str(e))
     
+    @profiling.profiled('gui.recalculate_elos')
     def recalculate_elos(self):
         try:
-            k_factor = int(self.k_factor_var.get())
-            calculate_elos(k_factor=k_factor)
+            k_factor = float(self.k_factor_var.get())
+            default_elo = float(self.default_elo_var.get())
+            self.workspace.calculate_elos(
+                k_factor=k_factor, initial_elo=default_elo, engine=self.engine_var.get(),
+                confidence_intervals=self.ci_var.get()
+            )
             self.refresh_elos()
             messagebox.showinfo("Success", "ELOs recalculated!")
         except Exception as e:
             messagebox.showerror("Error", str(e))
     
+    def tune_settings(self):
+        try:
+            self.root.config(cursor='watch')
+            self.root.update_idletasks()
+            result = tune_parameters(
+                self.workspace.matches_file, self.workspace.initial_elo_file, self.workspace.alias_file
+            )
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        finally:
+            self.root.config(cursor='')
+        
+        best = result['best']
+        self.k_factor_var.set(f"{best['k_factor']:g}")
+        self.default_elo_var.set(f"{best['initial_elo']:g}")
+        self.tune_status.config(
+            text=f"Best over {result['matches']} matches: log-loss {best['log_loss']:.4f}, Brier {best['brier']:.4f}"
+        )
+    
+    @profiling.profiled('gui.refresh_elos')
     def refresh_elos(self):
         # Clear tree
         for item in self.elo_tree.get_children():
             self.elo_tree.delete(item)
         
         # Load and display
-        elos = load_json(DATA_DIR / "player_elos.json", [])
+        elos = self._load_or_report(lambda: self.workspace.ratings(self.engine_var.get()), None)
+        rating_file_ok = elos is not None
+        elos = elos or []
+        aggregates = self._load_or_report(self.workspace.player_stats, StatAggregates())
         
         try:
             min_games = int(self.min_games_var.get())
@@ -281,25 +454,88 @@ class CS2EloTracker:
             if player['games'] >= min_games:
                 change = player['elo_change']
                 change_str = f"+{change:.0f}" if change >= 0 else f"{change:.0f}"
+                ci_str = ""
+                if 'elo_ci_low' in player:
+                    ci_str = f"{player['elo_ci_low']:.0f}-{player['elo_ci_high']:.0f}"
+                stats = aggregates.summary(player['name'])
                 
                 self.elo_tree.insert('', 'end', values=(
                     i,
                     player['name'],
                     f"{player['elo']:.0f}",
+                    ci_str,
                     change_str,
                     player['games'],
                     player['wins'],
                     player['losses'],
-                    f"{player['win_rate']:.1f}%"
+                    f"{player['win_rate']:.1f}%",
+                    f"{stats['kd']:.2f}",
+                    f"{stats['kills_avg']:.1f}",
+                    f"{stats['hs_avg']:.0f}%",
+                    stats['mvp_total'],
+                    f"{stats['score_avg']:.0f}"
                 ))
         
+        column, descending = self._elo_sort
+        if column:
+            self.sort_elo_tree(column, descending)
+        
         # Update quick player list
         player_names = [p['name'] for p in elos if p['games'] >= min_games]
+        self._quick_players = player_names
         self.quick_player_combo['values'] = player_names
+        maps = known_maps(self.workspace.rating_file(self.engine_var.get())) if rating_file_ok else []
+        self.map_combo['values'] = [''] + maps
+        self.root.after_idle(self.update_profile_status)
+    
+    def sort_elo_tree(self, column, descending=None):
+        """Sort the rankings by a column; numbers numerically, repeated clicks toggle the order"""
+        if descending is None:
+            previous, descending = self._elo_sort
+            descending = not descending if previous == column else column != 'name'
+        self._elo_sort = (column, descending)
+        
+        def key(item):
+            value = str(self.elo_tree.set(item, column)).rstrip('%')
+            if column == 'ci':
+                value = value.split('-')[0]
+            try:
+                return (0, float(value), '')
+            except ValueError:
+                return (1, 0.0, value.lower())
+        
+        items = sorted(self.elo_tree.get_children(''), key=key, reverse=descending)
+        for index, item in enumerate(items):
+            self.elo_tree.move(item, '', index)
+    
+    def update_profile_status(self):
+        if self.profile_status is None:
+            return
+        parts = []
+        for row in profiling.summary()[:4]:
+            parts.append(f"{row['name']} {row['total_ms']:.0f} ms/{row['calls']}")
+        self.profile_status.config(text=" | ".join(parts))
+    
+    def complete_player(self, event=None):
+        """Narrow the quick-add list to names matching what has been typed"""
+        if event is not None and event.keysym in ('Return', 'Up', 'Down', 'Escape'):
+            return
+        typed = self.quick_player_var.get()
+        if not typed.strip():
+            self.quick_player_combo['values'] = self._quick_players
+            return
+        index = self.workspace.name_index(self.engine_var.get())
+        matches = index.complete(typed) or [name for name, _ in index.similar(typed)]
+        self.quick_player_combo['values'] = matches
     
     def add_player(self):
-        player = self.quick_player_var.get()
+        player = self.quick_player_var.get().strip()
         if player:
+            canonical, candidates = self.workspace.name_index(self.engine_var.get()).resolve(player)
+            if canonical is None and candidates:
+                messagebox.showerror("Error", f"'{player}' could be {' or '.join(candidates)}")
+                return
+            player = canonical or player
             current = self.player_input.get('1.0', 'end').strip()
             if current:
                 self.player_input.insert('end', f"\n{player}")
@@ -310,34 +546,59 @@ class CS2EloTracker:
     def clear_players(self):
         self.player_input.delete('1.0', 'end')
     
-    def balance_teams(self):
+    def typed_players(self) -> List[str]:
+        """Player names in the input box (comma or newline separated)"""
         text = self.player_input.get('1.0', 'end').strip()
-        
-        # Parse player names (comma or newline separated)
         players = []
         for line in text.replace(',', '\n').split('\n'):
             name = line.strip()
             if name:
                 players.append(name)
+        return players
+    
+    @profiling.profiled('gui.balance_teams')
+    def balance_teams(self):
+        players = self.typed_players()
         
         if len(players) != 10:
             messagebox.showerror("Error", f"Need exactly 10 players, got {len(players)}")
             return
         
         try:
-            results = get_balanced_teams(players, num_results=5)
+            try:
+                results = self._balanced_teams(players)
+            except NameResolutionError as e:
+                if e.ambiguous or not messagebox.askyesno(
+                    "Unknown players",
+                    f"{e}\n\nBalance them as new players at the default ELO?"
+                ):
+                    raise
+                results = self._balanced_teams(players, allow_unknown=True)
+            info = balance_cache_info()
+            self.balance_cache_label.config(
+                text=f"Result cache: {info['hits']} hits, {info['misses']} misses"
+            )
             
             # Display results
             self.balance_result.delete('1.0', 'end')
             hide_elo = self.hide_elo_var.get()
             
+            corrections = results[0].get('corrections', {}) if results else {}
+            for typed, name in corrections.items():
+                self.balance_result.insert('end', f"Read '{typed}' as {name}\n")
+            
             for config in results:
                 self.balance_result.insert('end', f"\n{'='*70}\n")
-                self.balance_result.insert('end', f"Configuration #{config['rank']} - ELO Difference: {config['elo_difference']:.2f}\n")
+                uncertainty = ""
+                if 'difference_uncertainty' in config:
+                    uncertainty = f" (± {config['difference_uncertainty']:.0f})"
+                self.balance_result.insert('end', f"Configuration #{config['rank']} - ELO Difference: {config['elo_difference']:.2f}{uncertainty}\n")
                 self.balance_result.insert('end', f"{'='*70}\n\n")
                 
                 self.balance_result.insert('end', f"{'TEAM 1':<30} {'TEAM 2':<30}\n")
                 self.balance_result.insert('end', f"Avg ELO: {config['team1_avg_elo']:<20} Avg ELO: {config['team2_avg_elo']}\n")
+                if 'team1_synergy' in config:
+                    self.balance_result.insert('end', f"Synergy: {config['team1_synergy']:<+20.0f} Synergy: {config['team2_synergy']:+.0f}\n")
                 self.balance_result.insert('end', f"{'-'*70}\n")
                 
                 for j in range(5):
@@ -353,11 +614,97 @@ class CS2EloTracker:
                 
                 self.balance_result.insert('end', "\n")
             
+            self.root.after_idle(self.update_profile_status)
         except Exception as e:
             messagebox.showerror("Error", str(e))
     
+    def start_draft(self):
+        players = self.typed_players()
+        if len(players) < 2:
+            messagebox.showerror("Error", "List the players, captains first")
+            return
+        options = dict(
+            engine=self.engine_var.get(), map_name=self.map_var.get().strip() or None,
+            order=self.draft_order_var.get()
+        )
+        try:
+            try:
+                self.draft = self.workspace.start_draft(players, tuple(players[:2]), **options)
+            except NameResolutionError as e:
+                if e.ambiguous or not messagebox.askyesno(
+                    "Unknown players",
+                    f"{e}\n\nDraft them as new players at the default ELO?"
+                ):
+                    raise
+                self.draft = self.workspace.start_draft(players, tuple(players[:2]), allow_unknown=True, **options)
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.draft_panel.pack(side='left', fill='y', padx=5, pady=5, before=self.balance_result)
+        self.show_draft()
+    
+    @profiling.profiled('gui.show_draft')
+    def show_draft(self):
+        """List the available players best pick first and show the teams so far"""
+        draft = self.draft
+        hide_elo = self.hide_elo_var.get()
+        self.draft_list.delete(0, 'end')
+        suggestions = draft.suggestions()
+        self._draft_choices = [suggestion['player'] for suggestion in suggestions]
+        for suggestion in suggestions:
+            player = suggestion['player']
+            elo = "" if hide_elo else f" {draft.elos[player]:>5.0f}"
+            self.draft_list.insert('end', f"{player:<18}{elo} {suggestion['final_difference']:>6.1f}")
+        if draft.remaining and not draft.is_complete:
+            self.draft_list.selection_set(0)
+        
+        result = draft.result()
+        self.balance_result.delete('1.0', 'end')
+        if draft.is_complete:
+            self.balance_result.insert('end', f"Draft complete - ELO Difference: {result['elo_difference']:.2f}\n\n")
+        else:
+            # The best suggestion's final difference is where following the suggestions ends up
+            best = suggestions[0]
+            self.balance_result.insert(
+                'end', f"Team {draft.turn + 1} picks - suggested: {best['player']} "
+                       f"(final difference {best['final_difference']:.1f} if the suggestions are followed)\n\n"
+            )
+        for number, team in ((1, result['team1']), (2, result['team2'])):
+            average = "" if hide_elo else f" (avg {result[f'team{number}_avg_elo']:.0f})"
+            self.balance_result.insert('end', f"TEAM {number}{average}: {', '.join(team)}\n")
+        if draft.is_complete and result['bench']:
+            self.balance_result.insert('end', f"\nSitting out: {', '.join(result['bench'])}\n")
+        self.root.after_idle(self.update_profile_status)
+    
+    def draft_pick(self):
+        if self.draft is None or self.draft.is_complete:
+            return
+        selection = self.draft_list.curselection()
+        if not selection:
+            return
+        self.draft.pick(self._draft_choices[selection[0]])
+        self.show_draft()
+    
+    def draft_undo(self):
+        if self.draft is not None and self.draft.undo() is not None:
+            self.show_draft()
+    
+    def end_draft(self):
+        self.draft = None
+        self.draft_list.delete(0, 'end')
+        self.draft_panel.pack_forget()
+    
+    def _balanced_teams(self, players: List[str], allow_unknown: bool = False) -> List[Dict]:
+        return self.workspace.get_balanced_teams(
+            players, num_results=5, engine=self.engine_var.get(),
+            map_name=self.map_var.get().strip() or None,
+            synergy_weight=1.0 if self.synergy_var.get() else 0,
+            allow_unknown=allow_unknown
+        )
+    
+    @profiling.profiled('gui.refresh_aliases')
     def refresh_aliases(self):
-        aliases = load_aliases()
+        aliases = self._load_or_report(self.workspace.aliases, {})
         
         # Convert to readable format
         lines = []
@@ -382,33 +729,79 @@ class CS2EloTracker:
                     if alias and canonical:
                         aliases[alias] = canonical
         
-        save_json(DATA_DIR / "player_aliases.json", aliases)
+        self.workspace.save_aliases(aliases)
         messagebox.showinfo("Success", f"Saved {len(aliases)} aliases")
     
     def save_initial_elos(self):
         try:
             text = self.initial_elo_text.get('1.0', 'end')
             data = json.loads(text)
-            save_json(DATA_DIR / "initial_elos.json", data)
+            self.workspace.save_initial_elos(data)
             messagebox.showinfo("Success", "Initial ELOs saved!")
         except json.JSONDecodeError as e:
             messagebox.showerror("Error", f"Invalid JSON: {e}")
     
+    def refresh_initial_elos(self):
+        init_elos = self._load_or_report(self.workspace.initial_elos, None)
+        self.initial_elo_text.delete('1.0', 'end')
+        if init_elos is None:
+            # Show the broken text so the syntax error can be fixed here and saved
+            text = self.workspace.initial_elo_file.read_text(encoding='utf-8', errors='replace')
+        else:
+            text = json.dumps(init_elos, indent=2, ensure_ascii=False)
+        self.initial_elo_text.insert('1.0', text)
+    
+    def switch_workspace(self):
+        name = self.workspace_var.get().strip()
+        if name == self.workspace.name:
+            return
+        try:
+            workspace = get_workspace(name)
+        except ValueError as e:
+            self.workspace_var.set(self.workspace.name)
+            messagebox.showerror("Error", str(e))
+            return
+        
+        # Watching feeds one workspace; stop rather than switch silently
+        self.watch_var.set(False)
+        self.end_draft()
+        self.workspace = workspace
+        ensure_data_dir(workspace.data_dir)
+        self.workspace_combo['values'] = list_workspaces()
+        self.data_dir_label.config(text=str(workspace.data_dir))
+        self.parse_status.config(text=f"Workspace: {workspace.name}")
+        self.refresh_elos()
+        self.refresh_aliases()
+        self.refresh_initial_elos()
+    
     def open_data_folder(self):
         import subprocess
         import sys
         
+        data_dir = str(self.workspace.data_dir)
         if sys.platform == 'win32':
-            subprocess.run(['explorer', str(DATA_DIR)])
+            subprocess.run(['explorer', data_dir])
         elif sys.platform == 'darwin':
-            subprocess.run(['open', str(DATA_DIR)])
+            subprocess.run(['open', data_dir])
         else:
-            subprocess.run(['xdg-open', str(DATA_DIR)])
+            subprocess.run(['xdg-open', data_dir])
 
-def main():
-    root = tk.Tk()
-    app = CS2EloTracker(root)
-    root.mainloop()
+def main(argv=None):
+    from .cli import build_arg_parser, run_command, finish_profile
+    
+    args = build_arg_parser().parse_args(argv)
+    if args.profile:
+        profiling.enable()
+    
+    try:
+        if args.command:
+            run_command(args)
+        else:
+            root = tk.Tk()
+            app = CS2EloTracker(root, args.workspace)
+            root.mainloop()
+    finally:
+        finish_profile(args)
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
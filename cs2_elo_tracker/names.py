@@ -0,0 +1,179 @@
+"""Typo-tolerant resolution of typed player names to canonical names.
+
+Names and aliases are folded (NFKC, so full-width and other compatibility
+forms match their plain form, then casefolded). A typed name resolves, in
+order, by exact name or alias, by folded name, by a unique prefix of at
+least MIN_PREFIX characters, and finally by similarity: candidates sharing
+trigrams with the query are scored with difflib, and the best one wins if
+it is similar enough and clearly ahead of the next different player.
+
+Anything that does not resolve to exactly one player is reported as
+unknown or ambiguous (NameResolutionError), never guessed.
+"""
+import bisect
+import os
+import threading
+import unicodedata
+from collections import Counter
+from difflib import SequenceMatcher
+from itertools import chain
+from pathlib import Path
+from typing import List, Dict, Tuple, Set, Iterable, Optional
+
+from .utils import DATA_DIR, load_json, load_aliases, file_signature
+
+MIN_PREFIX = 3
+MIN_SIMILARITY = 0.75
+# A fuzzy match must beat the best other player by this much
+AMBIGUITY_MARGIN = 0.05
+# Candidates (by shared trigrams) scored with difflib per query
+MAX_CANDIDATES = 20
+# Candidates listed for an ambiguous name
+MAX_SUGGESTIONS = 5
+
+def fold(name: str) -> str:
+    """Comparison form of a name: NFKC, casefolded, whitespace collapsed"""
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+def _trigrams(key: str) -> Set[str]:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class NameResolutionError(ValueError):
+    """Typed names that are unknown or match several players"""
+    def __init__(self, unknown: List[str], ambiguous: Dict[str, List[str]]):
+        self.unknown = unknown
+        self.ambiguous = ambiguous
+        parts = []
+        if unknown:
+            parts.append(f"Unknown players: {', '.join(unknown)}")
+        for name, candidates in ambiguous.items():
+            parts.append(f"'{name}' could be {' or '.join(candidates)}")
+        super().__init__('; '.join(parts))
+
+class NameIndex:
+    """Canonical names and aliases, searchable by prefix and trigram"""
+    def __init__(self, names: Iterable[str], aliases: Dict[str, str] = None):
+        aliases = aliases or {}
+        self.exact: Dict[str, str] = {name: name for name in names}
+        for name in set(aliases.values()):
+            self.exact.setdefault(name, name)
+        self.exact.update(aliases)
+
+        # folded key -> canonical names it stands for
+        self.keys: Dict[str, Set[str]] = {}
+        for written, canonical in self.exact.items():
+            self.keys.setdefault(fold(written), set()).add(canonical)
+        self.sorted_keys = sorted(self.keys)
+        self.trigrams: Dict[str, List[str]] = {}
+        for key in self.sorted_keys:
+            for trigram in _trigrams(key):
+                self.trigrams.setdefault(trigram, []).append(key)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _prefixed(self, prefix: str) -> Iterable[str]:
+        start = bisect.bisect_left(self.sorted_keys, prefix)
+        for key in self.sorted_keys[start:]:
+            if not key.startswith(prefix):
+                break
+            yield key
+
+    def complete(self, typed: str, limit: int = 20) -> List[str]:
+        """Canonical names with a name or alias starting with `typed` (folded)"""
+        results: List[str] = []
+        for key in self._prefixed(fold(typed)):
+            for canonical in sorted(self.keys[key]):
+                if canonical not in results:
+                    results.append(canonical)
+            if len(results) >= limit:
+                break
+        return results[:limit]
+
+    def similar(self, typed: str, limit: int = 5) -> List[Tuple[str, float]]:
+        """Closest players by similarity of a name or alias, best first"""
+        query = fold(typed)
+        shared = Counter(chain.from_iterable(self.trigrams.get(t, ()) for t in _trigrams(query)))
+
+        best: Dict[str, float] = {}
+        for key, _ in shared.most_common(MAX_CANDIDATES):
+            score = SequenceMatcher(None, query, key).ratio()
+            for canonical in self.keys[key]:
+                if score > best.get(canonical, 0):
+                    best[canonical] = score
+        return sorted(best.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    def resolve(self, typed: str) -> Tuple[Optional[str], List[str]]:
+        """(canonical name, []) if `typed` names one player, else (None, candidates)"""
+        name = typed.strip()
+        if name in self.exact:
+            return self.exact[name], []
+        key = fold(name)
+        matches = self.keys.get(key)
+        if matches is None and len(key) >= MIN_PREFIX:
+            matches = {c for k in self._prefixed(key) for c in self.keys[k]} or None
+        if matches is not None:
+            if len(matches) == 1:
+                return next(iter(matches)), []
+            return None, sorted(matches)[:MAX_SUGGESTIONS]
+
+        scored = self.similar(name, MAX_SUGGESTIONS)
+        if not scored or scored[0][1] < MIN_SIMILARITY:
+            return None, []
+        close = [c for c, score in scored if score >= scored[0][1] - AMBIGUITY_MARGIN]
+        if len(close) == 1:
+            return close[0], []
+        return None, close
+
+    def resolve_all(self, typed_names: List[str], keep_unknown: bool = False) -> Tuple[List[str], Dict[str, str]]:
+        """Canonical names for a roster plus {typed: canonical} for every non-exact match.
+
+        Raises NameResolutionError listing every unknown and ambiguous name;
+        with keep_unknown, unknown names are kept as typed (new players).
+        """
+        resolved = []
+        corrections = {}
+        unknown = []
+        ambiguous = {}
+        for typed in typed_names:
+            canonical, candidates = self.resolve(typed)
+            if canonical is None:
+                if candidates:
+                    ambiguous[typed] = candidates
+                elif keep_unknown:
+                    resolved.append(typed.strip())
+                else:
+                    unknown.append(typed)
+                continue
+            resolved.append(canonical)
+            if canonical != typed and self.exact.get(typed) != canonical:
+                corrections[typed] = canonical
+        if unknown or ambiguous:
+            raise NameResolutionError(unknown, ambiguous)
+        return resolved, corrections
+
+# (rating file, alias file) -> ((signatures), NameIndex)
+_name_indexes: Dict[Tuple[str, str], Tuple[tuple, NameIndex]] = {}
+_name_index_lock = threading.Lock()
+
+def load_name_index(elo_file: Path, alias_file: Path = None) -> NameIndex:
+    """Index over the players of a rating file and the aliases, rebuilt when either changes"""
+    alias_path = Path(alias_file) if alias_file else DATA_DIR / "player_aliases.json"
+    key = (os.path.abspath(elo_file), os.path.abspath(alias_path))
+    signature = (file_signature(elo_file), file_signature(alias_path))
+    with _name_index_lock:
+        entry = _name_indexes.get(key)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+    index = NameIndex((p['name'] for p in load_json(Path(elo_file), [])), load_aliases(alias_path))
+    with _name_index_lock:
+        _name_indexes[key] = (signature, index)
+    return index
+
+def purge_name_index(directory: Path):
+    """Forget indexes built from rating files under a directory"""
+    prefix = os.path.join(os.path.abspath(directory), '')
+    with _name_index_lock:
+        for key in [k for k in _name_indexes if k[0].startswith(prefix)]:
+            del _name_indexes[key]
@@ -1,12 +1,18 @@
+import os
 import re
-from typing import List, Dict, Any
+import json
+import threading
+from typing import List, Dict, Any, Tuple, Iterable, Union
 from datetime import datetime
 from pathlib import Path
 
 from .utils import (
-    DATA_DIR, load_jsonl, save_jsonl, load_aliases, 
-    normalize_name
+    DATA_DIR, load_jsonl, save_jsonl, append_jsonl, load_aliases, 
+    normalize_name, file_signature, transaction, after_commit
 )
+from .synergy import pair_stats_file, update_pair_stats
+from .player_stats import player_stats_file, update_player_stats
+from . import profiling
 
 def parse_mvp_stars(star_text: str) -> int:
     """Parse MVP stars from text"""
@@ -211,6 +217,130 @@ def parse_matches_from_text(content: str, aliases: Dict[str, str] = None) -> Lis
     
     return matches
 
+# Match id -> content digest of each database file, valid while the file's (mtime, size) is unchanged
+_match_index: Dict[str, Tuple[tuple, Dict[str, int]]] = {}
+_match_index_lock = threading.Lock()
+
+def _match_digest(match: Dict[str, Any]) -> int:
+    # Only compared within this process, so the built-in hash is enough
+    return hash(json.dumps(match, sort_keys=True, ensure_ascii=False))
+
+def _match_digests(output_file: Path) -> Dict[str, int]:
+    key = os.path.abspath(output_file)
+    entry = _match_index.get(key)
+    if entry is not None and entry[0] == file_signature(output_file):
+        return entry[1]
+    with profiling.span('parse.load_existing'):
+        digests = {create_match_id(match): _match_digest(match) for match in load_jsonl(output_file)}
+    _match_index[key] = (file_signature(output_file), digests)
+    return digests
+
+def _remember_match_digests(output_file: Path, digests: Dict[str, int]):
+    with _match_index_lock:
+        _match_index[os.path.abspath(output_file)] = (file_signature(output_file), digests)
+
+def _forget_match_digests(output_file: Path):
+    with _match_index_lock:
+        _match_index.pop(os.path.abspath(output_file), None)
+
+def purge_match_index(directory: Path):
+    """Forget the match ids of database files under a directory"""
+    prefix = os.path.join(os.path.abspath(directory), '')
+    with _match_index_lock:
+        for key in [k for k in _match_index if k.startswith(prefix)]:
+            del _match_index[key]
+
+def merge_matches(
+    new_matches: List[Dict[str, Any]],
+    output_file: Path
+) -> Tuple[List[Dict[str, Any]], int, int, List[Dict[str, Any]]]:
+    """Store the new matches and update the pair / stat records.
+    
+    New matches are appended: the database is kept in insertion order
+    (readers sort by date) instead of being rewritten newest first. The
+    match ids and a digest of each match are kept between calls, so the
+    database write depends on the number of new matches rather than the
+    size of the history. The pair and scoreboard records are still saved
+    whole, so that part grows with the number of players and pairs.
+    
+    A match whose id is already stored replaces the stored one when its
+    contents differ (an edited re-paste), the last copy winning, and is
+    skipped when identical. A replacement rewrites the database in place
+    and rebuilds the records, since the old match cannot be subtracted.
+    
+    With seasons enabled (see seasons.py), matches of closed seasons are
+    ignored and a match from a later season closes the current one, which
+    leaves only that season in the database.
+    
+    The database and the records are committed together (see storage.py).
+    
+    Returns (inserted matches, matches in the database before, matches
+    after, replaced matches). The counts are of match ids, one per line
+    for databases written here.
+    """
+    with transaction(Path(output_file).parent):
+        return _merge_matches(new_matches, output_file)
+
+def _merge_matches(
+    new_matches: List[Dict[str, Any]],
+    output_file: Path
+) -> Tuple[List[Dict[str, Any]], int, int, List[Dict[str, Any]]]:
+    # Imported here: seasons depends on this module
+    from .seasons import drop_frozen, starts_new_season, close_seasons
+    new_matches = drop_frozen(new_matches, output_file)
+    
+    with _match_index_lock:
+        digests = _match_digests(output_file)
+        previous_total = len(digests)
+        
+        with profiling.span('parse.dedup'):
+            pending: Dict[str, Dict[str, Any]] = {}
+            for match in new_matches:
+                match_id = create_match_id(match)
+                if match_id in digests and digests[match_id] == _match_digest(match):
+                    pending.pop(match_id, None)
+                else:
+                    pending[match_id] = match
+            added = [match for match_id, match in pending.items() if match_id not in digests]
+            replaced = {match_id: match for match_id, match in pending.items() if match_id in digests}
+        profiling.count('parse.new_matches', len(added))
+        profiling.count('parse.replaced_matches', len(replaced))
+        
+        if pending:
+            with profiling.span('parse.save'):
+                if replaced:
+                    stored = load_jsonl(output_file)
+                    save_jsonl(output_file, [
+                        replaced.get(create_match_id(match), match) for match in stored
+                    ] + added)
+                else:
+                    append_jsonl(output_file, added)
+            digests.update((match_id, _match_digest(match)) for match_id, match in pending.items())
+            # Valid for the staged file now and for the committed file after the commit
+            _match_index[os.path.abspath(output_file)] = (file_signature(output_file), digests)
+            after_commit(lambda: _remember_match_digests(output_file, digests))
+    
+    # Teammate / opponent records and scoreboard aggregates, updated with the
+    # new matches only unless a stored match was replaced
+    records_total = None if replaced else previous_total
+    with profiling.span('parse.pair_stats'):
+        update_pair_stats(pair_stats_file(output_file), added, records_total, output_file)
+    with profiling.span('parse.player_stats'):
+        update_player_stats(player_stats_file(output_file), added, records_total, output_file)
+    
+    total = previous_total + len(added)
+    if starts_new_season(added, output_file):
+        # Seeds and aliases of the database's own data directory, like ingest_matches
+        data_dir = Path(output_file).parent
+        with profiling.span('parse.close_season'):
+            if close_seasons(output_file, data_dir / "initial_elos.json", data_dir / "player_aliases.json"):
+                total = len(load_jsonl(output_file))
+                # The database was rewritten with the current season only
+                after_commit(lambda: _forget_match_digests(output_file))
+    
+    return added, previous_total, total, list(replaced.values())
+
+@profiling.profiled('parse_and_save')
 def parse_and_save(input_file: str, output_file: str = None, alias_file: str = None) -> tuple:
     """Parse matches from file and save to database"""
     if output_file is None:
@@ -222,32 +352,39 @@ def parse_and_save(input_file: str, output_file: str = None, alias_file: str = N
     aliases = load_aliases(Path(alias_file) if alias_file else None)
     
     # Read input file
-    with open(input_file, 'r', encoding='utf-8') as f:
-        content = f.read()
+    with profiling.span('parse.read'):
+        with open(input_file, 'r', encoding='utf-8') as f:
+            content = f.read()
     
     # Parse new matches
-    new_matches = parse_matches_from_text(content, aliases)
+    with profiling.span('parse.regex'):
+        new_matches = parse_matches_from_text(content, aliases)
+    profiling.count('parse.matches', len(new_matches))
     
-    # Load existing matches
-    existing_matches = load_jsonl(output_file)
+    added, _, total, _ = merge_matches(new_matches, output_file)
     
-    # Merge and deduplicate
-    match_dict = {}
-    for match in existing_matches:
-        match_dict[create_match_id(match)] = match
-    
-    new_count = 0
-    for match in new_matches:
-        match_id = create_match_id(match)
-        if match_id not in match_dict:
-            new_count += 1
-        match_dict[match_id] = match
-    
-    # Sort by date (newest first)
-    all_matches = list(match_dict.values())
-    all_matches.sort(key=lambda m: parse_date(m.get('date', '')), reverse=True)
+    return len(new_matches), len(added), total
+
+
+def as_text(content: Union[str, Iterable[str]]) -> str:
+    """Join an iterable of lines (with or without line endings) into text"""
+    if isinstance(content, str):
+        return content
+    return '\n'.join(line.rstrip('\r\n') for line in content)
+
+@profiling.profiled('parse_and_save_text')
+def parse_and_save_text(
+    content: Union[str, Iterable[str]],
+    output_file: str = None,
+    alias_file: str = None
+) -> List[Dict[str, Any]]:
+    """Parse pasted match history (a string or lines) and store it; returns the inserted matches"""
+    output_file = Path(output_file) if output_file else DATA_DIR / "cs_matches.jsonl"
+    aliases = load_aliases(Path(alias_file) if alias_file else None)
     
-    # Save
-    save_jsonl(output_file, all_matches)
+    with profiling.span('parse.regex'):
+        matches = parse_matches_from_text(as_text(content), aliases)
+    profiling.count('parse.matches', len(matches))
     
-    return len(new_matches), new_count, len(all_matches)
\ No newline at end of file
+    added, _, _, _ = merge_matches(matches, output_file)
+    return added
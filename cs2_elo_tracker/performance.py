@@ -0,0 +1,118 @@
+"""Per-player shares of a team's Elo change from the match scoreboard.
+
+Each player's performance is a weighted mix of their share of the team's
+kills, assists, score, MVP stars and (inverted) deaths, relative to the
+team average. Winners who performed better gain more, losers who performed
+better lose less. Multipliers are renormalized to average 1 within each
+team, so the team's total rating change is the same as in plain Elo.
+
+All multipliers of a batch of matches are computed at once with NumPy.
+"""
+from itertools import chain
+from operator import itemgetter
+from typing import List, Dict, Any, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+# Weight of each scoreboard feature in the performance share (sums to 1)
+FEATURE_WEIGHTS = {
+    'kills': 0.3,
+    'score': 0.3,
+    'deaths': 0.2,
+    'assists': 0.1,
+    'mvp_stars': 0.1,
+}
+
+# Scoreboard fields as parsed by parse_player_data (always present there)
+_features = itemgetter(*FEATURE_WEIGHTS)
+
+# How strongly relative performance moves the multiplier away from 1
+DEFAULT_PERFORMANCE_WEIGHT = 0.5
+MIN_MULTIPLIER = 0.25
+MAX_MULTIPLIER = 1.75
+
+def _feature_matrix(players: List[Dict[str, Any]]) -> "np.ndarray":
+    num_features = len(FEATURE_WEIGHTS)
+    try:
+        values = np.fromiter(
+            chain.from_iterable(map(_features, players)), dtype=np.float64,
+            count=len(players) * num_features
+        )
+    except (KeyError, TypeError):
+        # Hand-edited records may lack a field or hold null
+        values = np.array(
+            [[player.get(f) or 0 for f in FEATURE_WEIGHTS] for player in players], dtype=np.float64
+        )
+    return values.reshape(len(players), num_features)
+
+def performance_multipliers(
+    matches: List[Dict[str, Any]],
+    weight: float = DEFAULT_PERFORMANCE_WEIGHT
+) -> List[Tuple[List[float], List[float]]]:
+    """Delta multipliers (team 1, team 2) for each match, in player order.
+
+    Undecided or one-sided matches get empty lists.
+    """
+    if np is None:
+        raise ImportError("NumPy is required for performance-weighted ratings (pip install numpy)")
+
+    players = []
+    team_sizes = []
+    won = []
+    decided = []
+    for match in matches:
+        team1 = match.get('team1_players', [])
+        team2 = match.get('team2_players', [])
+        winning_team = match.get('winning_team', 0)
+        if not team1 or not team2 or winning_team == 0:
+            decided.append(False)
+            continue
+        decided.append(True)
+        players.extend(team1)
+        players.extend(team2)
+        team_sizes.append(len(team1))
+        team_sizes.append(len(team2))
+        won.append(winning_team == 1)
+        won.append(winning_team == 2)
+
+    if not players:
+        return [([], []) for _ in matches]
+
+    features = _feature_matrix(players)
+    # Fewer deaths is better
+    deaths = list(FEATURE_WEIGHTS).index('deaths')
+    features[:, deaths] = 1 / (1 + features[:, deaths])
+    num_groups = len(won)
+    groups = np.repeat(np.arange(num_groups), team_sizes)
+    won = np.array(won, dtype=bool)
+
+    sizes = np.bincount(groups, minlength=num_groups).astype(np.float64)
+    shares = np.empty_like(features)
+    for f in range(features.shape[1]):
+        totals = np.bincount(groups, weights=features[:, f], minlength=num_groups)
+        # A feature nobody on the team scored on is shared equally
+        safe = np.where(totals > 0, totals, 1.0)
+        shares[:, f] = np.where(totals[groups] > 0, features[:, f] / safe[groups], 1.0 / sizes[groups])
+
+    relative = shares @ np.array(list(FEATURE_WEIGHTS.values())) * sizes[groups]
+    direction = np.where(won[groups], 1.0, -1.0)
+    multipliers = np.clip(1 + weight * direction * (relative - 1), MIN_MULTIPLIER, MAX_MULTIPLIER)
+    means = np.bincount(groups, weights=multipliers, minlength=num_groups) / sizes
+    multipliers = (multipliers / means[groups]).tolist()
+
+    results: List[Tuple[List[float], List[float]]] = []
+    start = 0
+    group = 0
+    for is_decided in decided:
+        if not is_decided:
+            results.append(([], []))
+            continue
+        team1_end = start + team_sizes[group]
+        team2_end = team1_end + team_sizes[group + 1]
+        results.append((multipliers[start:team1_end], multipliers[team1_end:team2_end]))
+        start = team2_end
+        group += 2
+    return results
@@ -0,0 +1,143 @@
+"""Running per-player and per-player-per-map scoreboard aggregates.
+
+Every scoreboard field keeps [count, mean, M2, total] updated with
+Welford's method, so totals, means and variances are available without
+rescanning the match history. Like the pair records, the aggregates are
+updated with each batch of newly ingested matches and persisted next to
+the ratings, and cover all seasons.
+"""
+import math
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional
+
+from .utils import DATA_DIR, load_json, save_json, load_jsonl
+
+STAT_FIELDS = ('kills', 'assists', 'deaths', 'mvp_stars', 'headshot_percentage', 'score', 'ping')
+
+def player_stats_file(matches_file: Path = None) -> Path:
+    """Aggregate file kept next to a match database (and player_elos.json)"""
+    if matches_file is None:
+        return DATA_DIR / "player_stats.json"
+    matches_file = Path(matches_file)
+    if matches_file.name == "cs_matches.jsonl":
+        return matches_file.with_name("player_stats.json")
+    return matches_file.with_name(f"{matches_file.stem}_player_stats.json")
+
+def _welford_add(acc: List[float], value: float):
+    acc[0] += 1
+    delta = value - acc[1]
+    acc[1] += delta / acc[0]
+    acc[2] += delta * (value - acc[1])
+    acc[3] += value
+
+def _describe(acc: List[float]) -> Dict[str, float]:
+    count, mean, m2, total = acc
+    return {
+        'count': count,
+        'total': total,
+        'mean': mean,
+        'std': math.sqrt(m2 / (count - 1)) if count > 1 else 0.0
+    }
+
+class StatAggregates:
+    """Scoreboard field aggregates per player and per (player, map)"""
+    def __init__(self):
+        self.matches = 0
+        # name -> field -> [count, mean, M2, total]
+        self.players: Dict[str, Dict[str, List[float]]] = {}
+        # name -> map -> field -> [count, mean, M2, total]
+        self.maps: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+
+    def add_match(self, match: Dict[str, Any]):
+        self.matches += 1
+        map_name = match.get('map', '')
+        for player in match.get('team1_players', []) + match.get('team2_players', []):
+            name = player['name']
+            targets = [self.players.setdefault(name, {})]
+            if map_name:
+                targets.append(self.maps.setdefault(name, {}).setdefault(map_name, {}))
+            for field in STAT_FIELDS:
+                value = player.get(field)
+                if value is None:
+                    continue
+                for fields in targets:
+                    _welford_add(fields.setdefault(field, [0, 0.0, 0.0, 0]), value)
+
+    def add_matches(self, matches: Iterable[Dict[str, Any]]):
+        for match in matches:
+            self.add_match(match)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StatAggregates":
+        aggregates = cls()
+        aggregates.matches = data.get('matches', 0)
+        aggregates.players = {
+            name: {field: list(acc) for field, acc in fields.items()}
+            for name, fields in data.get('players', {}).items()
+        }
+        aggregates.maps = {
+            name: {
+                map_name: {field: list(acc) for field, acc in fields.items()}
+                for map_name, fields in maps.items()
+            }
+            for name, maps in data.get('maps', {}).items()
+        }
+        return aggregates
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'matches': self.matches, 'players': self.players, 'maps': self.maps}
+
+    def field(self, name: str, field: str, map_name: str = None) -> Dict[str, float]:
+        """count / total / mean / std of one field for a player (on a map)"""
+        if map_name:
+            fields = self.maps.get(name, {}).get(map_name, {})
+        else:
+            fields = self.players.get(name, {})
+        return _describe(fields.get(field, [0, 0.0, 0.0, 0]))
+
+    def summary(self, name: str, map_name: str = None) -> Dict[str, Any]:
+        """Leaderboard figures for a player (on a map): per-game means and K/D"""
+        kills = self.field(name, 'kills', map_name)
+        deaths = self.field(name, 'deaths', map_name)
+        return {
+            'games': kills['count'],
+            'kills_avg': round(kills['mean'], 2),
+            'kills_std': round(kills['std'], 2),
+            'deaths_avg': round(deaths['mean'], 2),
+            'assists_avg': round(self.field(name, 'assists', map_name)['mean'], 2),
+            'kd': round(kills['total'] / deaths['total'], 2) if deaths['total'] else float(kills['total']),
+            'hs_avg': round(self.field(name, 'headshot_percentage', map_name)['mean'], 1),
+            'mvp_total': self.field(name, 'mvp_stars', map_name)['total'],
+            'score_avg': round(self.field(name, 'score', map_name)['mean'], 1),
+            'ping_avg': round(self.field(name, 'ping', map_name)['mean'], 1)
+        }
+
+def load_player_stats(filepath: Path = None) -> StatAggregates:
+    return StatAggregates.from_dict(load_json(Path(filepath) if filepath else player_stats_file(), {}))
+
+def save_player_stats(aggregates: StatAggregates, filepath: Path = None):
+    save_json(Path(filepath) if filepath else player_stats_file(), aggregates.to_dict(), indent=None)
+
+def update_player_stats(
+    filepath: Path,
+    new_matches: List[Dict[str, Any]],
+    previous_total: Optional[int],
+    matches_file: Path
+) -> StatAggregates:
+    """Add newly ingested matches to the stored aggregates (rebuilt from the
+    frozen seasons and the database if out of step or previous_total is None)"""
+    aggregates = load_player_stats(filepath)
+    if aggregates.matches != previous_total:
+        # Imported here: seasons depends on this module
+        from .seasons import frozen_matches
+        current = load_jsonl(Path(matches_file))
+        aggregates = StatAggregates()
+        aggregates.add_matches(frozen_matches(matches_file))
+        aggregates.add_matches(current)
+        aggregates.matches = len(current)
+    elif new_matches:
+        aggregates.add_matches(new_matches)
+    else:
+        return aggregates
+    save_player_stats(aggregates, filepath)
+    return aggregates
@@ -0,0 +1,158 @@
+"""Lightweight timing spans and counters for the parse / Elo / balance pipeline.
+
+Disabled by default: `span()` then returns a shared no-op context manager and
+`count()` returns immediately, so instrumented code pays one global lookup.
+Enable with `enable()` (the CLI does this for `--profile`) to record events,
+print a summary and write a Chrome trace-event JSON file (open it in
+chrome://tracing or https://ui.perfetto.dev).
+"""
+import json
+import os
+import threading
+import time
+from functools import wraps
+from pathlib import Path
+from typing import List, Dict, Optional
+
+_enabled = False
+_events: List[tuple] = []
+_counters: Dict[str, int] = {}
+_lock = threading.Lock()
+_origin = time.perf_counter()
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        with _lock:
+            _events.append((self.name, self.start, end, threading.get_ident()))
+        return False
+
+def enable():
+    """Start recording spans and counters"""
+    global _enabled
+    _enabled = True
+
+def disable():
+    """Stop recording (already recorded data is kept)"""
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+def reset():
+    """Discard recorded spans and counters"""
+    with _lock:
+        _events.clear()
+        _counters.clear()
+
+def span(name: str):
+    """Context manager timing a named section of code"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+def count(name: str, n: int = 1):
+    """Add n to a named counter"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+def profiled(name: str = None):
+    """Decorator wrapping a function call in a span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def summary() -> List[Dict]:
+    """Aggregate recorded spans by name, slowest total first"""
+    with _lock:
+        events = list(_events)
+    totals: Dict[str, Dict] = {}
+    for name, start, end, _ in events:
+        ms = (end - start) * 1000
+        entry = totals.setdefault(name, {'name': name, 'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        entry['calls'] += 1
+        entry['total_ms'] += ms
+        entry['max_ms'] = max(entry['max_ms'], ms)
+    rows = list(totals.values())
+    for row in rows:
+        row['mean_ms'] = row['total_ms'] / row['calls']
+    rows.sort(key=lambda r: r['total_ms'], reverse=True)
+    return rows
+
+def counters() -> Dict[str, int]:
+    with _lock:
+        return dict(_counters)
+
+def last_span(name: str) -> Optional[float]:
+    """Duration in ms of the most recent span with this name"""
+    with _lock:
+        for event in reversed(_events):
+            if event[0] == name:
+                return (event[2] - event[1]) * 1000
+    return None
+
+def format_summary() -> str:
+    """Human readable table of span totals and counters"""
+    lines = [f"{'span':<28} {'calls':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9}"]
+    for row in summary():
+        lines.append(
+            f"{row['name']:<28} {row['calls']:>6} {row['total_ms']:>10.2f} "
+            f"{row['mean_ms']:>9.2f} {row['max_ms']:>9.2f}"
+        )
+    for name, value in sorted(counters().items()):
+        lines.append(f"{name:<28} {value:>6}")
+    return '\n'.join(lines)
+
+def write_trace(filepath: Path):
+    """Write recorded spans and counters as a Chrome trace-event JSON file"""
+    with _lock:
+        events = list(_events)
+        counter_values = dict(_counters)
+    pid = os.getpid()
+    trace = [
+        {
+            'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+            'ts': round((start - _origin) * 1e6, 1),
+            'dur': round((end - start) * 1e6, 1)
+        }
+        for name, start, end, tid in events
+    ]
+    if counter_values:
+        trace.append({
+            'name': 'counters', 'ph': 'C', 'pid': pid, 'tid': 0,
+            'ts': round((time.perf_counter() - _origin) * 1e6, 1),
+            'args': counter_values
+        })
+    with open(filepath, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': trace, 'summary': summary(), 'counters': counter_values}, f, indent=2)
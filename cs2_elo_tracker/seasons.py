@@ -0,0 +1,294 @@
+"""Quarterly seasons with a soft rating reset at each boundary.
+
+Once seasons are enabled for a match database, every season before the
+current one is frozen: its matches move to `seasons/<season>.cs2a` (see
+archive.py) and its final standings to `seasons/<season>.json`, and they
+are never replayed again. The database itself keeps only the current
+season, so calculate_elos costs one season of matches.
+
+A returning player starts a season at `mean + carry * (rating - mean)`,
+where `rating` is their final rating in the last closed season they
+played (a player who skipped a quarter keeps their earlier rating) and
+`mean` the mean of those last known ratings. Each snapshot stores the
+last known ratings up to its season. New players start as before
+(initial_elos.json or the default). Snapshots are made with the engine and
+settings given when seasons were enabled.
+
+Pair records and scoreboard aggregates (synergy.py, player_stats.py) stay
+all-time: their counter follows the trimmed database, and when they are
+rebuilt the frozen archives are replayed before it.
+
+When an ingest brings the first match of a new season, the previous one is
+closed automatically. Matches dated in a frozen season are ignored on
+ingest. Career queries read the snapshots lazily, one season at a time.
+
+Closing seasons is one commit (see storage.py). With `compress` the
+frozen files are stored gzip-compressed (`.cs2a.gz` / `.json.gz`).
+"""
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Optional
+
+from .utils import DATA_DIR, load_json, save_json, load_jsonl, save_jsonl, transaction
+from .parser import parse_date
+from .archive import write_archive, read_archive
+from .engines import rating_file
+from .synergy import pair_stats_file, load_pair_stats, save_pair_stats, update_pair_stats
+from .player_stats import player_stats_file, load_player_stats, save_player_stats, update_player_stats
+from . import profiling
+
+# Share of the distance to the mean a rating keeps across a season boundary
+DEFAULT_CARRY = 0.5
+
+def season_of(date_str: str) -> str:
+    """Season (calendar quarter) of a match date, e.g. '2024-Q3'"""
+    date = parse_date(date_str)
+    return f"{date.year}-Q{(date.month - 1) // 3 + 1}"
+
+def seasons_dir(matches_file: Path = None) -> Path:
+    """Frozen seasons are kept in a `seasons` folder next to the match database"""
+    matches_file = Path(matches_file) if matches_file else DATA_DIR / "cs_matches.jsonl"
+    if matches_file.name == "cs_matches.jsonl":
+        return matches_file.parent / "seasons"
+    return matches_file.parent / f"{matches_file.stem}_seasons"
+
+def season_index_file(matches_file: Path = None) -> Path:
+    return seasons_dir(matches_file) / "seasons.json"
+
+def _gz(compress: bool) -> str:
+    return '.gz' if compress else ''
+
+def season_archive_file(season: str, matches_file: Path = None, compress: bool = False) -> Path:
+    return seasons_dir(matches_file) / f"{season}.cs2a{_gz(compress)}"
+
+def season_snapshot_file(season: str, matches_file: Path = None, compress: bool = False) -> Path:
+    return seasons_dir(matches_file) / f"{season}.json{_gz(compress)}"
+
+def load_season_index(matches_file: Path = None) -> Optional[Dict[str, Any]]:
+    """Season settings and closed seasons, or None if seasons are not enabled"""
+    return load_json(season_index_file(matches_file)) or None
+
+def soft_reset(ratings: Dict[str, float], carry: float) -> Dict[str, float]:
+    """Pull every rating towards the mean, keeping `carry` of the distance"""
+    if not ratings:
+        return {}
+    mean = sum(ratings.values()) / len(ratings)
+    return {name: mean + carry * (rating - mean) for name, rating in ratings.items()}
+
+def last_known_ratings(matches_file: Path = None) -> Dict[str, float]:
+    """Every player's final rating in the last closed season they played"""
+    index = load_season_index(matches_file)
+    if not index or not index['closed']:
+        return {}
+    compress = index.get('compress', False)
+    ratings: Dict[str, float] = {}
+    for season in reversed(index['closed']):
+        snapshot = load_json(season_snapshot_file(season['season'], matches_file, compress))
+        if 'last_ratings' in snapshot:
+            return {**snapshot['last_ratings'], **ratings}
+        # Snapshot without the running map: walk back one more season
+        for name, rating in snapshot['ratings'].items():
+            ratings.setdefault(name, rating)
+    return ratings
+
+def season_start_elos(matches_file: Path = None, custom_initial_elos: Dict[str, float] = None) -> Dict[str, float]:
+    """Starting ratings for the current season: soft-reset last known ratings
+    on top of custom_initial_elos (unchanged without seasons)"""
+    custom_initial_elos = custom_initial_elos or {}
+    index = load_season_index(matches_file)
+    if not index or not index['closed']:
+        return custom_initial_elos
+    return {**custom_initial_elos, **soft_reset(last_known_ratings(matches_file), index['carry'])}
+
+def drop_frozen(matches: List[Dict[str, Any]], matches_file: Path = None) -> List[Dict[str, Any]]:
+    """Matches that do not belong to a closed season"""
+    index = load_season_index(matches_file)
+    if not index or not index['closed']:
+        return matches
+    last_closed = index['closed'][-1]['season']
+    return [m for m in matches if _season_key(season_of(m.get('date', ''))) > _season_key(last_closed)]
+
+def _season_key(season: str):
+    year, quarter = season.split('-Q')
+    return int(year), int(quarter)
+
+def _freeze(season: str, matches: List[Dict[str, Any]], engine, index: Dict[str, Any],
+            matches_file: Path) -> Dict[str, Any]:
+    with profiling.span('seasons.replay'):
+        engine.process_matches(matches)
+    standings = engine.get_player_stats()
+    ratings = {player['name']: player['elo'] for player in standings}
+    snapshot = {
+        'season': season,
+        'engine': index['engine'],
+        'matches': len(matches),
+        'start_date': matches[0].get('date', ''),
+        'end_date': matches[-1].get('date', ''),
+        'ratings': ratings,
+        'last_ratings': {**last_known_ratings(matches_file), **ratings},
+        'standings': standings
+    }
+    compress = index.get('compress', False)
+    write_archive(matches, season_archive_file(season, matches_file, compress))
+    save_json(season_snapshot_file(season, matches_file, compress), snapshot)
+    return {key: snapshot[key] for key in ('season', 'matches', 'start_date', 'end_date')}
+
+def starts_new_season(matches: List[Dict[str, Any]], matches_file: Path = None) -> bool:
+    """Whether any of the matches is later than the current season"""
+    index = load_season_index(matches_file)
+    if not index or not matches:
+        return False
+    if index['current'] is None:
+        return True
+    current = _season_key(index['current'])
+    return any(_season_key(season_of(m.get('date', ''))) > current for m in matches)
+
+@profiling.profiled('close_seasons')
+def close_seasons(
+    matches_file: Path = None,
+    initial_elo_file: str = None,
+    alias_file: str = None
+) -> List[str]:
+    """Freeze every season older than the newest match; returns the closed seasons.
+
+    The match database is rewritten with the current season's matches only.
+    """
+    matches_file = Path(matches_file) if matches_file else DATA_DIR / "cs_matches.jsonl"
+    with transaction(matches_file.parent):
+        return _close_seasons(matches_file, initial_elo_file, alias_file)
+
+def _close_seasons(matches_file: Path, initial_elo_file: str, alias_file: str) -> List[str]:
+    # Imported here: elo depends on this module
+    from .elo import create_engine, load_custom_initial_elos
+    index = load_season_index(matches_file)
+    if index is None:
+        raise ValueError("Seasons are not enabled for this match database")
+
+    matches = sorted(load_jsonl(matches_file), key=lambda m: parse_date(m.get('date', '')))
+    if not matches:
+        return []
+    # Records out of step are rebuilt now, while every match is still in an
+    # archive or the database but not both
+    update_pair_stats(pair_stats_file(matches_file), [], len(matches), matches_file)
+    update_player_stats(player_stats_file(matches_file), [], len(matches), matches_file)
+    by_season: Dict[str, List[Dict[str, Any]]] = {}
+    for match in matches:
+        by_season.setdefault(season_of(match.get('date', '')), []).append(match)
+    current = season_of(matches[-1].get('date', ''))
+    # Left over if an earlier close was interrupted before the rewrite
+    frozen = {season['season'] for season in index['closed']}
+
+    custom_initial_elos = load_custom_initial_elos(initial_elo_file, alias_file)
+    closed = []
+    for season in sorted(by_season, key=_season_key):
+        if season == current or season in frozen:
+            continue
+        engine = create_engine(
+            index['engine'], index['k_factor'], index['initial_elo'],
+            season_start_elos(matches_file, custom_initial_elos)
+        )
+        index = dict(index, closed=index['closed'] + [
+            _freeze(season, by_season[season], engine, index, matches_file)
+        ])
+        save_json(season_index_file(matches_file), index)
+        closed.append(season)
+    if index.get('current') != current:
+        save_json(season_index_file(matches_file), dict(index, current=current))
+    if len(by_season) == 1:
+        return closed
+
+    remaining = by_season[current]
+    save_jsonl(matches_file, remaining)
+    # Pair records and scoreboard aggregates keep counting all seasons; their
+    # counter follows the matches left in the database (a rebuild replays
+    # the frozen archives first, see frozen_matches)
+    pair_stats = load_pair_stats(pair_stats_file(matches_file))
+    pair_stats.matches = len(remaining)
+    save_pair_stats(pair_stats, pair_stats_file(matches_file))
+    aggregates = load_player_stats(player_stats_file(matches_file))
+    aggregates.matches = len(remaining)
+    save_player_stats(aggregates, player_stats_file(matches_file))
+    return closed
+
+def enable_seasons(
+    matches_file: Path = None,
+    engine: str = 'elo',
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    carry: float = DEFAULT_CARRY,
+    initial_elo_file: str = None,
+    alias_file: str = None,
+    compress: bool = False
+) -> List[str]:
+    """Start keeping seasons for a match database and freeze the past ones"""
+    if not 0 <= carry <= 1:
+        raise ValueError(f"carry must be between 0 and 1, got {carry}")
+    matches_file = Path(matches_file) if matches_file else DATA_DIR / "cs_matches.jsonl"
+    with transaction(matches_file.parent):
+        if load_season_index(matches_file) is None:
+            save_json(season_index_file(matches_file), {
+                'engine': engine,
+                'k_factor': k_factor,
+                'initial_elo': initial_elo,
+                'carry': carry,
+                'compress': compress,
+                'current': None,
+                'closed': []
+            })
+        return close_seasons(matches_file, initial_elo_file, alias_file)
+
+def closed_seasons(matches_file: Path = None) -> List[Dict[str, Any]]:
+    """Name, match count and dates of every closed season, oldest first"""
+    index = load_season_index(matches_file)
+    return list(index['closed']) if index else []
+
+def _compressed(matches_file: Path = None) -> bool:
+    index = load_season_index(matches_file)
+    return bool(index and index.get('compress'))
+
+def season_standings(season: str, matches_file: Path = None) -> List[Dict[str, Any]]:
+    """Final standings of a closed season"""
+    snapshot = load_json(season_snapshot_file(season, matches_file, _compressed(matches_file)))
+    if not snapshot:
+        raise ValueError(f"No closed season {season}")
+    return snapshot['standings']
+
+def season_matches(season: str, matches_file: Path = None) -> List[Dict[str, Any]]:
+    """Matches of a closed season, read from its archive"""
+    return read_archive(season_archive_file(season, matches_file, _compressed(matches_file)))
+
+def frozen_matches(matches_file: Path = None) -> Iterator[Dict[str, Any]]:
+    """Matches of every closed season, oldest first, one archive at a time"""
+    for season in closed_seasons(matches_file):
+        yield from season_matches(season['season'], matches_file)
+
+def iter_career(player: str, matches_file: Path = None, engine: str = 'elo') -> Iterator[Dict[str, Any]]:
+    """A player's standing in each season they played, oldest first.
+
+    Snapshots are loaded one at a time as the iterator advances; the
+    current season comes last, from the engine's rating file.
+    """
+    for season in closed_seasons(matches_file):
+        for rank, row in enumerate(season_standings(season['season'], matches_file), 1):
+            if row['name'] == player:
+                yield {'season': season['season'], 'rank': rank, **row}
+                break
+    current = load_json(rating_file(engine, seasons_dir(matches_file).parent), [])
+    for rank, row in enumerate(current, 1):
+        if row['name'] == player:
+            yield {'season': 'current', 'rank': rank, **row}
+            break
+
+def career(player: str, matches_file: Path = None, engine: str = 'elo') -> Dict[str, Any]:
+    """Per-season rows plus games / wins summed over all seasons"""
+    seasons = list(iter_career(player, matches_file, engine))
+    games = sum(row['games'] for row in seasons)
+    wins = sum(row['wins'] for row in seasons)
+    return {
+        'name': player,
+        'seasons': seasons,
+        'games': games,
+        'wins': wins,
+        'losses': games - wins,
+        'win_rate': round(wins / games * 100, 2) if games > 0 else 0,
+        'peak_elo': max((row['elo'] for row in seasons), default=None)
+    }
@@ -0,0 +1,197 @@
+"""Monte Carlo simulation of best-of-N series and single-elimination brackets.
+
+Team strength is the balancer's team average of the players' ratings and a
+single map is won with `EloSystem.expected_score`. The chance of taking a
+best-of-N series is computed exactly from the map probability, so each
+simulated series costs one uniform draw; all simulations of a round are
+drawn as one NumPy array.
+
+A bracket definition is a JSON file:
+
+    {
+        "best_of": 3,
+        "teams": {"Alpha": ["player1", ...], "Bravo": [...], ...},
+        "bracket": ["Alpha", "Bravo", ...]
+    }
+
+"bracket" lists the teams in bracket order (first plays second, ...), with
+null for a bye; without it the teams are seeded by rating (1 v 16, 8 v 9,
+...). "best_of" may also be a list with one entry per round.
+"""
+import math
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Sequence, Union
+
+from .utils import load_json
+from .balancer import load_elos, team_average
+from .batch_elo import np, require_numpy
+from .elo import EloSystem
+from .engines import rating_file
+from .names import load_name_index
+from . import profiling
+
+DEFAULT_SIMULATIONS = 100000
+
+def series_win_probability(p: float, best_of: int = 3) -> float:
+    """Probability of winning a best-of-N series when each map is won with probability p"""
+    if best_of < 1 or best_of % 2 == 0:
+        raise ValueError(f"best_of must be a positive odd number, got {best_of}")
+    needed = (best_of + 1) // 2
+    # Win the deciding map after losing `lost` of the earlier ones
+    return sum(
+        math.comb(needed - 1 + lost, lost) * p ** needed * (1 - p) ** lost
+        for lost in range(needed)
+    )
+
+def standard_seeding(num_slots: int) -> List[int]:
+    """Bracket order of seeds 0..n-1 so that the top seeds meet as late as possible"""
+    order = [0]
+    while len(order) < num_slots:
+        size = len(order) * 2
+        order = [seed for s in order for seed in (s, size - 1 - s)]
+    return order
+
+def team_ratings(
+    teams: Dict[str, List[str]],
+    elo_file: str = None,
+    alias_file: str = None,
+    engine: str = 'elo',
+    map_name: str = None,
+    allow_unknown: bool = False
+) -> Dict[str, float]:
+    """Average rating of each team's players.
+    
+    Typed names are resolved like get_balanced_teams does: unknown or
+    ambiguous names raise NameResolutionError, unless allow_unknown admits
+    unknown ones as new players at the default rating.
+    """
+    elo_path = Path(elo_file) if elo_file else rating_file(engine)
+    typed = [p for players in teams.values() for p in players]
+    resolved, _ = load_name_index(elo_path, alias_file).resolve_all(typed, keep_unknown=allow_unknown)
+    elos = load_elos(elo_path, map_name)
+    ratings = {}
+    start = 0
+    for team, players in teams.items():
+        ratings[team] = team_average(resolved[start:start + len(players)], elos)
+        start += len(players)
+    return ratings
+
+def _best_of_rounds(best_of: Union[int, Sequence[int]], num_rounds: int) -> List[int]:
+    if isinstance(best_of, int):
+        return [best_of] * num_rounds
+    rounds = list(best_of)
+    if len(rounds) != num_rounds:
+        raise ValueError(f"best_of lists {len(rounds)} rounds, bracket has {num_rounds}")
+    return rounds
+
+@profiling.profiled('simulate_bracket')
+def simulate_bracket(
+    ratings: Dict[str, float],
+    bracket: List[Optional[str]] = None,
+    best_of: Union[int, Sequence[int]] = 3,
+    simulations: int = DEFAULT_SIMULATIONS,
+    seed: int = None
+) -> Dict[str, Any]:
+    """Simulate a single-elimination bracket and report each team's chances.
+
+    advance[r] is the probability of winning round r (the last entry is
+    winning the bracket). The same seed always gives the same result.
+    """
+    require_numpy()
+    if bracket is None:
+        seeded = sorted(ratings, key=lambda t: ratings[t], reverse=True)
+        num_slots = 1 << max(len(seeded) - 1, 1).bit_length()
+        seeded += [None] * (num_slots - len(seeded))
+        bracket = [seeded[s] for s in standard_seeding(num_slots)]
+
+    num_slots = len(bracket)
+    if num_slots < 2 or num_slots & (num_slots - 1):
+        raise ValueError(f"Bracket needs a power of two slots (use null for byes), got {num_slots}")
+    teams = [t for t in bracket if t is not None]
+    unknown = [t for t in teams if t not in ratings]
+    if unknown:
+        raise ValueError(f"Teams without a rating: {', '.join(unknown)}")
+    if len(set(teams)) != len(teams):
+        raise ValueError("A team appears more than once in the bracket")
+
+    num_rounds = num_slots.bit_length() - 1
+    rounds = _best_of_rounds(best_of, num_rounds)
+
+    # Series win probability per round for every pairing; index len(teams) is a bye
+    bye = len(teams)
+    map_win = np.full((bye + 1, bye + 1), 0.5)
+    elo = EloSystem()
+    for i, a in enumerate(teams):
+        for j, b in enumerate(teams):
+            map_win[i, j] = elo.expected_score(ratings[a], ratings[b])
+        map_win[i, bye] = 1.0
+        map_win[bye, i] = 0.0
+    series_win = [
+        np.vectorize(series_win_probability)(map_win, n) for n in rounds
+    ]
+
+    rng = np.random.default_rng(seed)
+    slot_ids = np.array([teams.index(t) if t is not None else bye for t in bracket], dtype=np.intp)
+    alive = np.broadcast_to(slot_ids, (simulations, num_slots))
+    advance = np.zeros((num_rounds, bye + 1))
+    with profiling.span('simulate.rounds'):
+        for r in range(num_rounds):
+            first = alive[:, 0::2]
+            second = alive[:, 1::2]
+            p = series_win[r][first, second]
+            alive = np.where(rng.random(p.shape) < p, first, second)
+            advance[r] = np.bincount(alive.ravel(), minlength=bye + 1) / simulations
+    profiling.count('simulate.series', simulations * (num_slots - 1))
+
+    results = [
+        {
+            'team': team,
+            'rating': round(ratings[team], 2),
+            'advance': [round(float(advance[r, i]), 4) for r in range(num_rounds)],
+            'win_probability': round(float(advance[-1, i]), 4)
+        }
+        for i, team in enumerate(teams)
+    ]
+    results.sort(key=lambda x: x['win_probability'], reverse=True)
+    return {
+        'simulations': simulations,
+        'seed': seed,
+        'best_of': rounds,
+        'bracket': bracket,
+        'teams': results
+    }
+
+def simulate_series(
+    ratings: Dict[str, float],
+    team1: str,
+    team2: str,
+    best_of: int = 3,
+    simulations: int = DEFAULT_SIMULATIONS,
+    seed: int = None
+) -> Dict[str, Any]:
+    """Simulate one best-of-N series; also returns the exact probability"""
+    result = simulate_bracket(ratings, [team1, team2], best_of, simulations, seed)
+    map_win = EloSystem().expected_score(ratings[team1], ratings[team2])
+    result['map_win_probability'] = round(map_win, 4)
+    result['exact_win_probability'] = round(series_win_probability(map_win, best_of), 4)
+    return result
+
+def simulate_from_file(
+    bracket_file: str,
+    simulations: int = DEFAULT_SIMULATIONS,
+    seed: int = None,
+    elo_file: str = None,
+    alias_file: str = None,
+    engine: str = 'elo',
+    allow_unknown: bool = False
+) -> Dict[str, Any]:
+    """Load a bracket definition (see module docstring) and simulate it"""
+    definition = load_json(Path(bracket_file))
+    if not definition or 'teams' not in definition:
+        raise ValueError(f"No teams defined in {bracket_file}")
+    ratings = team_ratings(
+        definition['teams'], elo_file, alias_file, engine, definition.get('map'), allow_unknown
+    )
+    return simulate_bracket(
+        ratings, definition.get('bracket'), definition.get('best_of', 3), simulations, seed
+    )
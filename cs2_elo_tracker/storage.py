@@ -0,0 +1,326 @@
+"""Crash-safe writes of the data files.
+
+A file is never written in place: the new contents go to a temporary file
+next to it, which is fsynced and renamed over the target (and the
+directory fsynced), so a crash leaves the old or the new file, never a
+truncated one.
+
+Related updates are grouped with `transaction(directory)`. Writes made
+inside it (by the same thread) are staged in memory, read back by
+load_json / load_jsonl, and committed together on exit: every staged file
+is written to a temporary file, then a journal (JOURNAL_NAME in the
+directory) listing them is written atomically. That is the commit point;
+the temporary files are then renamed over their targets (appends are
+applied to the end of the recorded size) and the journal removed.
+`recover()` redoes a journal left behind by a crash, so either all files
+of a transaction change or none do. A write outside a transaction is
+committed on its own, without a journal when it is a single replace.
+
+Paths ending in `.gz` are stored gzip-compressed; each append becomes a
+gzip member of its own, which gzip readers concatenate.
+"""
+import gzip
+import itertools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional
+
+JOURNAL_NAME = ".journal.json"
+TEMP_SUFFIX = ".tmp"
+# Temporary files older than this are leftovers of a crash before a commit point
+STALE_TEMP_SECONDS = 3600
+
+_local = threading.local()
+_commit_lock = threading.Lock()
+_temp_ids = itertools.count()
+_serials = itertools.count(1)
+
+_stats_lock = threading.Lock()
+_write_stats: Dict[str, Any] = {}
+
+def reset_write_stats():
+    """Zero the counters of bytes written, fsyncs and commits"""
+    with _stats_lock:
+        _write_stats.clear()
+        _write_stats.update({'bytes': 0, 'files': 0, 'fsyncs': 0, 'commits': 0, 'by_file': {}})
+
+reset_write_stats()
+
+def write_stats() -> Dict[str, Any]:
+    """Bytes written (in total, and per target file name), fsyncs and commits"""
+    with _stats_lock:
+        return dict(_write_stats, by_file=dict(_write_stats['by_file']))
+
+def _count(target: Path, size: int, fsyncs: int = 1):
+    with _stats_lock:
+        _write_stats['bytes'] += size
+        _write_stats['files'] += 1
+        _write_stats['fsyncs'] += fsyncs
+        name = Path(target).name
+        _write_stats['by_file'][name] = _write_stats['by_file'].get(name, 0) + size
+
+def is_compressed(filepath: Path) -> bool:
+    return Path(filepath).suffix == '.gz'
+
+def encode(filepath: Path, data: bytes) -> bytes:
+    """Bytes as stored in `filepath` (gzip for .gz paths)"""
+    return gzip.compress(data, mtime=0) if is_compressed(filepath) else data
+
+def read_bytes(filepath: Path) -> bytes:
+    """Contents of a data file, decompressed for .gz paths"""
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    return gzip.decompress(data) if is_compressed(filepath) else data
+
+def _fsync_dir(directory: Path):
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        # Directories cannot be opened on some platforms (Windows)
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+    with _stats_lock:
+        _write_stats['fsyncs'] += 1
+
+def _temp_path(target: Path) -> Path:
+    return target.with_name(f".{target.name}.{os.getpid()}-{next(_temp_ids)}{TEMP_SUFFIX}")
+
+def _write_durable(filepath: Path, data: bytes, target: Path):
+    with open(filepath, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    _count(target, len(data))
+
+def atomic_write(filepath: Path, data: bytes):
+    """Replace a file with `data` (already encoded) via a fsynced temporary file"""
+    filepath = Path(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    temp = _temp_path(filepath)
+    try:
+        _write_durable(temp, data, filepath)
+        os.replace(temp, filepath)
+    except BaseException:
+        _unlink(temp)
+        raise
+    _fsync_dir(filepath.parent)
+
+def _unlink(filepath: Path):
+    try:
+        os.unlink(filepath)
+    except FileNotFoundError:
+        pass
+
+class StagedFile:
+    """Pending change of one file: new contents, or bytes to append.
+
+    `value` is the parsed object that was saved (contents) and `items` the
+    records appended since, so readers see the staged state without
+    decoding it again.
+    """
+    __slots__ = ('contents', 'appended', 'value', 'items', 'serial')
+
+    def __init__(self):
+        self.contents: Optional[bytearray] = None
+        self.appended = bytearray()
+        self.value = None
+        self.items: List[Any] = []
+        self.serial = 0
+
+class Transaction:
+    """Writes staged for one commit point"""
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.staged: Dict[str, StagedFile] = {}
+        self.callbacks: List[Callable[[], None]] = []
+
+    def _entry(self, filepath: Path) -> StagedFile:
+        key = os.path.abspath(filepath)
+        entry = self.staged.get(key)
+        if entry is None:
+            entry = self.staged[key] = StagedFile()
+        entry.serial = next(_serials)
+        return entry
+
+    def write(self, filepath: Path, data: bytes, value=None):
+        entry = self._entry(filepath)
+        entry.contents = bytearray(data)
+        entry.appended = bytearray()
+        entry.value = value
+        entry.items = []
+
+    def append(self, filepath: Path, data: bytes, items: List[Any] = None):
+        entry = self._entry(filepath)
+        if entry.contents is not None:
+            entry.contents += data
+        else:
+            entry.appended += data
+        entry.items.extend(items or [])
+
+    def _relative(self, filepath) -> str:
+        return os.path.relpath(filepath, self.directory)
+
+    def commit(self):
+        """Make every staged write durable, all or nothing"""
+        if self.staged:
+            with _commit_lock:
+                self._commit()
+            with _stats_lock:
+                _write_stats['commits'] += 1
+            self.staged.clear()
+        # Outside the commit lock: callbacks may take other locks
+        callbacks, self.callbacks = self.callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def _commit(self):
+        if len(self.staged) == 1:
+            path, entry = next(iter(self.staged.items()))
+            if entry.contents is not None:
+                atomic_write(Path(path), encode(path, bytes(entry.contents)))
+                return
+
+        ops = []
+        try:
+            for path, entry in self.staged.items():
+                target = Path(path)
+                target.parent.mkdir(parents=True, exist_ok=True)
+                temp = _temp_path(target)
+                if entry.contents is not None:
+                    op = {'op': 'replace'}
+                    data = encode(target, bytes(entry.contents))
+                else:
+                    op = {'op': 'append', 'size': target.stat().st_size if target.exists() else 0}
+                    data = encode(target, bytes(entry.appended))
+                op.update(path=self._relative(target), temp=self._relative(temp))
+                ops.append(op)
+                _write_durable(temp, data, target)
+            for directory in {Path(path).parent for path in self.staged}:
+                _fsync_dir(directory)
+            # Commit point
+            atomic_write(self.directory / JOURNAL_NAME, json.dumps(ops, indent=1).encode('utf-8'))
+        except BaseException:
+            for op in ops:
+                _unlink(self.directory / op['temp'])
+            raise
+        _apply(self.directory, ops)
+
+def _apply(directory: Path, ops: List[Dict[str, Any]]):
+    """Carry out a journal's operations (again, after a crash) and remove it"""
+    directories = set()
+    for op in ops:
+        target = directory / op['path']
+        temp = directory / op['temp']
+        directories.add(target.parent)
+        if not temp.exists():
+            # Already applied before the crash
+            continue
+        if op['op'] == 'replace':
+            os.replace(temp, target)
+        else:
+            with open(temp, 'rb') as f:
+                data = f.read()
+            with open(target, 'r+b' if target.exists() else 'wb') as f:
+                f.truncate(op['size'])
+                f.seek(op['size'])
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            _count(target, len(data))
+            os.unlink(temp)
+    for target_dir in directories:
+        _fsync_dir(target_dir)
+    # Not fsynced: a journal that reappears after a power loss redoes nothing
+    _unlink(directory / JOURNAL_NAME)
+
+def recover(directory: Path, remove_stale: bool = True) -> int:
+    """Finish a transaction interrupted after its commit point; returns the files redone.
+
+    With remove_stale, temporary files of transactions that crashed before
+    their commit point are deleted too.
+    """
+    directory = Path(directory)
+    journal = directory / JOURNAL_NAME
+    redone = 0
+    if journal.exists():
+        with _commit_lock:
+            try:
+                ops = json.loads(read_bytes(journal))
+            except (OSError, ValueError):
+                ops = None
+            if ops is not None:
+                redone = sum((directory / op['temp']).exists() for op in ops)
+                _apply(directory, ops)
+    if remove_stale and directory.is_dir():
+        cutoff = time.time() - STALE_TEMP_SECONDS
+        for temp in directory.rglob(f".*{TEMP_SUFFIX}"):
+            try:
+                if temp.stat().st_mtime < cutoff:
+                    temp.unlink()
+            except OSError:
+                pass
+    return redone
+
+def current_transaction() -> Optional[Transaction]:
+    return getattr(_local, 'transaction', None)
+
+def staged(filepath: Path) -> Optional[StagedFile]:
+    """Pending change of a file in this thread's transaction, if any"""
+    txn = getattr(_local, 'transaction', None)
+    if txn is None or not txn.staged:
+        return None
+    return txn.staged.get(os.path.abspath(filepath))
+
+@contextmanager
+def transaction(directory: Path):
+    """Group the writes of the block into one commit point (journal in `directory`).
+
+    Nested blocks join the outermost transaction. If the block raises,
+    nothing it wrote reaches the disk.
+    """
+    outer = current_transaction()
+    if outer is not None:
+        yield outer
+        return
+    if (Path(directory) / JOURNAL_NAME).exists():
+        recover(directory, remove_stale=False)
+    txn = _local.transaction = Transaction(directory)
+    try:
+        yield txn
+        _local.transaction = None
+        txn.commit()
+    finally:
+        _local.transaction = None
+
+def after_commit(callback: Callable[[], None]):
+    """Run callback once this thread's writes are durable (now, outside a transaction)"""
+    txn = current_transaction()
+    if txn is None:
+        callback()
+    else:
+        txn.callbacks.append(callback)
+
+def write_file(filepath: Path, data: bytes, value=None):
+    """Replace a file with `data` (uncompressed), staged if a transaction is open"""
+    txn = current_transaction()
+    if txn is None:
+        atomic_write(filepath, encode(filepath, data))
+    else:
+        txn.write(filepath, data, value)
+
+def append_file(filepath: Path, data: bytes, items: List[Any] = None):
+    """Append `data` (uncompressed) to a file, crash-safely"""
+    if current_transaction() is None:
+        with transaction(Path(filepath).parent) as txn:
+            txn.append(filepath, data, items)
+    else:
+        current_transaction().append(filepath, data, items)
@@ -0,0 +1,220 @@
+"""Teammate and head-to-head records for every pair of players.
+
+Records are stored sparsely by interned player id (ids are only ever
+appended) and updated with each batch of newly ingested matches, so the
+full history is only replayed when the stored records do not match the
+match database (e.g. the first run). With seasons the records cover all
+seasons; `matches` counts only those in the database.
+"""
+import math
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from .utils import DATA_DIR, load_json, save_json, load_jsonl
+
+# Pseudo-games at a 50% win rate added before turning records into synergy
+SYNERGY_PRIOR_GAMES = 20
+
+# Elo points per unit of log-odds
+ELO_PER_LOGIT = 400 / math.log(10)
+
+def pair_stats_file(matches_file: Path = None) -> Path:
+    """Pair record file kept next to a match database"""
+    if matches_file is None:
+        return DATA_DIR / "pair_stats.json"
+    matches_file = Path(matches_file)
+    if matches_file.name == "cs_matches.jsonl":
+        return matches_file.with_name("pair_stats.json")
+    return matches_file.with_name(f"{matches_file.stem}_pair_stats.json")
+
+def _pair(a: int, b: int) -> Tuple[int, int]:
+    return (a, b) if a < b else (b, a)
+
+def _record(games: int, wins: int) -> Dict[str, Any]:
+    return {
+        'games': games,
+        'wins': wins,
+        'losses': games - wins,
+        'win_rate': round(wins / games * 100, 2) if games > 0 else 0
+    }
+
+def _log_odds(games: int, wins: int) -> float:
+    prior = SYNERGY_PRIOR_GAMES / 2
+    return math.log((wins + prior) / (games - wins + prior))
+
+class PairStats:
+    """Win/loss of every player, every pair of teammates and every pair of opponents"""
+    def __init__(self):
+        self.player_ids: Dict[str, int] = {}
+        self.player_names: List[str] = []
+        self.matches = 0
+        # player id -> [games, wins]
+        self.players: Dict[int, List[int]] = {}
+        # (low id, high id) -> [games, wins] as teammates
+        self.together: Dict[Tuple[int, int], List[int]] = {}
+        # (low id, high id) -> [games, wins of the low id] as opponents
+        self.versus: Dict[Tuple[int, int], List[int]] = {}
+
+    def _intern(self, name: str) -> int:
+        player_id = self.player_ids.get(name)
+        if player_id is None:
+            player_id = self.player_ids[name] = len(self.player_names)
+            self.player_names.append(name)
+        return player_id
+
+    def add_match(self, match: Dict[str, Any]):
+        """Count one ingested match (undecided ones only bump the match counter)"""
+        self.matches += 1
+        team1_players = match.get('team1_players', [])
+        team2_players = match.get('team2_players', [])
+        winning_team = match.get('winning_team', 0)
+        if not team1_players or not team2_players or winning_team == 0:
+            return
+
+        team1 = [self._intern(p['name']) for p in team1_players]
+        team2 = [self._intern(p['name']) for p in team2_players]
+        for team, won in ((team1, winning_team == 1), (team2, winning_team == 2)):
+            for i, a in enumerate(team):
+                record = self.players.setdefault(a, [0, 0])
+                record[0] += 1
+                record[1] += won
+                for b in team[i + 1:]:
+                    record = self.together.setdefault(_pair(a, b), [0, 0])
+                    record[0] += 1
+                    record[1] += won
+        for a in team1:
+            for b in team2:
+                record = self.versus.setdefault(_pair(a, b), [0, 0])
+                record[0] += 1
+                # Wins are counted for the lower id of the pair
+                record[1] += (winning_team == 1) == (a < b)
+
+    def add_matches(self, matches: Iterable[Dict[str, Any]]):
+        for match in matches:
+            self.add_match(match)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "PairStats":
+        stats = cls()
+        for name in data.get('players', []):
+            stats._intern(name)
+        stats.matches = data.get('matches', 0)
+        stats.players = {i: [g, w] for i, g, w in data.get('player_records', [])}
+        stats.together = {(a, b): [g, w] for a, b, g, w in data.get('together', [])}
+        stats.versus = {(a, b): [g, w] for a, b, g, w in data.get('versus', [])}
+        return stats
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'matches': self.matches,
+            'players': self.player_names,
+            'player_records': [[i, g, w] for i, (g, w) in self.players.items()],
+            'together': [[a, b, g, w] for (a, b), (g, w) in self.together.items()],
+            'versus': [[a, b, g, w] for (a, b), (g, w) in self.versus.items()]
+        }
+
+    def duo(self, a: str, b: str) -> Dict[str, Any]:
+        """Record of two players on the same team"""
+        ids = (self.player_ids.get(a), self.player_ids.get(b))
+        games, wins = self.together.get(_pair(*ids), (0, 0)) if None not in ids else (0, 0)
+        return _record(games, wins)
+
+    def head_to_head(self, player: str, opponent: str) -> Dict[str, Any]:
+        """Record of `player` against `opponent`"""
+        a, b = self.player_ids.get(player), self.player_ids.get(opponent)
+        if a is None or b is None or a == b:
+            return _record(0, 0)
+        games, low_wins = self.versus.get(_pair(a, b), (0, 0))
+        return _record(games, low_wins if a < b else games - low_wins)
+
+    def synergy(self, a: str, b: str) -> float:
+        """Elo-equivalent boost of a team for having a and b together.
+
+        Under team-average Elo a duo's log-odds of winning are about the sum
+        of the two players' overall log-odds, so only the excess over that
+        sum is counted. All rates are shrunk towards 50% so a handful of
+        games does not produce a large value.
+        """
+        ids = (self.player_ids.get(a), self.player_ids.get(b))
+        if None in ids or ids[0] == ids[1]:
+            return 0.0
+        games, wins = self.together.get(_pair(*ids), (0, 0))
+        if games == 0:
+            return 0.0
+        excess = _log_odds(games, wins) - sum(_log_odds(*self.players[i]) for i in ids)
+        return excess * ELO_PER_LOGIT
+
+    def best_duos(self, min_games: int = 5, top: int = 10, reverse: bool = True) -> List[Dict[str, Any]]:
+        """Teammate pairs by win rate together (reverse=False for the worst)"""
+        duos = []
+        for (a, b), (games, wins) in self.together.items():
+            if games < min_games:
+                continue
+            names = [self.player_names[a], self.player_names[b]]
+            duos.append({'players': names, 'synergy': round(self.synergy(*names), 2), **_record(games, wins)})
+        duos.sort(key=lambda d: (d['win_rate'], d['games'] if reverse else -d['games']), reverse=reverse)
+        return duos[:top]
+
+    def teammates(self, player: str, min_games: int = 1) -> List[Dict[str, Any]]:
+        """Everyone `player` has played with, best win rate together first"""
+        records = []
+        for name in self.player_names:
+            if name == player:
+                continue
+            record = self.duo(player, name)
+            if record['games'] >= min_games:
+                records.append({'player': name, **record})
+        records.sort(key=lambda r: (r['win_rate'], r['games']), reverse=True)
+        return records
+
+    def opponents(self, player: str, min_games: int = 1) -> List[Dict[str, Any]]:
+        """Everyone `player` has played against, worst win rate against first"""
+        records = []
+        for name in self.player_names:
+            if name == player:
+                continue
+            record = self.head_to_head(player, name)
+            if record['games'] >= min_games:
+                records.append({'player': name, **record})
+        records.sort(key=lambda r: (r['win_rate'], -r['games']))
+        return records
+
+    def nemesis(self, player: str, min_games: int = 3) -> Dict[str, Any]:
+        """The opponent `player` loses to most often (None if none qualifies)"""
+        records = self.opponents(player, min_games)
+        return records[0] if records else None
+
+def load_pair_stats(filepath: Path = None) -> PairStats:
+    return PairStats.from_dict(load_json(Path(filepath) if filepath else pair_stats_file(), {}))
+
+def save_pair_stats(stats: PairStats, filepath: Path = None):
+    save_json(Path(filepath) if filepath else pair_stats_file(), stats.to_dict(), indent=None)
+
+def update_pair_stats(
+    filepath: Path,
+    new_matches: List[Dict[str, Any]],
+    previous_total: Optional[int],
+    matches_file: Path
+) -> PairStats:
+    """Add newly ingested matches to the stored records.
+
+    If the stored records do not cover exactly the `previous_total` matches
+    that were already in the database (or `previous_total` is None) they
+    are rebuilt from the frozen seasons and `matches_file` (which already
+    holds the new matches).
+    """
+    stats = load_pair_stats(filepath)
+    if stats.matches != previous_total:
+        # Imported here: seasons depends on this module
+        from .seasons import frozen_matches
+        current = load_jsonl(Path(matches_file))
+        stats = PairStats()
+        stats.add_matches(frozen_matches(matches_file))
+        stats.add_matches(current)
+        stats.matches = len(current)
+    elif new_matches:
+        stats.add_matches(new_matches)
+    else:
+        return stats
+    save_pair_stats(stats, filepath)
+    return stats
@@ -0,0 +1,177 @@
+"""Synthetic Steam scrimmage history generator for benchmarks and stress tests.
+
+Writes match history in the same layout as a copy-paste of the Steam
+scrimmage page, so the output can be fed straight into
+`parse_matches_from_text` / `parse_and_save`.
+"""
+import argparse
+import itertools
+import math
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import List, Dict, Iterator, TextIO
+
+MAPS = [
+    'Dust II', 'Mirage', 'Inferno', 'Nuke', 'Overpass', 'Ancient', 'Anubis',
+    'Vertigo', 'Train'
+]
+
+HEADER = 'Player Name\tPing\tK\tA\tD\t★\tHSP\tScore'
+
+def make_player_pool(num_players: int, rng: random.Random) -> List[Dict]:
+    """Create a pool of players with a hidden skill rating"""
+    pool = []
+    for i in range(num_players):
+        # A few non-latin names, like in real lobbies
+        name = f"玩家{i}" if i % 10 == 7 else f"player{i}"
+        pool.append({
+            'name': name,
+            'skill': rng.gauss(1000, 150),
+            'ping': rng.randint(5, 90),
+            'hs': rng.uniform(0.2, 0.6)
+        })
+    return pool
+
+def _final_score(win_prob: float, rng: random.Random):
+    """Pick a plausible final score for the side with the given win probability"""
+    if rng.random() < 0.02:
+        return 12, 12
+    if rng.random() < 0.08:
+        # Overtime
+        return (16, 14) if rng.random() < win_prob else (14, 16)
+    margin = abs(win_prob - 0.5) * 2
+    loser_rounds = max(0, min(11, int(rng.gauss(8 - 6 * margin, 2.5))))
+    if rng.random() < win_prob:
+        return 13, loser_rounds
+    return loser_rounds, 13
+
+def _player_lines(player: Dict, rounds: int, won: bool, mvps: int, rng: random.Random) -> List[str]:
+    form = math.exp(rng.gauss((player['skill'] - 1000) / 600, 0.35))
+    kills = max(0, int(rng.gauss(0.7 * rounds * form, 3)))
+    deaths = max(0, int(rng.gauss(0.7 * rounds / form, 3)))
+    assists = max(0, int(rng.gauss(0.2 * rounds, 2)))
+    hs = f"{int(player['hs'] * 100 + rng.uniform(-10, 10))}%" if kills else ''
+    if mvps == 0:
+        stars = ' '
+    elif mvps == 1:
+        stars = '★'
+    else:
+        stars = f"★{mvps}"
+    score = 2 * kills + assists + (2 * mvps if won else mvps)
+    ping = max(1, player['ping'] + rng.randint(-5, 5))
+    return [
+        player['name'],
+        f"{ping}\t{kills}\t{assists}\t{deaths}\t{stars}\t{hs}\t{score}",
+        ''
+    ]
+
+def _split_mvps(total: int, rng: random.Random) -> List[int]:
+    mvps = [0] * 5
+    for _ in range(total):
+        mvps[rng.randrange(5)] += 1
+    return mvps
+
+def iter_match_blocks(
+    num_matches: int,
+    num_players: int = 50,
+    seed: int = 0,
+    end_date: datetime = datetime(2025, 12, 31, 23, 0, 0)
+) -> Iterator[List[str]]:
+    """Yield the lines of each match block, newest match first like the Steam page"""
+    if num_players < 10:
+        raise ValueError(f"Need at least 10 players, got {num_players}")
+
+    rng = random.Random(seed)
+    pool = make_player_pool(num_players, rng)
+    # Regulars play far more often than occasional players
+    cum_weights = list(itertools.accumulate(1.0 / (1 + i / 10) for i in range(num_players)))
+    date = end_date
+
+    for _ in range(num_matches):
+        chosen = set()
+        while len(chosen) < 10:
+            chosen.update(rng.choices(range(num_players), cum_weights=cum_weights, k=10 - len(chosen)))
+        lobby = [pool[i] for i in chosen]
+        rng.shuffle(lobby)
+        team1, team2 = lobby[:5], lobby[5:]
+
+        skill1 = sum(p['skill'] for p in team1) / 5
+        skill2 = sum(p['skill'] for p in team2) / 5
+        win_prob = 1 / (1 + math.pow(10, (skill2 - skill1) / 400))
+        score1, score2 = _final_score(win_prob, rng)
+        rounds = score1 + score2
+
+        duration = timedelta(seconds=rounds * rng.randint(85, 115))
+        minutes, seconds = divmod(int(duration.total_seconds()), 60)
+
+        lines = [
+            '',
+            f"Competitive {rng.choice(MAPS)}",
+            date.strftime('%Y-%m-%d %H:%M:%S') + ' GMT',
+            f"Wait Time: {rng.randint(0, 3):02d}:{rng.randint(0, 59):02d}",
+            f"Match Duration: {minutes:02d}:{seconds:02d}",
+            'Download Replay',
+            '',
+            '',
+            HEADER,
+            ''
+        ]
+        mvps1 = _split_mvps(score1, rng)
+        mvps2 = _split_mvps(score2, rng)
+        for player, mvp in zip(team1, mvps1):
+            lines.extend(_player_lines(player, rounds, score1 > score2, mvp, rng))
+        lines[-1] = f"{score1} : {score2}"
+        lines.append('')
+        for player, mvp in zip(team2, mvps2):
+            lines.extend(_player_lines(player, rounds, score2 > score1, mvp, rng))
+        yield lines
+
+        date -= duration + timedelta(minutes=rng.randint(5, 60))
+        # Scrim nights of a few matches, a day or more apart
+        if rng.random() < 1 / 6:
+            date -= timedelta(hours=rng.randint(18, 72))
+
+def write_history(
+    out: TextIO,
+    num_matches: int,
+    num_players: int = 50,
+    seed: int = 0,
+    line_ending: str = '\r\n'
+):
+    """Stream a synthetic history export to an open text file"""
+    out.write('Map\tMatch Results' + line_ending)
+    for lines in iter_match_blocks(num_matches, num_players, seed):
+        out.write(line_ending.join(lines) + line_ending)
+
+def generate_history(
+    filepath: Path,
+    num_matches: int,
+    num_players: int = 50,
+    seed: int = 0,
+    line_ending: str = '\r\n'
+) -> Path:
+    """Write a synthetic history export to a file"""
+    filepath = Path(filepath)
+    with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        write_history(f, num_matches, num_players, seed, line_ending)
+    return filepath
+
+def generate_history_text(num_matches: int, num_players: int = 50, seed: int = 0) -> str:
+    """Return a synthetic history export as a string"""
+    lines = ['Map\tMatch Results']
+    for block in iter_match_blocks(num_matches, num_players, seed):
+        lines.extend(block)
+    return '\n'.join(lines) + '\n'
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Generate a synthetic scrimmage history export")
+    arg_parser.add_argument('output', help="Output text file")
+    arg_parser.add_argument('--matches', type=int, default=1000)
+    arg_parser.add_argument('--players', type=int, default=50)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    generate_history(Path(args.output), args.matches, args.players, args.seed)
+    print(f"Wrote {args.matches} matches for {args.players} players to {args.output}")
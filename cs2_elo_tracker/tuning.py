@@ -0,0 +1,291 @@
+"""K-factor and default Elo tuning by predictive log-loss.
+
+Every candidate setting replays the full history; the expected score
+computed before each match is scored against the result with log-loss and
+Brier score. With NumPy installed all candidates are replayed at once by
+`batch_elo.replay_batch`; otherwise each one runs through `EloSystem`, in
+parallel on a process pool.
+"""
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterable, Tuple
+
+from .elo import EloSystem, load_match_history, history_initial_elos, create_engine
+from .engines import RatingEngine
+from .archive import is_archive
+from .batch_elo import EncodedHistory, encode_history, replay_batch, np
+from . import profiling
+
+DEFAULT_K_FACTORS = [8, 12, 16, 20, 24, 28, 32, 36, 40, 48, 56, 64]
+DEFAULT_INITIAL_ELOS = [800, 900, 1000, 1100, 1200]
+
+# Below this amount of work (matches x candidates) a process pool costs more than it saves
+MIN_PARALLEL_WORK = 20000
+
+# Clamp predictions so a confident miss does not produce an infinite log-loss
+EPSILON = 1e-6
+
+# History shared with worker processes, set once per worker by _init_worker
+_history: List[Dict[str, Any]] = []
+_custom_initial_elos: Dict[str, float] = {}
+_burn_in = 0
+
+def _init_worker(history, custom_initial_elos, burn_in):
+    global _history, _custom_initial_elos, _burn_in
+    _history = history
+    _custom_initial_elos = custom_initial_elos
+    _burn_in = burn_in
+
+def compact_history(matches: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Strip matches down to what the replay needs (cheap to send to workers)"""
+    compact = []
+    for match in matches:
+        team1 = match.get('team1_players', [])
+        team2 = match.get('team2_players', [])
+        winning_team = match.get('winning_team', 0)
+        if not team1 or not team2 or winning_team == 0:
+            continue
+        compact.append({
+            'team1_players': [{'name': p['name']} for p in team1],
+            'team2_players': [{'name': p['name']} for p in team2],
+            'winning_team': winning_team
+        })
+    return compact
+
+def score_engine(
+    engine: RatingEngine,
+    history: List[Dict[str, Any]],
+    burn_in: int = 0
+) -> Dict[str, Any]:
+    """Replay history through a rating engine and score its pre-match predictions"""
+    history = list(history)
+    engine.prepare(history)
+    log_loss = 0.0
+    brier = 0.0
+    correct = 0
+    scored = 0
+    for i, match in enumerate(history):
+        expected = engine.process_match(match)
+        if expected is None or i < burn_in:
+            continue
+        actual = 1.0 if match['winning_team'] == 1 else 0.0
+        p = min(max(expected, EPSILON), 1 - EPSILON)
+        log_loss -= actual * math.log(p) + (1 - actual) * math.log(1 - p)
+        brier += (expected - actual) ** 2
+        correct += (expected > 0.5) == (actual == 1.0) if expected != 0.5 else 0.5
+        scored += 1
+    return {
+        'log_loss': log_loss / scored if scored else None,
+        'brier': brier / scored if scored else None,
+        'accuracy': correct / scored if scored else None,
+        'matches': scored
+    }
+
+def score_predictions(
+    history: List[Dict[str, Any]],
+    k_factor: float,
+    initial_elo: float,
+    custom_initial_elos: Dict[str, float] = None,
+    burn_in: int = 0
+) -> Dict[str, Any]:
+    """Replay history with one setting and score the pre-match predictions"""
+    elo_system = EloSystem(
+        k_factor=k_factor, initial_elo=initial_elo, custom_initial_elos=custom_initial_elos
+    )
+    result = score_engine(elo_system, history, burn_in)
+    return {
+        'k_factor': k_factor,
+        'initial_elo': initial_elo,
+        'log_loss': result['log_loss'],
+        'brier': result['brier'],
+        'matches': result['matches']
+    }
+
+def _evaluate(candidate: Tuple[float, float]) -> Dict[str, Any]:
+    k_factor, initial_elo = candidate
+    return score_predictions(_history, k_factor, initial_elo, _custom_initial_elos, _burn_in)
+
+def _evaluate_vectorized(
+    encoded: EncodedHistory,
+    candidates: List[Tuple[float, float]],
+    custom_initial_elos: Dict[str, float],
+    burn_in: int
+) -> List[Dict[str, Any]]:
+    result = replay_batch(
+        encoded, [c[0] for c in candidates], [c[1] for c in candidates],
+        custom_initial_elos, burn_in=burn_in
+    )
+    return [
+        {
+            'k_factor': k_factor,
+            'initial_elo': initial_elo,
+            'log_loss': float(result.log_loss[i]) if result.scored else None,
+            'brier': float(result.brier[i]) if result.scored else None,
+            'matches': result.scored
+        }
+        for i, (k_factor, initial_elo) in enumerate(candidates)
+    ]
+
+def evaluate_candidates(
+    history: List[Dict[str, Any]],
+    candidates: List[Tuple[float, float]],
+    custom_initial_elos: Dict[str, float] = None,
+    processes: int = None,
+    burn_in: int = 0,
+    encoded: EncodedHistory = None
+) -> List[Dict[str, Any]]:
+    """Score (k_factor, initial_elo) candidates, vectorized if `encoded` is given,
+    otherwise in parallel when worthwhile"""
+    custom_initial_elos = custom_initial_elos or {}
+    if not candidates:
+        return []
+    if encoded is not None:
+        with profiling.span('tune.evaluate'):
+            return _evaluate_vectorized(encoded, candidates, custom_initial_elos, burn_in)
+    
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(candidates))
+
+    with profiling.span('tune.evaluate'):
+        if processes <= 1 or len(history) * len(candidates) < MIN_PARALLEL_WORK:
+            _init_worker(history, custom_initial_elos, burn_in)
+            return [_evaluate(c) for c in candidates]
+
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            initializer=_init_worker,
+            initargs=(history, custom_initial_elos, burn_in)
+        ) as executor:
+            return list(executor.map(_evaluate, candidates))
+
+def _rank(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Ties (e.g. the default Elo only matters relative to custom initial Elos)
+    # go to the candidate closest to the stock settings
+    scored = [r for r in results if r['log_loss'] is not None]
+    return sorted(scored, key=lambda r: (
+        round(r['log_loss'], 9), round(r['brier'], 9),
+        abs(r['initial_elo'] - 1000), abs(r['k_factor'] - 32)
+    ))
+
+def grid_search(
+    history: List[Dict[str, Any]],
+    k_factors: List[float],
+    initial_elos: List[float],
+    custom_initial_elos: Dict[str, float] = None,
+    processes: int = None,
+    burn_in: int = 0,
+    encoded: EncodedHistory = None
+) -> List[Dict[str, Any]]:
+    candidates = [(k, e) for k in k_factors for e in initial_elos]
+    return _rank(evaluate_candidates(
+        history, candidates, custom_initial_elos, processes, burn_in, encoded
+    ))
+
+def coordinate_search(
+    history: List[Dict[str, Any]],
+    start: Tuple[float, float] = (32, 1000),
+    k_step: float = 8,
+    elo_step: float = 100,
+    min_k_step: float = 1,
+    min_elo_step: float = 12.5,
+    custom_initial_elos: Dict[str, float] = None,
+    processes: int = None,
+    burn_in: int = 0,
+    encoded: EncodedHistory = None
+) -> List[Dict[str, Any]]:
+    """Alternately refine k_factor and initial_elo around the best point, halving the steps"""
+    evaluated: Dict[Tuple[float, float], Dict[str, Any]] = {}
+
+    def evaluate(candidates):
+        todo = [c for c in dict.fromkeys(candidates) if c not in evaluated]
+        for result in evaluate_candidates(
+            history, todo, custom_initial_elos, processes, burn_in, encoded
+        ):
+            evaluated[(result['k_factor'], result['initial_elo'])] = result
+
+    def best():
+        return _rank(list(evaluated.values()))[0]
+
+    k, e = start
+    evaluate([(k, e)])
+    while k_step >= min_k_step or elo_step >= min_elo_step:
+        evaluate([(max(1, k + d * k_step), e) for d in (-2, -1, 1, 2)])
+        k = best()['k_factor']
+        evaluate([(k, e + d * elo_step) for d in (-2, -1, 1, 2)])
+        e = best()['initial_elo']
+        k_step /= 2
+        elo_step /= 2
+    return _rank(list(evaluated.values()))
+
+def tune_parameters(
+    matches_file: str = None,
+    initial_elo_file: str = None,
+    alias_file: str = None,
+    search: str = 'grid',
+    k_factors: List[float] = None,
+    initial_elos: List[float] = None,
+    processes: int = None,
+    burn_in: int = 0,
+    vectorized: bool = None
+) -> Dict[str, Any]:
+    """Find the k_factor / initial_elo with the lowest predictive log-loss.
+    
+    vectorized defaults to True when NumPy is available. A vectorized run
+    on an archive encodes it from the mapped columns, without decoding
+    the matches.
+    """
+    if vectorized is None:
+        vectorized = np is not None
+    if vectorized and matches_file is not None and is_archive(matches_file):
+        custom_initial_elos = history_initial_elos(matches_file, initial_elo_file, alias_file)
+        history = []
+        encoded = encode_history(matches_file)
+        num_matches = encoded.num_matches
+    else:
+        matches, custom_initial_elos = load_match_history(matches_file, initial_elo_file, alias_file)
+        history = compact_history(matches)
+        encoded = EncodedHistory(history) if vectorized else None
+        num_matches = len(history)
+    if not num_matches:
+        raise ValueError("No decided matches to tune on")
+
+    if search == 'grid':
+        ranked = grid_search(
+            history, k_factors or DEFAULT_K_FACTORS, initial_elos or DEFAULT_INITIAL_ELOS,
+            custom_initial_elos, processes, burn_in, encoded
+        )
+    elif search == 'coordinate':
+        ranked = coordinate_search(
+            history, custom_initial_elos=custom_initial_elos, processes=processes,
+            burn_in=burn_in, encoded=encoded
+        )
+    else:
+        raise ValueError(f"Unknown search method: {search}")
+
+    return {'best': ranked[0], 'candidates': ranked, 'matches': num_matches}
+
+def compare_engines(
+    matches_file: str = None,
+    initial_elo_file: str = None,
+    alias_file: str = None,
+    engines: Iterable[str] = ('elo', 'performance'),
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    burn_in: int = 0
+) -> List[Dict[str, Any]]:
+    """Score the pre-match predictions of several rating engines on the same history.
+    
+    Engines that rate in periods (glicko2) are scored one match per period.
+    """
+    matches, custom_initial_elos = load_match_history(matches_file, initial_elo_file, alias_file)
+    report = []
+    for name in engines:
+        engine = create_engine(name, k_factor, initial_elo, custom_initial_elos)
+        start = time.perf_counter()
+        with profiling.span(f'compare.{name}'):
+            result = score_engine(engine, matches, burn_in)
+        report.append({'engine': name, 'seconds': time.perf_counter() - start, **result})
+    return report
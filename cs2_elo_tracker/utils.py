@@ -1,14 +1,24 @@
 import json
+import os
+import threading
 import unicodedata
-from typing import Dict
+from typing import Dict, Optional, Tuple, Callable, Any
 from pathlib import Path
 
+from . import storage
+from .storage import transaction, after_commit
+
 # Default data directory
 DATA_DIR = Path(__file__).parent.parent / "data"
 
-def ensure_data_dir():
-    """Ensure data directory exists"""
-    DATA_DIR.mkdir(exist_ok=True)
+# Process-wide cache of parsed data files: (kind, path) -> ((mtime_ns, size), data)
+_data_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], Any]] = {}
+_data_cache_lock = threading.Lock()
+_data_cache_stats = {'hits': 0, 'misses': 0}
+
+def ensure_data_dir(directory: Path = None):
+    """Ensure data directory (or the given directory) exists"""
+    (directory or DATA_DIR).mkdir(parents=True, exist_ok=True)
 
 def get_display_width(text: str) -> int:
     """Calculate display width accounting for wide CJK characters"""
@@ -27,38 +37,160 @@ def pad_string(text: str, target_width: int) -> str:
         return text
     return text + ' ' * (target_width - current_width)
 
+def file_signature(filepath: Path) -> Optional[Tuple[int, int]]:
+    """Return (mtime_ns, size) of a file, or None if it does not exist.
+    
+    A file with writes staged in this thread's transaction gets a signature
+    of its own, so caches keyed by it neither outlive an aborted
+    transaction nor mix staged and committed contents.
+    """
+    pending = storage.staged(filepath)
+    if pending is not None:
+        return -1, pending.serial
+    return _stat_signature(filepath)
+
+def _stat_signature(filepath: Path) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _cache_key(kind: str, filepath: Path) -> Tuple[str, str]:
+    return kind, os.path.abspath(filepath)
+
+def _load_cached(kind: str, filepath: Path, loader: Callable[[Path], Any]):
+    """Return parsed file contents, reusing the cached object while (mtime, size) match.
+    
+    Cached objects are shared between callers and must be treated as read-only.
+    Raises FileNotFoundError if the file does not exist.
+    """
+    signature = _stat_signature(filepath)
+    if signature is None:
+        raise FileNotFoundError(filepath)
+    key = _cache_key(kind, filepath)
+    with _data_cache_lock:
+        entry = _data_cache.get(key)
+        if entry is not None and entry[0] == signature:
+            _data_cache_stats['hits'] += 1
+            return entry[1]
+        _data_cache_stats['misses'] += 1
+    data = loader(filepath)
+    with _data_cache_lock:
+        _data_cache[key] = (signature, data)
+    return data
+
+def invalidate_data_cache(filepath: Path = None):
+    """Drop cached contents of one file, or of all files if no path is given"""
+    with _data_cache_lock:
+        if filepath is None:
+            _data_cache.clear()
+            return
+        path = os.path.abspath(filepath)
+        for key in [k for k in _data_cache if k[1] == path]:
+            del _data_cache[key]
+
+def invalidate_data_dir(directory: Path):
+    """Drop cached contents of every file under a directory"""
+    prefix = os.path.join(os.path.abspath(directory), '')
+    with _data_cache_lock:
+        for key in [k for k in _data_cache if k[1].startswith(prefix)]:
+            del _data_cache[key]
+
+def data_cache_info() -> Dict[str, int]:
+    """Return hit/miss counters and current size of the data file cache"""
+    with _data_cache_lock:
+        return {
+            'hits': _data_cache_stats['hits'],
+            'misses': _data_cache_stats['misses'],
+            'size': len(_data_cache)
+        }
+
+def _read_json(filepath: Path):
+    try:
+        return json.loads(storage.read_bytes(filepath))
+    except ValueError as e:
+        raise ValueError(f"{filepath} is corrupt: {e}") from e
+
+def _parse_jsonl(filepath: Path, text: str) -> list:
+    results = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if line.strip():
+            try:
+                results.append(json.loads(line))
+            except ValueError as e:
+                raise ValueError(f"{filepath} is corrupt at line {number}: {e}") from e
+    return results
+
+def _read_jsonl(filepath: Path) -> list:
+    if storage.is_compressed(filepath):
+        return _parse_jsonl(filepath, storage.read_bytes(filepath).decode('utf-8'))
+    results = []
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    results.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"{filepath} is corrupt at line {number}: {e}") from e
+    return results
+
 def load_json(filepath: Path, default=None):
-    """Load JSON file safely"""
+    """Load JSON file (cached, treat the result as read-only).
+    
+    A missing file gives `default`; a corrupt one raises ValueError rather
+    than passing for an empty file. Paths ending in .gz are gzip-compressed.
+    """
+    pending = storage.staged(filepath)
+    if pending is not None and pending.contents is not None:
+        return pending.value
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
+        return _load_cached('json', filepath, _read_json)
+    except FileNotFoundError:
         return default if default is not None else {}
 
-def save_json(filepath: Path, data):
-    """Save data to JSON file"""
-    ensure_data_dir()
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def _json_bytes(data, indent: Optional[int] = 2) -> bytes:
+    separators = None if indent is not None else (',', ':')
+    return json.dumps(data, indent=indent, separators=separators, ensure_ascii=False).encode('utf-8')
+
+def _jsonl_bytes(data: list) -> bytes:
+    return ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in data).encode('utf-8')
+
+def save_json(filepath: Path, data, indent: Optional[int] = 2):
+    """Save data to a JSON file atomically (staged in an open transaction).
+    
+    indent=None writes compact JSON, for files rewritten on every import
+    that nobody edits by hand.
+    """
+    storage.write_file(filepath, _json_bytes(data, indent), data)
+    after_commit(lambda: invalidate_data_cache(filepath))
 
 def load_jsonl(filepath: Path) -> list:
-    """Load JSONL file"""
-    results = []
+    """Load JSONL file (cached, treat the result as read-only)"""
+    pending = storage.staged(filepath)
+    if pending is not None:
+        if pending.contents is not None:
+            return pending.value
+        committed = load_jsonl_committed(filepath)
+        return committed + pending.items
+    return load_jsonl_committed(filepath)
+
+def load_jsonl_committed(filepath: Path) -> list:
+    """load_jsonl ignoring this thread's staged writes"""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    results.append(json.loads(line))
+        return _load_cached('jsonl', filepath, _read_jsonl)
     except FileNotFoundError:
-        pass
-    return results
+        return []
 
 def save_jsonl(filepath: Path, data: list):
-    """Save data to JSONL file"""
-    ensure_data_dir()
-    with open(filepath, 'w', encoding='utf-8') as f:
-        for item in data:
-            f.write(json.dumps(item, ensure_ascii=False) + '\n')
+    """Save data to a JSONL file atomically (staged in an open transaction)"""
+    storage.write_file(filepath, _jsonl_bytes(data), list(data))
+    after_commit(lambda: invalidate_data_cache(filepath))
+
+def append_jsonl(filepath: Path, data: list):
+    """Append records to a JSONL file, all or none of them (staged in an open transaction)"""
+    storage.append_file(filepath, _jsonl_bytes(data), list(data))
+    after_commit(lambda: invalidate_data_cache(filepath))
 
 def load_aliases(filepath: Path = None) -> Dict[str, str]:
     """Load player aliases"""
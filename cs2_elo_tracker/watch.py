@@ -0,0 +1,155 @@
+"""Follow a match history file that keeps growing with new Steam copy-pastes.
+
+For every watched file the byte offset already consumed is remembered,
+together with checksums of the first and last bytes before it. A poll
+reads only the bytes after the offset, starting at the first `Competitive`
+line, and ingests the complete match blocks. The last block stays pending
+until it is complete (both teams and the score present), since the file
+may be saved mid-paste. If the file shrank or the checksums no longer
+match, it was truncated or rewritten and is read again from the start
+(already known matches are deduplicated as usual).
+"""
+import hashlib
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Any, Callable
+
+from .utils import DATA_DIR, load_json, save_json, load_aliases, transaction
+from .parser import parse_matches_from_text
+from .ingest import ingest_text
+from . import profiling
+
+# Bytes covered by each of the head / tail checksums
+CHECKSUM_BYTES = 4096
+
+DEFAULT_INTERVAL = 2.0
+
+_BLOCK_START = re.compile(rb'^[ \t]*Competitive', re.MULTILINE)
+
+def watch_state_file(data_dir: Path = None) -> Path:
+    return (data_dir or DATA_DIR) / "watch_state.json"
+
+def _checksum(f, start: int, end: int) -> str:
+    f.seek(start)
+    return hashlib.sha1(f.read(end - start)).hexdigest()
+
+def _fingerprint(f, offset: int) -> Dict[str, str]:
+    return {
+        'head': _checksum(f, 0, min(offset, CHECKSUM_BYTES)),
+        'tail': _checksum(f, max(0, offset - CHECKSUM_BYTES), offset)
+    }
+
+def _block_complete(block: bytes, aliases: Dict[str, str]) -> bool:
+    """Whether the last block of the file has both teams and the score"""
+    if not block.endswith(b'\n'):
+        return False
+    matches = parse_matches_from_text(block.decode('utf-8', errors='replace'), aliases)
+    if len(matches) != 1:
+        return False
+    match = matches[0]
+    team1 = match.get('team1_players', [])
+    team2 = match.get('team2_players', [])
+    return 'team1_score' in match and 0 < len(team1) <= len(team2)
+
+def read_new_blocks(filepath: Path, position: Dict[str, Any], aliases: Dict[str, str]):
+    """Text of the complete blocks appended since `position`.
+
+    Returns (text, new position, whether the file was rewritten). `position`
+    is a previous return value, or {} for a file not read before.
+    """
+    size = filepath.stat().st_size
+    offset = position.get('offset', 0)
+    with open(filepath, 'rb') as f:
+        rewritten = offset > 0 and (
+            size < offset or _fingerprint(f, offset) != position.get('fingerprint')
+        )
+        if rewritten:
+            offset = 0
+        if size == offset:
+            return '', position, rewritten
+
+        f.seek(offset)
+        data = f.read(size - offset)
+        starts = [m.start() for m in _BLOCK_START.finditer(data)]
+        if not starts:
+            return '', {'offset': 0} if rewritten else position, rewritten
+
+        end = starts[-1]
+        if _block_complete(data[end:], aliases):
+            end = len(data)
+        text = data[starts[0]:end].decode('utf-8', errors='replace')
+
+        new_offset = offset + end
+        return text, {'offset': new_offset, 'fingerprint': _fingerprint(f, new_offset)}, rewritten
+
+@profiling.profiled('watch.poll')
+def poll_once(
+    input_file: str,
+    output_file: str = None,
+    alias_file: str = None,
+    k_factor: float = 32,
+    initial_elo: float = 1000,
+    engine: str = 'elo',
+    state_file: Path = None,
+    confidence_intervals: bool = False
+) -> Dict[str, Any]:
+    """Ingest whatever was appended to input_file since the last poll and update ratings.
+
+    Returns the ingest_text result plus whether the file was rewritten.
+    """
+    state_file = Path(state_file) if state_file else watch_state_file()
+    filepath = Path(input_file)
+    key = str(filepath.resolve())
+    aliases = load_aliases(Path(alias_file) if alias_file else None)
+
+    states = load_json(state_file, {})
+    text, position, rewritten = read_new_blocks(filepath, states.get(key, {}), aliases)
+
+    result = {'parsed': 0, 'new': 0, 'replaced': 0, 'total': None}
+    # The new position is committed with the ingest, so a crash repeats both or neither
+    with transaction(state_file.parent):
+        if text:
+            result = ingest_text(
+                text, output_file, alias_file, k_factor, initial_elo, engine, confidence_intervals
+            )
+        if position != states.get(key):
+            states = dict(states)
+            states[key] = position
+            save_json(state_file, states)
+    result['rewritten'] = rewritten
+    return result
+
+def file_changed(filepath: Path, last_stat: tuple) -> tuple:
+    """Cheap change check: returns the new (mtime_ns, size), or None if unchanged"""
+    st = os.stat(filepath)
+    current = (st.st_mtime_ns, st.st_size)
+    return None if current == last_stat else current
+
+def watch(
+    input_file: str,
+    on_update: Callable[[Dict[str, Any]], None] = None,
+    interval: float = DEFAULT_INTERVAL,
+    stop: threading.Event = None,
+    **ingest_options
+):
+    """Poll input_file every `interval` seconds until `stop` is set.
+
+    The file is only read when its mtime or size changed; on_update gets
+    the result of every poll that ingested something or saw a rewrite.
+    """
+    stop = stop or threading.Event()
+    last_stat = None
+    while not stop.is_set():
+        try:
+            changed = file_changed(Path(input_file), last_stat)
+        except FileNotFoundError:
+            # Being replaced by an editor; try again next round
+            changed = None
+        if changed:
+            last_stat = changed
+            result = poll_once(input_file, **ingest_options)
+            if on_update and (result['parsed'] or result['rewritten']):
+                on_update(result)
+        stop.wait(interval)
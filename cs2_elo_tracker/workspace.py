@@ -0,0 +1,245 @@
+"""Several communities served from one process, each with its own data.
+
+A workspace is a data directory holding its own match database, aliases,
+initial ELOs, ratings and pair / stat records. The default workspace is
+DATA_DIR itself; the others live in DATA_DIR/workspaces/<name>. Workspace
+methods call the usual module functions with the workspace's file paths.
+
+The data file, balance result and match-id caches are shared by the
+process and keyed by absolute path, so workspaces never see each other's
+data. Only the MAX_ACTIVE_WORKSPACES most recently used workspaces keep
+cached state: when get_workspace activates another one, the least recently
+used workspace is evicted and its cache entries are purged (for the default
+workspace that includes everything under DATA_DIR, which only costs the
+other workspaces a reload).
+"""
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Union, Callable
+
+from .utils import DATA_DIR, load_json, save_json, load_aliases, invalidate_data_dir
+from .storage import recover
+from .parser import parse_and_save, purge_match_index
+from .ingest import ingest_text
+from .elo import calculate_elos
+from .engines import rating_file
+from .balancer import get_balanced_teams, load_elos, purge_balance_cache
+from .names import NameIndex, load_name_index, purge_name_index
+from .draft import DraftSession, start_draft
+from .synergy import pair_stats_file, load_pair_stats
+from .player_stats import player_stats_file, load_player_stats
+from .watch import DEFAULT_INTERVAL, poll_once, watch, watch_state_file
+from .seasons import DEFAULT_CARRY, enable_seasons, close_seasons, closed_seasons, career
+from .tuning import tune_parameters, compare_engines
+from .simulator import DEFAULT_SIMULATIONS, team_ratings, simulate_from_file
+
+DEFAULT_WORKSPACE = 'default'
+MAX_ACTIVE_WORKSPACES = 8
+
+_VALID_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def workspaces_dir() -> Path:
+    return DATA_DIR / "workspaces"
+
+def workspace_dir(name: str) -> Path:
+    if name == DEFAULT_WORKSPACE:
+        return DATA_DIR
+    if not _VALID_NAME.match(name):
+        raise ValueError(f"Invalid workspace name: {name!r} (letters, digits, - and _ only)")
+    return workspaces_dir() / name
+
+class Workspace:
+    """One community's data directory and the operations on it.
+
+    Opening a workspace finishes any commit a crash interrupted in its
+    directory (see storage.py).
+    """
+    def __init__(self, name: str = DEFAULT_WORKSPACE, data_dir: Path = None):
+        self.name = name
+        self.data_dir = Path(data_dir) if data_dir else workspace_dir(name)
+        recover(self.data_dir)
+
+    @property
+    def matches_file(self) -> Path:
+        return self.data_dir / "cs_matches.jsonl"
+
+    @property
+    def alias_file(self) -> Path:
+        return self.data_dir / "player_aliases.json"
+
+    @property
+    def initial_elo_file(self) -> Path:
+        return self.data_dir / "initial_elos.json"
+
+    def rating_file(self, engine: str = 'elo') -> Path:
+        return rating_file(engine, self.data_dir)
+
+    def aliases(self) -> Dict[str, str]:
+        return load_aliases(self.alias_file)
+
+    def save_aliases(self, aliases: Dict[str, str]):
+        save_json(self.alias_file, aliases)
+
+    def initial_elos(self) -> Any:
+        """initial_elos.json as stored (a name -> ELO object or a list of entries)"""
+        return load_json(self.initial_elo_file, {})
+
+    def save_initial_elos(self, data: Any):
+        save_json(self.initial_elo_file, data)
+
+    def ratings(self, engine: str = 'elo') -> List[Dict[str, Any]]:
+        """Standings of an engine, best first (read-only)"""
+        return load_json(self.rating_file(engine), [])
+
+    def elos(self, engine: str = 'elo', map_name: str = None) -> Dict[str, float]:
+        return load_elos(self.rating_file(engine), map_name)
+
+    def name_index(self, engine: str = 'elo') -> NameIndex:
+        """Rated players and aliases, for completion and typo-tolerant lookup"""
+        return load_name_index(self.rating_file(engine), self.alias_file)
+
+    def pair_stats(self):
+        return load_pair_stats(pair_stats_file(self.matches_file))
+
+    def player_stats(self):
+        return load_player_stats(player_stats_file(self.matches_file))
+
+    def parse_and_save(self, input_file: str) -> tuple:
+        return parse_and_save(input_file, self.matches_file, self.alias_file)
+
+    def ingest_text(self, content: Union[str, Iterable[str]], k_factor: float = 32,
+                    initial_elo: float = 1000, engine: str = 'elo',
+                    confidence_intervals: bool = False) -> Dict[str, Any]:
+        return ingest_text(
+            content, self.matches_file, self.alias_file, k_factor, initial_elo, engine,
+            confidence_intervals
+        )
+
+    def calculate_elos(self, k_factor: float = 32, initial_elo: float = 1000, engine: str = 'elo',
+                       confidence_intervals: bool = False) -> List[Dict[str, Any]]:
+        return calculate_elos(
+            self.matches_file, self.rating_file(engine), k_factor, self.initial_elo_file,
+            self.alias_file, initial_elo, engine, confidence_intervals
+        )
+
+    def get_balanced_teams(self, player_names: List[str], num_results: int = 5, engine: str = 'elo',
+                           map_name: str = None, synergy_weight: float = 0,
+                           allow_unknown: bool = False) -> List[Dict]:
+        return get_balanced_teams(
+            player_names, self.rating_file(engine), self.alias_file, num_results, engine,
+            map_name, synergy_weight, pair_stats_file(self.matches_file), allow_unknown
+        )
+
+    def start_draft(self, player_names: List[str], captains: tuple, engine: str = 'elo',
+                    map_name: str = None, order: str = 'alternate', first_pick: int = 0,
+                    allow_unknown: bool = False) -> DraftSession:
+        return start_draft(
+            player_names, captains, self.rating_file(engine), self.alias_file, engine,
+            map_name, order, first_pick, allow_unknown
+        )
+
+    def poll_watch(self, input_file: str, k_factor: float = 32, initial_elo: float = 1000,
+                   engine: str = 'elo', confidence_intervals: bool = False) -> Dict[str, Any]:
+        return poll_once(
+            input_file, self.matches_file, self.alias_file, k_factor, initial_elo, engine,
+            watch_state_file(self.data_dir), confidence_intervals
+        )
+
+    def watch(self, input_file: str, on_update: Callable[[Dict[str, Any]], None] = None,
+              interval: float = DEFAULT_INTERVAL, stop=None, k_factor: float = 32,
+              initial_elo: float = 1000, engine: str = 'elo', confidence_intervals: bool = False):
+        watch(
+            input_file, on_update, interval, stop, output_file=self.matches_file,
+            alias_file=self.alias_file, k_factor=k_factor, initial_elo=initial_elo, engine=engine,
+            state_file=watch_state_file(self.data_dir), confidence_intervals=confidence_intervals
+        )
+
+    def enable_seasons(self, engine: str = 'elo', k_factor: float = 32, initial_elo: float = 1000,
+                       carry: float = DEFAULT_CARRY, compress: bool = False) -> List[str]:
+        return enable_seasons(
+            self.matches_file, engine, k_factor, initial_elo, carry, self.initial_elo_file,
+            self.alias_file, compress
+        )
+
+    def close_seasons(self) -> List[str]:
+        return close_seasons(self.matches_file, self.initial_elo_file, self.alias_file)
+
+    def closed_seasons(self) -> List[Dict[str, Any]]:
+        return closed_seasons(self.matches_file)
+
+    def career(self, player: str, engine: str = 'elo') -> Dict[str, Any]:
+        return career(player, self.matches_file, engine)
+
+    def tune_parameters(self, search: str = 'grid', k_factors: List[float] = None,
+                        initial_elos: List[float] = None, processes: int = None, burn_in: int = 0,
+                        vectorized: bool = None) -> Dict[str, Any]:
+        return tune_parameters(
+            self.matches_file, self.initial_elo_file, self.alias_file, search, k_factors,
+            initial_elos, processes, burn_in, vectorized
+        )
+
+    def compare_engines(self, engines: Iterable[str] = ('elo', 'performance'), k_factor: float = 32,
+                        initial_elo: float = 1000, burn_in: int = 0) -> List[Dict[str, Any]]:
+        return compare_engines(
+            self.matches_file, self.initial_elo_file, self.alias_file, engines, k_factor,
+            initial_elo, burn_in
+        )
+
+    def team_ratings(self, teams: Dict[str, List[str]], engine: str = 'elo', map_name: str = None,
+                     allow_unknown: bool = False) -> Dict[str, float]:
+        return team_ratings(teams, self.rating_file(engine), self.alias_file, engine, map_name, allow_unknown)
+
+    def simulate_from_file(self, bracket_file: str, simulations: int = DEFAULT_SIMULATIONS,
+                           seed: int = None, engine: str = 'elo',
+                           allow_unknown: bool = False) -> Dict[str, Any]:
+        return simulate_from_file(
+            bracket_file, simulations, seed, self.rating_file(engine), self.alias_file, engine,
+            allow_unknown
+        )
+
+    def evict(self):
+        """Drop this workspace's entries from the process-wide caches"""
+        invalidate_data_dir(self.data_dir)
+        purge_balance_cache(self.data_dir)
+        purge_match_index(self.data_dir)
+        purge_name_index(self.data_dir)
+
+# Active workspaces, least recently used first
+_active: "OrderedDict[str, Workspace]" = OrderedDict()
+_active_lock = threading.Lock()
+
+def get_workspace(name: str = DEFAULT_WORKSPACE) -> Workspace:
+    """The workspace called `name`, marked as most recently used"""
+    with _active_lock:
+        workspace = _active.get(name)
+        if workspace is not None:
+            _active.move_to_end(name)
+            return workspace
+        workspace = _active[name] = Workspace(name)
+        evicted = []
+        while len(_active) > MAX_ACTIVE_WORKSPACES:
+            evicted.append(_active.popitem(last=False)[1])
+    for idle in evicted:
+        idle.evict()
+    return workspace
+
+def evict_workspace(name: str):
+    """Purge a workspace's cached state now (it is reloaded on next use)"""
+    with _active_lock:
+        workspace = _active.pop(name, None)
+    if workspace is not None:
+        workspace.evict()
+
+def active_workspaces() -> List[str]:
+    """Workspaces holding cached state, most recently used first"""
+    with _active_lock:
+        return list(reversed(_active))
+
+def list_workspaces() -> List[str]:
+    """The default workspace plus every workspace directory"""
+    names = [DEFAULT_WORKSPACE]
+    if workspaces_dir().is_dir():
+        names += sorted(p.name for p in workspaces_dir().iterdir() if p.is_dir() and _VALID_NAME.match(p.name))
+    return names
@@ -1,5 +1,9 @@
 #!/usr/bin/env python3
+import multiprocessing
+
 from cs2_elo_tracker.main import main
 
 if __name__ == '__main__':
+    # Needed for the tuning process pool in the frozen (PyInstaller) build
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file